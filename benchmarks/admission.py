@@ -0,0 +1,90 @@
+# Measures how a mass reconnect affects players already in game: runs the swarm of chatting clients, and part way
+# through opens a storm of connections which all log in at once and stay connected, as after a proxy restarts. Reports
+# the swarm's chat fan-out latency and how long the storm's logins took, with logins unlimited and with admission
+# control queueing them
+#   python -m benchmarks.admission [--clients N] [--storm N] [--duration S]
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.backends import login_with
+from benchmarks.swarm import ROOT, free_port, percentile
+
+
+# Logs in count clients at once, returning the seconds each login took. Sockets are closed once all have joined.
+def storm(port: int, count: int):
+    login_times = []
+    sockets = []
+    lock = threading.Lock()
+
+    def run(index: int):
+        start = time.perf_counter()
+        sock = socket.create_connection(("127.0.0.1", port))
+        with lock:
+            sockets.append(sock)
+        try:
+            login_with(sock, port, "storm%d" % index, join=True)
+        except (OSError, RuntimeError):
+            return
+        with lock:
+            login_times.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sock in sockets:
+        sock.close()
+    return login_times
+
+
+def run(args, server_args) -> dict:
+    port = free_port()
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        swarm = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.swarm", "--clients", str(args.clients), "--duration",
+             str(args.duration), "--chat-rate", "0.5", "--tab-rate", "0", "--churn", "0", "--port", str(port),
+             "--output", output.name, "--", "--max-players", str(args.clients + args.storm + 10), *server_args],
+            cwd=ROOT, stdout=subprocess.DEVNULL)
+
+        # Start the storm a second into the swarm's measurement, once its clients have joined
+        time.sleep(args.clients / 50.0 + 2)
+        login_times = storm(port, args.storm)
+
+        swarm.wait()
+        with open(output.name) as fd:
+            results = json.load(fd)
+
+    results["storm_joined"] = len(login_times)
+    results["storm_login_p50_ms"] = (percentile(login_times, 0.5) or 0) * 1000
+    results["storm_login_p99_ms"] = (percentile(login_times, 0.99) or 0) * 1000
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default=100, type=int, help="swarm clients chatting throughout")
+    parser.add_argument("--storm", default=500, type=int, help="clients logging in at once part way through")
+    parser.add_argument("--duration", default=10.0, type=float, help="seconds to run the swarm for")
+    args = parser.parse_args(argv)
+
+    configurations = [("unlimited", ["--max-concurrent-logins", "0"]),
+                      ("admission control", [])]
+
+    print("%-18s %12s %12s %12s %14s %14s" % (
+        "", "chat p50 ms", "chat p99 ms", "storm joined", "login p50 ms", "login p99 ms"))
+    for name, server_args in configurations:
+        results = run(args, server_args)
+        print("%-18s %12.1f %12.1f %12d %14.1f %14.1f" % (
+            name, results["fanout_latency_p50_ms"], results["fanout_latency_p99_ms"], results["storm_joined"],
+            results["storm_login_p50_ms"], results["storm_login_p99_ms"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
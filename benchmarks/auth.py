@@ -0,0 +1,129 @@
+# Compares checking online mode logins with quarry's session server client and with the pooled, concurrency limited
+# authenticator, against a local stand-in session server which answers after a fixed delay. Every login is checked at
+# once, as in a reconnect storm, each with its own server hash as real logins have.
+#   python -m benchmarks.auth [--logins N] [--delay S] [--concurrency N]
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import DeferredList, inlineCallbacks
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+from quarry.net import auth
+from quarry.types.uuid import UUID
+
+from benchmarks.swarm import percentile
+from pymcserv.factory import PyMcServFactory
+
+
+class SessionServer(Resource):
+    """
+    Answers "hasJoined" checks for any player after a delay, and accepts every "join" from clients.
+    """
+
+    isLeaf = True
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+        self.requests = 0
+
+    def render_GET(self, request):
+        self.requests += 1
+        name = request.args[b"username"][0].decode("utf8")
+        profile = {"id": UUID.from_offline_player(name).to_hex(with_dashes=False), "name": name, "properties": []}
+
+        def respond():
+            if not request._disconnected:
+                request.write(json.dumps(profile).encode("utf8"))
+                request.finish()
+
+        reactor.callLater(self.delay, respond)
+        return NOT_DONE_YET
+
+    def render_POST(self, request):
+        request.setResponseCode(204)
+        return b""
+
+
+class CountingSite(Site):
+    noisy = False
+    connections = 0
+
+    def buildProtocol(self, addr):
+        self.connections += 1
+        return super().buildProtocol(addr)
+
+
+# Checks every login at once, returning the seconds each check took
+@inlineCallbacks
+def storm(has_joined, logins: int, prefix: str):
+    latencies = []
+
+    def check(index: int):
+        start = time.perf_counter()
+        digest = hashlib.sha1(os.urandom(20)).hexdigest()  # Made from each connection's shared secret
+        deferred = has_joined(digest, "%s%d" % (prefix, index))
+        deferred.addCallback(lambda _: latencies.append(time.perf_counter() - start))
+        return deferred
+
+    results = yield DeferredList([check(index) for index in range(logins)], consumeErrors=True)
+    failures = sum(1 for success, _ in results if not success)
+    return latencies, failures
+
+
+@inlineCallbacks
+def run(args):
+    server = SessionServer(args.delay)
+    site = CountingSite(server)
+    port = reactor.listenTCP(0, site, interface="127.0.0.1")
+    url = "http://127.0.0.1:%d/session/minecraft/" % port.getHost().port
+
+    factory = PyMcServFactory()
+    factory.session_server = url
+    factory.auth_concurrency = args.concurrency
+    authenticator = factory.authenticator
+
+    auth.SESSION_SERVER = url.encode("ascii")
+    clients = [
+        ("quarry", lambda digest, name: auth.has_joined(factory.auth_timeout, digest, name)),
+        ("pooled", authenticator.has_joined),
+    ]
+
+    print("%-8s %10s %12s %10s %10s %10s" % ("client", "checks", "http reqs", "conns", "p50 ms", "p99 ms"))
+    for name, has_joined in clients:
+        requests, connections = server.requests, site.connections
+        latencies, failures = yield storm(has_joined, args.logins, name)
+        print("%-8s %10d %12d %10d %10.1f %10.1f%s" % (
+            name, args.logins, server.requests - requests, site.connections - connections,
+            (percentile(latencies, 0.5) or 0) * 1000, (percentile(latencies, 0.99) or 0) * 1000,
+            "  (%d failed)" % failures if failures else ""))
+
+    print("pooled authenticator: %s" % ", ".join("%s %d" % (event, count) for event, count in sorted(
+        factory.metrics.events.items()) if event.startswith("auth_")))
+
+    yield authenticator.close()
+    yield port.stopListening()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", default=200, type=int, help="logins in the storm")
+    parser.add_argument("--delay", default=0.05, type=float, help="seconds the stand-in session server takes to answer")
+    parser.add_argument("--concurrency", default=16, type=int, help="session server requests in flight at once")
+    args = parser.parse_args(argv)
+
+    def done(result):
+        reactor.stop()
+        return result
+
+    reactor.callWhenRunning(lambda: run(args).addBoth(done))
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
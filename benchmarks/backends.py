@@ -0,0 +1,125 @@
+# Compares the Twisted and asyncio network backends on loopback: how many logins per second each accepts from many
+# concurrent clients, and the chat fan-out throughput reported by the swarm for each
+#   python -m benchmarks.backends [--logins N] [--concurrency N] [--clients N] [--duration S]
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Tuple
+
+from quarry.types.buffer import Buffer1_19_1, BufferUnderrun
+
+from benchmarks.swarm import ROOT, ServerProcess, free_port
+
+PROTOCOL_VERSION = 760
+
+
+# Logs in with a raw socket, returning once the server has sent "Login Success", or "Join Game" if join is set
+def login(port: int, name: str, join: bool = False):
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        login_with(sock, port, name, join)
+
+
+# Logs in on a connected socket, leaving it open. Returns the receive buffer and compression threshold, so the caller can
+# carry on reading packets.
+def login_with(sock: socket.socket, port: int, name: str, join: bool = False) -> Tuple[Buffer1_19_1, int]:
+    sock.sendall(
+        Buffer1_19_1.pack_packet(Buffer1_19_1.pack_varint(0) +  # Handshake
+                                 Buffer1_19_1.pack_varint(PROTOCOL_VERSION) +
+                                 Buffer1_19_1.pack_string("127.0.0.1") +
+                                 Buffer1_19_1.pack("H", port) +
+                                 Buffer1_19_1.pack_varint(2)) +
+        Buffer1_19_1.pack_packet(Buffer1_19_1.pack_varint(0) +  # Login Start
+                                 Buffer1_19_1.pack_string(name) +
+                                 Buffer1_19_1.pack("??", False, False)))
+
+    buff = Buffer1_19_1()
+    threshold = -1
+    play = False
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            raise RuntimeError("Connection closed during login")
+        buff.add(data)
+
+        while True:
+            buff.save()
+            try:
+                packet = buff.unpack_packet(Buffer1_19_1, threshold)
+            except BufferUnderrun:
+                buff.restore()
+                break
+
+            ident = packet.unpack_varint()
+            if play:
+                if ident == 0x25:  # Join Game
+                    return buff, threshold
+            elif ident == 3:  # Set Compression
+                threshold = packet.unpack_varint()
+            elif ident == 2:  # Login Success
+                if not join:
+                    return buff, threshold
+                play = True
+
+
+def measure_logins(port: int, count: int, concurrency: int) -> float:
+    names = iter(range(count))
+    lock = threading.Lock()
+
+    def run():
+        while True:
+            with lock:
+                index = next(names, None)
+            if index is None:
+                return
+            login(port, "login%d" % index)
+
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return count / (time.perf_counter() - start)
+
+
+# Runs the swarm in its own process, as the reactor can only be run once
+def measure_swarm(backend: str, clients: int, duration: float) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        subprocess.run([sys.executable, "-m", "benchmarks.swarm", "--clients", str(clients),
+                        "--duration", str(duration), "--chat-rate", "0.5", "--churn", "0", "--output", output.name,
+                        "--", "--backend", backend],
+                       cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(output.name) as fd:
+            return json.load(fd)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", default=2000, type=int, help="logins to time for each backend")
+    parser.add_argument("--concurrency", default=16, type=int, help="clients logging in at once")
+    parser.add_argument("--clients", default=200, type=int, help="swarm clients for the chat fan-out measurement")
+    parser.add_argument("--duration", default=10.0, type=float, help="seconds to run the swarm for")
+    args = parser.parse_args(argv)
+
+    print("%-10s %12s %14s %12s %12s" % ("backend", "logins/s", "delivered/s", "p99 ms", "server cpu%"))
+    for backend in ("twisted", "asyncio"):
+        port = free_port()
+        server = ServerProcess(port, ["--backend", backend, "--max-players", str(args.logins + args.concurrency)])
+        try:
+            logins = measure_logins(port, args.logins, args.concurrency)
+        finally:
+            server.stop()
+
+        swarm = measure_swarm(backend, args.clients, args.duration)
+        print("%-10s %12.0f %14.0f %12.2f %12.1f" % (
+            backend, logins, swarm["messages_delivered_per_second"], swarm["fanout_latency_p99_ms"],
+            swarm["server_cpu_percent"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
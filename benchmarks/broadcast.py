@@ -0,0 +1,61 @@
+# Compares encoding a broadcast once per recipient with encoding it once per protocol version
+#   python -m benchmarks.broadcast [players ...]
+import sys
+
+from quarry.types.buffer import buff_types
+
+from benchmarks.utils import make_factory, rate
+
+
+class CountingEncodes:
+    def __init__(self):
+        self.count = 0
+        self.originals = []
+
+    def __enter__(self):
+        for _, cls in buff_types:
+            original = cls.__dict__.get('pack_chat')
+            if original is None:
+                continue
+            self.originals.append((cls, original))
+
+            def counted(*args, _original=original.__func__, **kwargs):
+                self.count += 1
+                return _original(*args, **kwargs)
+
+            setattr(cls, 'pack_chat', classmethod(counted))
+        return self
+
+    def __exit__(self, *exc):
+        for cls, original in self.originals:
+            setattr(cls, 'pack_chat', original)
+
+
+def per_recipient(factory, message):
+    for player in factory.directory.local:
+        factory.send_system(player, message)
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10, 100, 500]
+    print("%8s %10s %14s %14s %14s %14s" % ("players", "versions", "encodes/old", "encodes/new",
+                                           "bcast/s old", "bcast/s new"))
+    for size in sizes:
+        factory = make_factory(size)
+        versions = len({p.protocol_version for p in factory.players})
+
+        with CountingEncodes() as old:
+            per_recipient(factory, "hello")
+        with CountingEncodes() as new:
+            factory.broadcast_system("hello")
+
+        old_rate = rate(lambda: per_recipient(factory, "hello"), 0.5)
+        new_rate = rate(lambda: factory.broadcast_system("hello"), 0.5)
+        for player in factory.players:
+            player.transport.clear()
+
+        print("%8d %10d %14d %14d %14.0f %14.0f" % (size, versions, old.count, new.count, old_rate, new_rate))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,99 @@
+# Measures chat delivery between workers over the chat bus: a message published by one worker's factory is relayed by
+# the hub and broadcast by another worker's factory to its players. Both workers run in this process, so this shows the
+# cost the bus adds to each hop rather than the gain from using more cores, for that run the swarm with --workers.
+#   python -m benchmarks.bus [--players N] [--count N]
+#   python -m benchmarks.swarm --clients 200 -- --workers 4
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from twisted.internet import reactor
+from quarry.types.uuid import UUID
+
+from benchmarks.swarm import percentile
+from benchmarks.utils import make_factory
+from pymcserv.bus import ChatBusHub
+
+
+class Delivery:
+    def __init__(self, source, sink, count: int) -> None:
+        self.source = source
+        self.sink = sink
+        self.count = count
+        self.sender = UUID.from_offline_player("sender")
+        self.sent = {}
+        self.latencies = []
+        self.burst_start = 0.0
+        self.burst_time = 0.0
+
+        broadcast = sink.broadcast_unsigned_chat
+
+        def received(message, sender, sender_name, room, relay=True):
+            broadcast(message, sender, sender_name, room, relay)
+            self.received(int(message))
+
+        sink.broadcast_unsigned_chat = received
+
+    def publish(self, index: int):
+        self.sent[index] = time.perf_counter()
+        self.source.broadcast_unsigned_chat(str(index), self.sender, "sender", self.source.rooms.default)
+
+    def start(self):
+        if self.source.bus.connection is None or self.sink.bus.connection is None:
+            reactor.callLater(0.01, self.start)
+            return
+
+        self.publish(0)
+
+    def received(self, index: int):
+        now = time.perf_counter()
+
+        if index % 100 == 0:
+            for player in self.sink.players:
+                player.transport.clear()
+
+        # First send messages one at a time to measure latency, then all at once to measure throughput
+        if index < self.count:
+            self.latencies.append(now - self.sent[index])
+            if index + 1 < self.count:
+                self.publish(index + 1)
+            else:
+                self.burst_start = time.perf_counter()
+                for burst in range(self.count, self.count * 2):
+                    self.publish(burst)
+        elif index == self.count * 2 - 1:
+            self.burst_time = now - self.burst_start
+            reactor.stop()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default=100, type=int, help="players connected to the receiving worker")
+    parser.add_argument("--count", default=5000, type=int, help="messages to send")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "bus.sock")
+    reactor.listenUNIX(path, ChatBusHub())
+
+    source = make_factory(0)
+    sink = make_factory(args.players)
+    source.connect_bus(path)
+    sink.connect_bus(path)
+
+    delivery = Delivery(source, sink, args.count)
+    reactor.callWhenRunning(delivery.start)
+    reactor.run()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    print("%d players, %d messages" % (args.players, args.count))
+    print("  latency p50 %8.3f ms" % (percentile(delivery.latencies, 0.5) * 1000))
+    print("  latency p99 %8.3f ms" % (percentile(delivery.latencies, 0.99) * 1000))
+    print("  throughput  %8.0f messages/s" % (args.count / delivery.burst_time))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+# Measures appending to the chat log at a sustained rate while the reactor keeps running, and replaying the tail of a
+# log to joining players
+#   python -m benchmarks.chat_log [--rate N] [--duration S] [--replay N]
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+from quarry.types.uuid import UUID
+
+from benchmarks.swarm import percentile
+from benchmarks.utils import rate
+from pymcserv.chat_log import ChatLog
+
+
+class Load:
+    tick = 0.01
+
+    def __init__(self, chat_log: ChatLog, messages_per_second: int, duration: float) -> None:
+        self.chat_log = chat_log
+        self.per_tick = int(messages_per_second * self.tick)
+        self.duration = duration
+        self.sender = UUID.from_offline_player("sender")
+        self.appended = 0
+        self.append_time = 0.0
+        self.expected = 0.0
+        self.delays = []  # How late each tick ran, showing whether anything blocked the reactor
+        self.loop = LoopingCall(self.update)
+
+    def start(self):
+        self.start_time = self.expected = time.perf_counter()
+        self.loop.start(self.tick)
+
+    def update(self):
+        now = time.perf_counter()
+        self.delays.append(max(0.0, now - self.expected))
+        self.expected = now + self.tick
+
+        start = time.perf_counter()
+        for _ in range(self.per_tick):
+            self.appended += 1
+            self.chat_log.append(self.sender, "sender", "lobby", "message number %d from the benchmark" % self.appended)
+        self.append_time += time.perf_counter() - start
+
+        if now - self.start_time >= self.duration:
+            self.loop.stop()
+            reactor.stop()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", default=20000, type=int, help="messages appended per second")
+    parser.add_argument("--duration", default=5.0, type=float, help="seconds to append for")
+    parser.add_argument("--replay", default=50, type=int, help="messages replayed to each joining player")
+    parser.add_argument("--segment-bytes", default=1024 * 1024, type=int, help="size of each log segment")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        chat_log = ChatLog(directory, segment_bytes=args.segment_bytes, retention_bytes=args.segment_bytes * 8)
+        load = Load(chat_log, args.rate, args.duration)
+        reactor.callWhenRunning(load.start)
+        reactor.run()
+
+        print("appended %d messages in %.1f s" % (load.appended, args.duration))
+        print("  append cost       %8.2f us/message" % (load.append_time / load.appended * 1e6))
+        print("  tick delay p50    %8.2f ms" % (percentile(load.delays, 0.5) * 1000))
+        print("  tick delay p99    %8.2f ms" % (percentile(load.delays, 0.99) * 1000))
+        print("  unwritten at end  %8d messages" % len(chat_log.unwritten))
+        chat_log.close()
+
+        # Reopen the log as a restarted server would, then replay from disk
+        chat_log = ChatLog(directory, segment_bytes=args.segment_bytes, retention_bytes=args.segment_bytes * 8)
+        entries = chat_log.tail(args.replay)
+        print("  segments kept     %8d" % len(chat_log.segments))
+        print("  last message      %s" % entries[-1].message)
+        print("  tail(%d)          %8.0f replays/s" % (args.replay, rate(lambda: chat_log.tail(args.replay))))
+        chat_log.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+# Measures command graph packing time for generated graphs
+#   python -m benchmarks.commands [nodes ...]
+import sys
+import time
+
+from quarry.types.buffer import Buffer1_19_1
+
+from pymcserv.commands import parsers
+from pymcserv.commands.nodes import RootCommandNode, LiteralCommandNode, ArgumentCommandNode
+
+
+# Builds a graph of roughly the given size out of "/cmdN <target> <message>" style commands, with every fourth
+# command redirecting back to the root like vanilla's /execute run
+def generate_graph(size: int) -> RootCommandNode:
+    root = RootCommandNode()
+    count = 1
+    while count < size:
+        command = LiteralCommandNode()
+        command.name = "cmd%d" % count
+        command.executable = True
+        root.children.append(command)
+        count += 1
+
+        parent = command
+        for name in ("target", "message"):
+            if count >= size:
+                break
+            argument = ArgumentCommandNode()
+            argument.name = name
+            argument.executable = True
+            argument.parser = "brigadier:string"
+            argument.properties = {"behavior": 1}
+            parent.children.append(argument)
+            parent = argument
+            count += 1
+
+        if len(root.children) % 4 == 0:
+            parent.redirect = root
+
+    return root
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10, 1000, 10000]
+    print("%8s %12s %12s %14s" % ("nodes", "packed", "bytes", "ms/pack"))
+    for size in sizes:
+        root = generate_graph(size)
+        runs = max(1, 20000 // size)
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            nodes, data = parsers.compile_commands(Buffer1_19_1, root)
+        elapsed = (time.perf_counter() - start) / runs
+
+        print("%8d %12d %12d %14.3f" % (size, len(nodes), len(data), elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+# Compares finding players and broadcasting to everyone using the player directory with scanning every connection
+#   python -m benchmarks.directory [players ...]
+import sys
+
+from benchmarks.utils import make_factory, rate
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [100, 1000, 10000]
+    print("%8s %14s %14s %14s %14s" % ("players", "find/s scan", "find/s index", "bcast/s scan", "bcast/s index"))
+
+    for size in sizes:
+        factory = make_factory(size)
+        name = "PLAYER%d" % (size - 1)
+
+        # What /msg and broadcasts did before the directory, walking every connection and checking it is in game
+        def scan_find():
+            for player in factory.players:
+                if player.protocol_mode == 'play' and player.display_name.lower() == name.lower():
+                    return player
+
+        def scan_broadcast():
+            factory.broadcast_packet([player for player in factory.players if player.protocol_mode == 'play'],
+                                     lambda p: factory.pack_system(p, "hello"))
+            clear()
+
+        def index_broadcast():
+            factory.broadcast_packet_all(lambda p: factory.pack_system(p, "hello"))
+            clear()
+
+        def clear():
+            for player in factory.players:
+                player.transport.clear()
+
+        print("%8d %14.0f %14.0f %14.0f %14.0f" % (
+            size, rate(scan_find, 0.5), rate(lambda: factory.directory.find(name), 0.5),
+            rate(scan_broadcast, 0.5), rate(index_broadcast, 0.5)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,51 @@
+# Measures command dispatch throughput over generated command graphs
+#   python -m benchmarks.dispatch [nodes ...]
+import random
+from itertools import cycle
+import sys
+
+from pymcserv.commands.dispatcher import CommandDispatcher, CommandSyntaxError
+
+from benchmarks.commands import generate_graph
+from benchmarks.utils import rate
+
+
+def attach_handlers(root):
+    handler = lambda source, arguments: arguments
+    for command in root.children:
+        node = command
+        while True:
+            if node.executable:
+                node.handler = handler
+            if not node.children:
+                break
+            node = node.children[0]
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10, 1000, 10000]
+    print("%8s %14s %14s %14s" % ("nodes", "compile ms", "dispatch/s", "errors/s"))
+    for size in sizes:
+        root = generate_graph(size)
+        attach_handlers(root)
+
+        compile_rate = rate(lambda: CommandDispatcher(root), 0.5)
+        dispatcher = CommandDispatcher(root)
+
+        commands = ["%s alice hello" % command.name for command in root.children]
+        random.shuffle(commands)
+        commands = cycle(commands)
+        dispatch_rate = rate(lambda: dispatcher.execute(None, next(commands)), 1.0)
+
+        def error():
+            try:
+                dispatcher.execute(None, "unknown alice hello")
+            except CommandSyntaxError as e:
+                e.as_messages()
+        error_rate = rate(error, 0.5)
+
+        print("%8d %14.3f %14.0f %14.0f" % (size, 1000 / compile_rate, dispatch_rate, error_rate))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
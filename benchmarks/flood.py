@@ -0,0 +1,44 @@
+# Compares the cost of a chat message which is broadcast with one rejected by the flood limits
+#   python -m benchmarks.flood [players ...]
+import sys
+
+from benchmarks.utils import make_factory, rate
+
+
+def chat_packet(player, message: str):
+    buff_type = player.buff_type
+    return buff_type(buff_type.pack_string(message) + buff_type.pack("QQ", 0, 0) + buff_type.pack_byte_array(b"")
+                     + buff_type.pack("?", False))
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10, 100, 1000]
+
+    for size in sizes:
+        factory = make_factory(size, versions=(760,))
+        sender = next(iter(factory.players))
+        data = chat_packet(sender, "hello world").read()
+
+        def send():
+            sender.packet_chat_message(sender.buff_type(data))
+            if len(sender.last_seen_tracker) > 1000:
+                sender.last_seen_tracker = type(sender.last_seen_tracker)(factory.max_pending_messages)
+            for player in factory.players:
+                player.transport.clear()
+
+        # Never run out of tokens
+        sender.chat_bucket.rate = sender.chat_bucket.burst = float("inf")
+        factory.chat_fanout.rate = factory.chat_fanout.burst = float("inf")
+        accepted = rate(send)
+
+        # Over the player's limit, but not far enough over to be disconnected
+        sender.chat_bucket.rate = sender.chat_bucket.burst = sender.chat_bucket.tokens = 0
+        factory.chat_kick_excess = float("inf")
+        rejected = rate(lambda: sender.packet_chat_message(sender.buff_type(data)))
+
+        print("%5d players: accepted %8.0f messages/s, rejected %10.0f messages/s (%.0fx cheaper)" % (
+            size, accepted, rejected, rejected / accepted))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
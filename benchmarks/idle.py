@@ -0,0 +1,155 @@
+# Measures what idle connections cost the server. Opens many loopback connections, each from its own address, which send
+# a handshake and then nothing more, as clients waiting to log in do, and logs in a number of players which only answer
+# keep alives. Reports the server's RSS per connection and per player, and the CPU it uses while they are idle.
+#   python -m benchmarks.idle [--connections N] [--players N] [--idle S] [-- server args...]
+import argparse
+import queue
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+
+from quarry.data import packets
+from quarry.types.buffer import Buffer1_19_1, BufferUnderrun
+
+from benchmarks.backends import PROTOCOL_VERSION, login_with
+from benchmarks.swarm import ServerProcess, free_port
+
+KEEP_ALIVE_IN = packets.packet_idents[(PROTOCOL_VERSION, "play", "downstream", "keep_alive")]
+KEEP_ALIVE_OUT = packets.packet_idents[(PROTOCOL_VERSION, "play", "upstream", "keep_alive")]
+
+
+class IdlePlayers(threading.Thread):
+    """
+    Reads everything sent to logged in players and answers their keep alives, so the server keeps them connected.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.selector = selectors.DefaultSelector()
+        self.added = queue.Queue()
+        self.running = True
+
+    def add(self, sock: socket.socket, buff: Buffer1_19_1, threshold: int):
+        self.added.put((sock, buff, threshold))
+
+    def run(self):
+        while self.running:
+            while not self.added.empty():
+                sock, buff, threshold = self.added.get()
+                sock.setblocking(False)
+                self.selector.register(sock, selectors.EVENT_READ, (buff, threshold))
+                self.received(sock, buff, threshold)
+
+            for key, _ in self.selector.select(0.05):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                    continue
+                buff, threshold = key.data
+                buff.add(data)
+                self.received(key.fileobj, buff, threshold)
+
+    def received(self, sock: socket.socket, buff: Buffer1_19_1, threshold: int):
+        while True:
+            buff.save()
+            try:
+                packet = buff.unpack_packet(Buffer1_19_1, threshold)
+            except BufferUnderrun:
+                buff.restore()
+                return
+
+            if packet.unpack_varint() == KEEP_ALIVE_IN:
+                sock.sendall(Buffer1_19_1.pack_packet(Buffer1_19_1.pack_varint(KEEP_ALIVE_OUT) + packet.read(), threshold))
+
+
+# Returns a loopback address for the index'th client, so each client has its own address as on a real server. Linux
+# routes all of 127.0.0.0/8 to loopback.
+def client_address(index: int):
+    index += 2  # Skip 127.0.0.0 and 127.0.0.1
+    return "127.%d.%d.%d" % (index >> 16 & 255, index >> 8 & 255, index & 255), 0
+
+
+# Opens connections which send a login handshake and then stay idle
+def connect_idle(port: int, count: int):
+    handshake = Buffer1_19_1.pack_packet(Buffer1_19_1.pack_varint(0) +
+                                         Buffer1_19_1.pack_varint(PROTOCOL_VERSION) +
+                                         Buffer1_19_1.pack_string("127.0.0.1") +
+                                         Buffer1_19_1.pack("H", port) +
+                                         Buffer1_19_1.pack_varint(2))
+    sockets = []
+    for index in range(count):
+        sock = socket.create_connection(("127.0.0.1", port), source_address=client_address(index))
+        sock.sendall(handshake)
+        sockets.append(sock)
+    return sockets
+
+
+# Waits for the server to settle, then returns its RSS and the CPU it uses over idle seconds, as a percentage
+def measure(server: ServerProcess, idle: float):
+    time.sleep(1)
+    if not idle:
+        return server.rss_bytes(), 0.0
+
+    cpu = server.cpu_seconds()
+    time.sleep(idle)
+    return server.rss_bytes(), (server.cpu_seconds() - cpu) / idle * 100
+
+
+# Starts a server and opens idle connections or logs in idle players, returning the server's RSS before and after
+# and the CPU it uses while they are idle. Memory freed by a process is kept for reuse, so each is measured in a new
+# server.
+def run(name: str, count: int, args):
+    port = free_port()
+    # Connections which don't log in are timed out, so give them long enough to all be open at once
+    server = ServerProcess(port, ["--max-players", str(count + 10), "--connection-timeout", "3600", *args.server_args])
+    players = IdlePlayers()
+    players.start()
+    try:
+        # Log in a first player, so data loaded on first use isn't counted
+        sock = socket.create_connection(("127.0.0.1", port))
+        players.add(sock, *login_with(sock, port, "first", join=True))
+        rss, _ = measure(server, 0)
+
+        if name == "connections":
+            sockets = connect_idle(port, count)
+        else:
+            for index in range(count):
+                sock = socket.create_connection(("127.0.0.1", port), source_address=client_address(index))
+                players.add(sock, *login_with(sock, port, "idle%d" % index, join=True))
+
+        idle_rss, cpu = measure(server, args.idle)
+        return rss, idle_rss, cpu
+    finally:
+        players.running = False
+        server.stop()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", default=10000, type=int, help="idle connections to open")
+    parser.add_argument("--players", default=1000, type=int, help="idle players to log in")
+    parser.add_argument("--idle", default=5.0, type=float, help="seconds to measure CPU use over")
+    parser.add_argument("server_args", nargs="*", help="extra arguments for the server, after --")
+    args = parser.parse_args(argv)
+
+    # Each connection needs a file descriptor here and in the server, which inherits the limit
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = max(args.connections, args.players) + 256
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    print("%-18s %16s %16s %18s %10s" % ("", "baseline RSS MB", "idle RSS MB", "bytes per each", "CPU %"))
+    for name, count in (("connections", args.connections), ("players", args.players)):
+        rss, idle_rss, cpu = run(name, count, args)
+        print("%-18s %16.1f %16.1f %18.0f %10.1f" % (
+            "%d %s" % (count, name), rss / 2 ** 20, idle_rss / 2 ** 20, (idle_rss - rss) / count, cpu))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
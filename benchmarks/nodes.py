@@ -0,0 +1,40 @@
+# Measures the memory used by frozen command graphs and the time taken to build, freeze and serialise them
+#   python -m benchmarks.nodes [nodes ...]
+import sys
+import time
+import tracemalloc
+
+from quarry.types.buffer import Buffer1_19_1
+
+from pymcserv.commands import parsers
+
+from benchmarks.commands import generate_graph
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 10000, 50000]
+    print("%8s %12s %10s %10s %12s %12s" % ("nodes", "bytes/node", "build ms", "freeze ms", "as_dict ms", "pack ms"))
+    for size in sizes:
+        tracemalloc.start()
+        graph = generate_graph(size).freeze()
+        memory = tracemalloc.get_traced_memory()[0]
+        del graph
+        tracemalloc.stop()
+
+        root, build = timed(lambda: generate_graph(size))
+
+        _, freeze = timed(root.freeze)
+        _, as_dict = timed(root.as_dict)
+        _, pack = timed(lambda: parsers.pack_commands(Buffer1_19_1, root))
+
+        print("%8d %12.0f %10.2f %10.2f %12.2f %12.2f" % (size, memory / size, build, freeze, as_dict, pack))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+# Compares the cost of a chat message when every player is in one room with players split across many small rooms
+#   python -m benchmarks.rooms [--players N] [--room-size N]
+import argparse
+import sys
+
+from quarry.types.uuid import UUID
+
+from benchmarks.utils import make_factory, rate
+
+
+def measure(players: int, room_size: int) -> float:
+    factory = make_factory(players, versions=(760,))
+
+    # Move players out of the default room into rooms of the given size
+    if room_size < players:
+        for index, player in enumerate(factory.directory.local):
+            factory.rooms.remove(player)
+            factory.rooms.add(player, factory.rooms.get("room%d" % (index // room_size)))
+
+    for room in factory.rooms.rooms.values():
+        room.player_list.flush()
+
+    room = factory.rooms.find("room0") or factory.rooms.default
+    sender = UUID.from_offline_player("sender")
+
+    def send():
+        factory.broadcast_unsigned_chat("hello", sender, "sender", room, relay=False)
+        for player in room.players:
+            player.transport.clear()
+
+    return rate(send)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default=1000, type=int, help="players on the server")
+    parser.add_argument("--room-size", default=20, type=int, help="players in each small room")
+    args = parser.parse_args(argv)
+
+    one_room = measure(args.players, args.players)
+    small_rooms = measure(args.players, args.room_size)
+    print("%d players" % args.players)
+    print("  one room of %5d    %8.0f messages/s" % (args.players, one_room))
+    print("  rooms of %5d       %8.0f messages/s (%.1fx)" % (args.room_size, small_rooms, small_rooms / one_room))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+# Measures how quickly a restarted server is ready: the time taken to import the factory, the time from starting the
+# process until it accepts its first connection, and how long the first player's login takes, with data packs parsed
+# when needed or mapped from a snapshot
+#   python -m benchmarks.startup [--runs N]
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+from benchmarks.backends import login
+from benchmarks.swarm import ROOT, free_port
+
+
+# Times importing the factory in a new interpreter, optionally also loading every data pack as importing it used to
+def import_time(eager: bool) -> float:
+    code = "import time; start = time.perf_counter(); import pymcserv.factory; %s print(time.perf_counter() - start)" \
+           % ("import quarry.data.data_packs;" if eager else "")
+    return float(subprocess.check_output([sys.executable, "-c", code], cwd=ROOT))
+
+
+# Starts the server, returning the seconds until it accepted a connection and until the first player joined
+def start_server(extra_args) -> Tuple[float, float]:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", "import sys, main; main.main(sys.argv[1:])",
+         "--offline", "-a", "127.0.0.1", "-p", str(port), "--login-rate", "0", *extra_args],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.perf_counter() - start > 30:
+                    raise RuntimeError("Server did not start listening")
+                time.sleep(0.002)
+        accepted = time.perf_counter() - start
+
+        joining = time.perf_counter()
+        login(port, "first", join=True)
+        return accepted, time.perf_counter() - joining
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", default=5, type=int, help="times to repeat each measurement, the median is shown")
+    args = parser.parse_args(argv)
+
+    print("import pymcserv.factory")
+    print("  data packs loaded on import  %8.1f ms" % (median([import_time(True) for _ in range(args.runs)]) * 1000))
+    print("  data packs loaded when used  %8.1f ms" % (median([import_time(False) for _ in range(args.runs)]) * 1000))
+
+    directory = tempfile.mkdtemp()
+    try:
+        snapshot = os.path.join(directory, "data-packs.bin")
+        configurations = [("parse when needed", []),
+                          ("snapshot", ["--data-pack-snapshot", snapshot])]
+
+        # Build the snapshot once, as a rolling restart would find it already written by the previous run
+        start_server(configurations[1][1])
+
+        print("%-20s %18s %18s" % ("", "first accept ms", "first join ms"))
+        for name, extra_args in configurations:
+            results = [start_server(extra_args) for _ in range(args.runs)]
+            print("%-20s %18.1f %18.1f" % (name, median([accepted for accepted, _ in results]) * 1000,
+                                           median([joined for _, joined in results]) * 1000))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
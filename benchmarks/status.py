@@ -0,0 +1,47 @@
+# Compares answering server list pings from the cached status response with building it for every ping
+#   python -m benchmarks.status [players ...]
+import sys
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.testing import StringTransport
+from quarry.net.server import ServerProtocol
+
+from benchmarks.utils import make_factory, rate
+
+
+def make_pinger(factory, protocol_version: int = 760):
+    pinger = factory.buildProtocol(IPv4Address("TCP", "127.0.0.1", 0))
+    pinger.connection_timer.stop()
+    pinger.makeConnection(StringTransport())
+    pinger.protocol_version = protocol_version
+    pinger.buff_type = factory.get_buff_type(protocol_version)
+    pinger.protocol_mode = 'status'
+    factory.players.discard(pinger)
+    return pinger
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [0, 100, 1000]
+
+    for size in sizes:
+        factory = make_factory(size, versions=(760,))
+        factory.status_rate = factory.status_burst = float("inf")
+        pinger = make_pinger(factory)
+        empty = pinger.buff_type(b"")
+
+        def cached():
+            pinger.packet_status_request(empty)
+            pinger.transport.clear()
+
+        def uncached():
+            ServerProtocol.packet_status_request(pinger, empty)
+            pinger.transport.clear()
+
+        cached_rate = rate(cached)
+        uncached_rate = rate(uncached)
+        print("%5d players: cached %8.0f pings/s, uncached %8.0f pings/s (%.1fx)" % (
+            size, cached_rate, uncached_rate, cached_rate / uncached_rate))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,296 @@
+# Starts the server on loopback in offline mode and drives a swarm of simulated clients against it, reporting chat
+# throughput, fan-out latency, login time and server CPU/memory use
+#   python -m benchmarks.swarm --clients 100 --duration 30 --chat-rate 0.5 --output results.json
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+from quarry.net.auth import OfflineProfile
+from quarry.net.client import ClientFactory, ClientProtocol
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = b"swarm:"
+
+
+class SwarmClient(ClientProtocol):
+    def setup(self):
+        self.swarm: Swarm = self.factory.swarm
+        self.started = time.perf_counter()
+        self.joined = False
+        self.chat_timestamp = 0
+
+    def packet_join_game(self, buff):
+        buff.discard()
+        self.joined = True
+        self.swarm.client_joined(self, time.perf_counter() - self.started)
+
+    def packet_keep_alive(self, buff):
+        self.send_packet("keep_alive", buff.read())
+
+    def packet_chat_message(self, buff):
+        self.swarm.chat_received(buff.read())
+
+    def packet_system_message(self, buff):
+        self.swarm.chat_received(buff.read())
+
+    def send_chat(self, message: str):
+        # Timestamps must increase between messages or the server kicks for out-of-order chat
+        self.chat_timestamp = max(self.chat_timestamp + 1, int(time.time() * 1000))
+        self.send_packet("chat_message",
+                         self.buff_type.pack_string(message),
+                         self.buff_type.pack("QQ", self.chat_timestamp, 0),
+                         self.buff_type.pack_byte_array(b""),  # No signature
+                         self.buff_type.pack("?", False))
+
+    def send_tab_complete(self, text: str):
+        self.send_packet("tab_complete", self.buff_type.pack_varint(0), self.buff_type.pack_string(text))
+
+    def connection_lost(self, reason=None):
+        super().connection_lost(reason)
+        self.swarm.client_left(self)
+
+
+class SwarmClientFactory(ClientFactory):
+    protocol = SwarmClient
+    log_level = logging.CRITICAL
+
+    def __init__(self, swarm, name: str, protocol_version: int):
+        super().__init__(OfflineProfile(name))
+        self.swarm = swarm
+        self.force_protocol_version = protocol_version
+
+
+class Swarm:
+    tick = 0.05
+
+    def __init__(self, args) -> None:
+        self.args = args
+        self.clients = set()
+        self.names = 0
+        self.sent = {}
+        self.latencies = []
+        self.login_times = []
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.tab_completes = 0
+        self.reconnects = 0
+        self.disconnects = 0
+        self.stopped = False
+        self.loop = LoopingCall(self.update)
+        self.budget = {"chat": 0.0, "tab": 0.0, "churn": 0.0}
+
+    def connect(self):
+        self.names += 1
+        factory = SwarmClientFactory(self, "swarm%d" % self.names, self.args.protocol_version)
+        factory.connect("127.0.0.1", self.args.port)
+
+    def client_joined(self, client: SwarmClient, login_time: float):
+        self.clients.add(client)
+        self.login_times.append(login_time)
+
+    def client_left(self, client: SwarmClient):
+        if client in self.clients and not self.stopped:
+            self.clients.discard(client)
+            self.disconnects += 1
+
+    def chat_received(self, data: bytes):
+        now = time.perf_counter()
+        index = data.find(TOKEN)
+        if index == -1:
+            return
+
+        end = index + len(TOKEN)
+        while end < len(data) and data[end:end + 1].isdigit():
+            end += 1
+
+        sent = self.sent.get(int(data[index + len(TOKEN):end]))
+        if sent is not None:
+            self.messages_received += 1
+            self.latencies.append(now - sent)
+
+    # Spreads the configured per-second rates over ticks, acting on randomly chosen clients
+    def take(self, kind: str, rate: float) -> int:
+        self.budget[kind] += rate * self.tick
+        count = int(self.budget[kind])
+        self.budget[kind] -= count
+        return count
+
+    def update(self):
+        clients = [client for client in self.clients if client.joined and not client.closed]
+        if not clients:
+            return
+
+        for _ in range(self.take("chat", self.args.chat_rate * len(clients))):
+            self.messages_sent += 1
+            self.sent[self.messages_sent] = time.perf_counter()
+            random.choice(clients).send_chat("%s%d" % (TOKEN.decode(), self.messages_sent))
+
+        for _ in range(self.take("tab", self.args.tab_rate * len(clients))):
+            self.tab_completes += 1
+            random.choice(clients).send_tab_complete(random.choice(("/", "/m", "/msg ", "/msg swarm1")))
+
+        for _ in range(self.take("churn", self.args.churn)):
+            client = random.choice(clients)
+            if not client.closed:
+                self.reconnects += 1
+                self.clients.discard(client)
+                client.close()
+                self.connect()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ServerProcess:
+    def __init__(self, port: int, extra_args) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", "import sys, main; main.main(sys.argv[1:])",
+             "--offline", "-a", "127.0.0.1", "-p", str(port), "--login-rate", "0", *extra_args],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+        # Wait until the server accepts connections
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Server did not start listening")
+
+    # Process IDs of the server and any worker processes it started
+    def pids(self):
+        pids = [self.process.pid]
+        for pid in pids:
+            try:
+                with open("/proc/%d/task/%d/children" % (pid, pid)) as fd:
+                    pids.extend(int(child) for child in fd.read().split())
+            except OSError:
+                pass
+        return pids
+
+    def cpu_seconds(self) -> float:
+        total = 0
+        for pid in self.pids():
+            with open("/proc/%d/stat" % pid) as fd:
+                fields = fd.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])  # utime + stime
+        return total / self.clock_ticks
+
+    def rss_bytes(self) -> int:
+        total = 0
+        for pid in self.pids():
+            with open("/proc/%d/status" % pid) as fd:
+                for line in fd:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        return total
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(10)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(args) -> dict:
+    server = ServerProcess(args.port, ["--max-players", str(args.clients * 2), *args.server_args])
+    swarm = Swarm(args)
+    rss_start = server.rss_bytes()
+
+    # Ramp up connections at the configured join rate
+    for i in range(args.clients):
+        reactor.callLater(i / args.join_rate, swarm.connect)
+
+    ramp = args.clients / args.join_rate
+    measurements = {}
+
+    def start():
+        measurements["cpu"] = server.cpu_seconds()
+        measurements["time"] = time.perf_counter()
+        swarm.loop.start(swarm.tick, now=False)
+
+    def stop():
+        measurements["cpu"] = server.cpu_seconds() - measurements["cpu"]
+        measurements["time"] = time.perf_counter() - measurements["time"]
+        measurements["rss"] = server.rss_bytes()
+        swarm.loop.stop()
+        swarm.stopped = True
+        reactor.stop()
+
+    reactor.callLater(ramp + 1, start)
+    reactor.callLater(ramp + 1 + args.duration, stop)
+    reactor.run()
+    server.stop()
+
+    elapsed = measurements["time"]
+    return {
+        "timestamp": time.time(),
+        "config": {key: value for key, value in vars(args).items()},
+        "clients_joined": len(swarm.login_times),
+        "messages_sent": swarm.messages_sent,
+        "messages_delivered": swarm.messages_received,
+        "messages_sent_per_second": swarm.messages_sent / elapsed,
+        "messages_delivered_per_second": swarm.messages_received / elapsed,
+        "fanout_latency_p50_ms": (percentile(swarm.latencies, 0.5) or 0) * 1000,
+        "fanout_latency_p99_ms": (percentile(swarm.latencies, 0.99) or 0) * 1000,
+        "login_time_p50_ms": (percentile(swarm.login_times, 0.5) or 0) * 1000,
+        "login_time_p99_ms": (percentile(swarm.login_times, 0.99) or 0) * 1000,
+        "tab_completes_sent": swarm.tab_completes,
+        "reconnects": swarm.reconnects,
+        "unexpected_disconnects": swarm.disconnects,
+        "server_cpu_percent": measurements["cpu"] / elapsed * 100,
+        "server_rss_start_bytes": rss_start,
+        "server_rss_end_bytes": measurements["rss"],
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default=50, type=int, help="number of simulated clients")
+    parser.add_argument("--duration", default=10.0, type=float, help="seconds to measure for after ramp up")
+    parser.add_argument("--join-rate", default=50.0, type=float, help="clients connected per second during ramp up")
+    parser.add_argument("--chat-rate", default=0.2, type=float, help="chat messages per second per client")
+    parser.add_argument("--tab-rate", default=0.5, type=float, help="tab completions per second per client")
+    parser.add_argument("--churn", default=1.0, type=float, help="clients reconnected per second across the swarm")
+    parser.add_argument("--protocol-version", default=760, type=int, help="protocol version clients connect with")
+    parser.add_argument("--port", default=None, type=int, help="port to run the server on, random if not given")
+    parser.add_argument("--seed", default=0, type=int, help="random seed")
+    parser.add_argument("--output", default=None, help="file to write JSON results to")
+    parser.add_argument("server_args", nargs="*", help="extra arguments for the server, after --")
+    args = parser.parse_args(argv)
+
+    if args.port is None:
+        args.port = free_port()
+    random.seed(args.seed)
+
+    results = run(args)
+
+    for key, value in results.items():
+        if key != "config":
+            print("%-32s %s" % (key, round(value, 3) if isinstance(value, float) else value))
+
+    if args.output is not None:
+        with open(args.output, "w") as fd:
+            json.dump(results, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import time
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.testing import StringTransport
+from quarry.types.uuid import UUID
+
+from pymcserv.factory import PyMcServFactory
+from pymcserv.protocols.play import PyMcServProtocol
+
+
+# Creates a connection in play mode attached to an in-memory transport, without going through the login sequence
+def make_player(factory: PyMcServFactory, name: str, protocol_version: int = 760,
+                compression_threshold: int = 256, port: int = 0) -> PyMcServProtocol:
+    player = factory.buildProtocol(IPv4Address("TCP", "127.0.0.1", port))
+    player.connection_timer.stop()
+    player.makeConnection(StringTransport())
+    player.protocol_version = protocol_version
+    player.buff_type = factory.get_buff_type(protocol_version)
+    player.protocol_mode = 'play'
+    player.in_game = True
+    player.display_name = name
+    player.uuid = UUID.from_offline_player(name)
+    player.compression_threshold = compression_threshold
+    player.setup_play()
+    factory.players.add(player)
+    factory.directory.add(player)
+    factory.rooms.add(player, factory.rooms.default)
+    return player
+
+
+def make_factory(players: int = 0, versions=(758, 759, 760)) -> PyMcServFactory:
+    factory = PyMcServFactory()
+    factory.online_mode = False
+    for i in range(players):
+        make_player(factory, "player%d" % i, versions[i % len(versions)], port=i)
+    return factory
+
+
+# Runs fn repeatedly for at least the given duration, returning calls per second
+def rate(fn, duration: float = 1.0) -> float:
+    calls = 0
+    start = time.perf_counter()
+    end = start + duration
+    while True:
+        fn()
+        calls += 1
+        now = time.perf_counter()
+        if now >= end:
+            return calls / (now - start)
@@ -0,0 +1,61 @@
+# Compares chat signature verification throughput inline and on worker pools
+#   python -m benchmarks.verify [messages] [workers]
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.hashes import SHA256
+from quarry.net.auth import PlayerPublicKey
+from quarry.types.chat import SignedMessage, SignedMessageHeader, SignedMessageBody
+from quarry.types.uuid import UUID
+
+from pymcserv.protocols.verify import SignatureVerifier
+
+
+# Creates a chain of 1.19.1 signed messages from a single player
+def make_messages(count: int):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_key = PlayerPublicKey(0, private_key.public_key(), b"")
+    sender = UUID.from_offline_player("benchmark")
+
+    messages = []
+    previous_signature = None
+    for i in range(count):
+        header = SignedMessageHeader(sender, previous_signature)
+        body = SignedMessageBody("message %d" % i, int(time.time() * 1000), i)
+        data = (previous_signature or b"") + sender.bytes + body.digest()
+        previous_signature = private_key.sign(data, PKCS1v15(), SHA256())
+        messages.append(SignedMessage(header, previous_signature, 760, body))
+
+    return messages, public_key
+
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 2000
+    workers = int(argv[1]) if len(argv) > 1 else os.cpu_count() or 1
+    messages, public_key = make_messages(count)
+
+    start = time.perf_counter()
+    assert all(message.verify(public_key.key) for message in messages)
+    print("%-20s %10.0f msg/s" % ("inline", count / (time.perf_counter() - start)))
+
+    for processes in (False, True):
+        verifier = SignatureVerifier(workers, processes)
+        wait([verifier.submit(messages[0], public_key)])  # Start workers
+
+        start = time.perf_counter()
+        futures = [verifier.submit(message, public_key) for message in messages]
+        wait(futures)
+        elapsed = time.perf_counter() - start
+        assert all(future.result() for future in futures)
+
+        name = "%d %s" % (workers, "processes" if processes else "threads")
+        print("%-20s %10.0f msg/s" % (name, count / elapsed))
+        verifier.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
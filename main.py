@@ -1,6 +1,4 @@
-from quarry.net.server import reactor
-
-from pymcserv.factory import *
+import os
 
 
 def main(argv):
@@ -10,15 +8,92 @@ def main(argv):
     parser.add_argument("-a", "--host", default="", help="address to listen on")
     parser.add_argument("-p", "--port", default=25565, type=int, help="port to listen on")
     parser.add_argument("--offline", action="store_true", help="offline server")
+    parser.add_argument("--max-players", default=None, type=int, help="maximum number of players, 20 by default")
+    parser.add_argument("--max-concurrent-logins", default=None, type=int,
+                        help="logins which can be in progress at once, others wait in a queue. 8 by default, 0 for "
+                             "no limit")
+    parser.add_argument("--login-queue-size", default=None, type=int,
+                        help="logins which can wait in the queue, 1024 by default")
+    parser.add_argument("--login-rate", default=None, type=float,
+                        help="logins each address can start per second, in bursts of 5. 0 by default, for no limit, as "
+                             "players behind a shared NAT or proxy share an address")
+    parser.add_argument("--connection-timeout", default=None, type=float,
+                        help="seconds a connection can go without sending a packet, 30 by default")
+    parser.add_argument("--op", action="append", default=[], help="player to give admin commands, can be repeated")
+    parser.add_argument("--metrics-port", default=None, type=int,
+                        help="port to serve Prometheus metrics on, only reachable from localhost")
+    parser.add_argument("--verify-workers", default=0, type=int,
+                        help="number of workers used to verify chat signatures, 0 verifies them inline")
+    parser.add_argument("--verify-processes", action="store_true",
+                        help="verify chat signatures in worker processes instead of threads")
+    parser.add_argument("--chat-log", default=None,
+                        help="directory to keep a chat log in, replayed to joining players. Each worker uses its own "
+                             "subdirectory")
+    parser.add_argument("--workers", default=1, type=int,
+                        help="number of processes to share the port between, metrics are served on consecutive ports")
+    parser.add_argument("--data-pack-snapshot", default=None,
+                        help="file to keep packed data packs in, so they are memory mapped at startup instead of "
+                             "parsed. Built if missing or out of date")
+    parser.add_argument("--backend", default="twisted", choices=("twisted", "asyncio"),
+                        help="network backend, asyncio uses uvloop if it is installed")
+    parser.add_argument("--bus", default=None, help=argparse.SUPPRESS)  # Chat bus to join as a worker
+    parser.add_argument("--worker-index", default=0, type=int, help=argparse.SUPPRESS)
     args = parser.parse_args(argv)
 
+    # The reactor has to be installed before anything imports it
+    if args.backend == "asyncio":
+        from pymcserv.asyncio_backend import install
+        install()
+
+    from quarry.net.server import reactor
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.metrics import listen_metrics
+
+    # Start worker processes which run the server
+    if args.workers > 1 and args.bus is None:
+        from pymcserv.workers import run_workers
+        run_workers(args.workers, os.path.abspath(__file__), argv)
+        return
+
     # Create factory
     factory = PyMcServFactory()
 
     factory.online_mode = not args.offline
+    if args.max_players is not None:
+        factory.max_players = args.max_players
+    if args.max_concurrent_logins is not None:
+        factory.max_concurrent_logins = args.max_concurrent_logins
+    if args.login_queue_size is not None:
+        factory.login_queue_size = args.login_queue_size
+    if args.login_rate is not None:
+        factory.login_rate = args.login_rate
+    if args.connection_timeout is not None:
+        factory.connection_timeout = args.connection_timeout
+    factory.operators = frozenset(args.op)
+    factory.verify_workers = args.verify_workers
+    factory.verify_processes = args.verify_processes
+
+    if args.data_pack_snapshot is not None:
+        factory.data_pack_snapshot = args.data_pack_snapshot
+        factory.data_packs  # Map the snapshot now rather than when the first player joins
+
+    if args.chat_log is not None:
+        if args.bus is not None:
+            args.chat_log = os.path.join(args.chat_log, "worker-%d" % args.worker_index)
+        factory.chat_log_directory = args.chat_log
 
     # Listen
-    factory.listen(args.host, args.port)
+    if args.bus is not None:
+        factory.connect_bus(args.bus)
+
+    if args.backend == "asyncio":
+        from pymcserv.asyncio_backend import listen
+        listen(factory, args.host, args.port, reuse_port=args.bus is not None)
+    else:
+        factory.listen(args.host, args.port, reuse_port=args.bus is not None)
+
+    if args.metrics_port is not None:
+        listen_metrics(factory.metrics, args.metrics_port + args.worker_index)
     reactor.run()
 
 
@@ -0,0 +1,128 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from twisted.internet import reactor
+from quarry.net.protocol import ProtocolError
+
+from pymcserv.flood import AddressLimits
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from twisted.internet.base import DelayedCall
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.login import LoginProtocol
+
+
+class AdmissionController:
+    """
+    Decides when logins go ahead, so a mass reconnect doesn't run every encryption handshake, session check and join
+    at once. Only a limited number of logins are in progress at a time, from "Login Start" until the player is in game.
+    Other logins wait in a queue in the order they arrived, and are periodically told their position.
+    Players in game on every worker plus logins in progress never exceed the player cap. Logins over the cap are
+    turned away, rather than queued, as the wait could be unbounded.
+    Also limits how often each address can start logging in, remembering a bounded number of addresses.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.logging_in: Dict[LoginProtocol, None] = {}  # Logins in progress
+        self.joined_logins: Dict[LoginProtocol, None] = {}  # Logins in progress whose players are already in game
+        self.queue: OrderedDict[LoginProtocol, Callable[[], None]] = OrderedDict()  # Waiting logins and how to start them
+        self.limits = AddressLimits()  # Login limits by address
+        self.update_call: Optional[DelayedCall] = None
+        self.admitting = False
+
+    # Returns whether an address may start logging in now
+    def allow(self, host: str) -> bool:
+        if self.factory.login_rate <= 0:
+            return True
+
+        return self.limits.take(host, self.factory.login_rate, self.factory.login_burst,
+                                self.factory.login_limit_addresses)
+
+    def has_capacity(self) -> bool:
+        concurrent = self.factory.max_concurrent_logins
+        return concurrent <= 0 or len(self.logging_in) < concurrent
+
+    # Returns whether the player cap is reached, counting players in game on every worker and logins in progress on
+    # this one. Logins in progress on other workers aren't known, so each worker can overshoot the cap by at most its
+    # own max_concurrent_logins while they finish.
+    def is_full(self) -> bool:
+        players = len(self.factory.directory) + len(self.logging_in) - len(self.joined_logins)
+        return players >= self.factory.max_players
+
+    # Starts the login now if there is capacity and nobody is waiting, otherwise queues it. Turns it away if the server
+    # or the queue is full.
+    def admit(self, player: LoginProtocol, start: Callable[[], None]):
+        if self.is_full():
+            self.refuse(player)
+            return
+
+        if not self.queue and self.has_capacity():
+            self.start(player, start)
+            return
+
+        if len(self.queue) >= self.factory.login_queue_size:
+            self.factory.metrics.count_event("login_queue_full")
+            player.close("Server is full")
+            return
+
+        self.factory.metrics.count_event("login_queued")
+        self.queue[player] = start
+        player.send_queue_position(len(self.queue))
+
+        if self.update_call is None:
+            self.update_call = reactor.callLater(self.factory.login_queue_update_interval, self.send_positions)
+
+    # Starts a login, which holds a slot until it finishes. The login's "Login Start" packet is only handled now, so a
+    # protocol error in it closes that connection here, rather than escaping into whichever connection let it start.
+    def start(self, player: LoginProtocol, start: Callable[[], None]):
+        if self.is_full():
+            self.refuse(player)
+            return
+
+        self.logging_in[player] = None
+
+        try:
+            start()
+        except ProtocolError as e:
+            self.logging_in.pop(player, None)
+            player.protocol_error(e)
+
+    def refuse(self, player: LoginProtocol):
+        self.factory.metrics.count_event("login_server_full")
+        player.close("Server is full")
+
+    # Called when a player is in game. Their login keeps its place until the reactor's next turn, so logins which
+    # complete straight away, e.g. in offline mode, can't take every turn, leaving time for players already in game.
+    def joined(self, player: LoginProtocol):
+        self.joined_logins[player] = None
+        reactor.callLater(0, self.finished, player)
+
+    # Called when a login completes or a connection closes, starting queued logins which now fit
+    def finished(self, player: LoginProtocol):
+        self.logging_in.pop(player, None)
+        self.joined_logins.pop(player, None)
+        self.queue.pop(player, None)
+
+        # Connections closed while starting their login finish while being admitted
+        if self.admitting:
+            return
+
+        self.admitting = True
+        try:
+            while self.queue and self.has_capacity():
+                self.start(*self.queue.popitem(last=False))
+        finally:
+            self.admitting = False
+
+    # Tells queued clients their position, which also keeps their connections from timing out
+    def send_positions(self):
+        self.update_call = None
+
+        for position, player in enumerate(self.queue, 1):
+            player.send_queue_position(position)
+
+        if self.queue:
+            self.update_call = reactor.callLater(self.factory.login_queue_update_interval, self.send_positions)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import asyncio
+from typing import Optional
+
+from twisted.internet.address import IPv4Address, IPv6Address
+from twisted.internet.error import ConnectionDone, ConnectionLost
+from twisted.python.failure import Failure
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+
+
+# Runs Twisted's reactor on an asyncio event loop, using uvloop if it is installed. This must be called before
+# anything imports the reactor. Returns the name of the event loop used.
+def install() -> str:
+    try:
+        import uvloop
+    except ImportError:
+        loop = asyncio.new_event_loop()
+    else:
+        loop = uvloop.new_event_loop()
+
+    asyncio.set_event_loop(loop)
+
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install(loop)
+
+    return type(loop).__module__.split(".")[0]
+
+
+# Listens for connections with the event loop's own transports, which do their socket work without going through
+# Twisted. The reactor must have been installed with install(), and this must be called before it is started.
+def listen(factory: PyMcServFactory, host: str, port: int = 25565, reuse_port: bool = False) -> asyncio.AbstractServer:
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(loop.create_server(lambda: AsyncioConnection(factory), host or None, port,
+                                                      reuse_port=reuse_port))
+
+
+class AsyncioConnection(asyncio.Protocol):
+    """
+    Drives a PyMcServProtocol from an asyncio connection, so the same packet handlers and broadcasts run on either
+    backend.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.transport: Optional[AsyncioTransport] = None
+        self.protocol: Optional[PyMcServProtocol] = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = AsyncioTransport(transport)
+        self.protocol = self.factory.buildProtocol(self.transport.getPeer())
+
+        if self.protocol is None:
+            transport.close()
+        else:
+            self.protocol.makeConnection(self.transport)
+
+    def data_received(self, data: bytes):
+        self.protocol.dataReceived(data)
+
+    def eof_received(self):
+        return False  # Close the connection
+
+    def connection_lost(self, exc: Optional[Exception]):
+        if self.protocol is None:
+            return
+
+        self.protocol.connectionLost(Failure(ConnectionDone() if exc is None else ConnectionLost(str(exc))))
+        self.protocol = None
+
+    def pause_writing(self):
+        if self.transport.producer is not None:
+            self.transport.producer.pauseProducing()
+
+    def resume_writing(self):
+        if self.transport.producer is not None:
+            self.transport.producer.resumeProducing()
+
+
+class AsyncioTransport:
+    """
+    The parts of Twisted's TCP transport interface used by the protocols, on top of an asyncio transport.
+    """
+
+    def __init__(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.producer = None
+
+    # Bytes buffered before the producer is paused, like Twisted the producer is resumed once the buffer is empty
+    @property
+    def bufferSize(self) -> int:
+        return self.transport.get_write_buffer_limits()[1]
+
+    @bufferSize.setter
+    def bufferSize(self, size: int):
+        self.transport.set_write_buffer_limits(high=size, low=0)
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    def writeSequence(self, data):
+        self.transport.writelines(data)
+
+    def loseConnection(self):
+        self.transport.close()
+
+    def abortConnection(self):
+        self.transport.abort()
+
+    def registerProducer(self, producer, streaming: bool):
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def get_write_buffer_size(self) -> int:
+        return self.transport.get_write_buffer_size()
+
+    def getPeer(self):
+        return self.make_address(self.transport.get_extra_info("peername"))
+
+    def getHost(self):
+        return self.make_address(self.transport.get_extra_info("sockname"))
+
+    @staticmethod
+    def make_address(address):
+        host, port = address[:2]
+        return (IPv6Address if ":" in host else IPv4Address)("TCP", host, port)
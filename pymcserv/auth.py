@@ -0,0 +1,84 @@
+from __future__ import annotations
+import json
+import logging
+from urllib.parse import urlencode
+
+from twisted.internet import reactor
+from twisted.internet.defer import CancelledError, Deferred, DeferredSemaphore
+from twisted.python.failure import Failure
+from twisted.web.client import Agent, HTTPConnectionPool, ResponseNeverReceived, readBody
+from quarry.net.auth import AuthException
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+
+
+class SessionAuthenticator:
+    """
+    Checks online mode logins with the session server.
+    Requests reuse a pool of persistent connections and only a limited number are in flight at once, with further
+    checks waiting their turn.
+    Checks are never cached or shared. The server hash is made from the shared secret of one connection, so no two
+    logins have the same one, and it is what proves the client joined this server. Reusing a check made under a name
+    alone would let anyone log in as a player who had recently been verified.
+    """
+
+    logger = logging.getLogger("pymcserv")
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.pool.maxPersistentPerHost = factory.auth_concurrency
+        self.agent = Agent(reactor, pool=self.pool)
+        self.semaphore = DeferredSemaphore(factory.auth_concurrency)
+
+    # Checks that the player has joined the server, calling back with their profile
+    def has_joined(self, digest: str, display_name: str, remote_host: str = None) -> Deferred:
+        self.factory.metrics.count_event("auth_request")
+
+        deferred = self.semaphore.run(self.request, digest, display_name, remote_host)
+        deferred.addTimeout(self.factory.auth_timeout, reactor)
+        deferred.addErrback(self.failed)
+        return deferred
+
+    def request(self, digest: str, display_name: str, remote_host: str = None) -> Deferred:
+        query = {"username": display_name, "serverId": digest}
+        if remote_host:
+            query["ip"] = remote_host
+
+        url = self.factory.session_server + "hasJoined?" + urlencode(query)
+        deferred = self.agent.request(b"GET", url.encode("ascii"))
+        deferred.addCallbacks(self.response, self.cancelled)
+        return deferred
+
+    # Cancelling a request before its response arrives fails it with ResponseNeverReceived. It is turned back into a
+    # cancellation, so a check which times out fails with TimeoutError.
+    @staticmethod
+    def cancelled(failure: Failure) -> Failure:
+        failure.trap(ResponseNeverReceived)
+        if any(reason.check(CancelledError) for reason in failure.value.reasons):
+            raise CancelledError()
+        return failure
+
+    def response(self, response) -> Deferred:
+        def parse(body: bytes) -> dict:
+            if response.code == 200 and body:
+                return json.loads(body)
+            if response.code == 204 or response.code == 200:
+                raise AuthException("No Content", "No content was returned by the server")
+
+            try:
+                error = json.loads(body)
+                raise AuthException(error["error"], error["errorMessage"])
+            except (ValueError, KeyError, TypeError):
+                raise AuthException("HTTP %d" % response.code, body.decode("utf8", "replace"))
+
+        return readBody(response).addCallback(parse)
+
+    def failed(self, failure: Failure) -> Failure:
+        self.factory.metrics.count_event("auth_failed")
+        return failure
+
+    def close(self) -> Deferred:
+        return self.pool.closeCachedConnections()
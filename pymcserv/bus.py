@@ -0,0 +1,265 @@
+from __future__ import annotations
+import logging
+from typing import Dict, Iterable, List, Optional, Union
+
+from twisted.internet import reactor
+from twisted.internet.protocol import ClientFactory, Factory
+from twisted.protocols.basic import Int32StringReceiver
+from quarry.net.auth import PlayerPublicKey
+from quarry.types.buffer import Buffer1_19_1
+from quarry.types.chat import Message, SignedMessage
+from quarry.types.uuid import UUID
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+    from pymcserv.rooms import Room
+
+# Bus messages are packed with the same buffer type as 1.19.1 packets, which can pack every chat and player type
+Buffer = Buffer1_19_1
+
+
+class RemotePlayer:
+    """
+    A player connected to another worker process. Stands in for the player's protocol in this worker's player list
+    and tab completions, so only has the attributes those need.
+    """
+
+    __slots__ = ("uuid", "display_name", "latency", "public_key_data", "room", "player_list_entry")
+    protocol_mode = "play"
+
+    def __init__(self, uuid: UUID, display_name: str, latency: int, public_key_data: Optional[PlayerPublicKey]):
+        self.uuid = uuid
+        self.display_name = display_name
+        self.latency = latency
+        self.public_key_data = public_key_data
+        self.room: Optional[Room] = None
+        self.player_list_entry = None
+
+
+# Length-prefixed bus messages, each starting with a string naming the message type
+class BusProtocol(Int32StringReceiver):
+    MAX_LENGTH = 1024 * 1024
+
+    def connectionMade(self):
+        self.factory.bus_connected(self)
+
+    def connectionLost(self, reason=None):
+        self.factory.bus_disconnected(self)
+
+    def stringReceived(self, data: bytes):
+        self.factory.bus_received(self, data)
+
+
+class ChatBusHub(Factory):
+    """
+    Relays bus messages between worker processes. Remembers the players each worker has announced and the rooms they
+    are in, so workers which connect later are sent the players already online, and the players of workers which exit
+    are removed everywhere.
+    """
+
+    protocol = BusProtocol
+
+    def __init__(self) -> None:
+        # Join message and latest room message of each worker's online players
+        self.workers: Dict[BusProtocol, Dict[UUID, List[bytes]]] = {}
+
+    def bus_connected(self, worker: BusProtocol):
+        for players in self.workers.values():
+            for messages in players.values():
+                for data in messages:
+                    worker.sendString(data)
+
+        self.workers[worker] = {}
+
+    def bus_disconnected(self, worker: BusProtocol):
+        for uuid in self.workers.pop(worker, {}):
+            self.relay(worker, Buffer.pack_string("leave") + Buffer.pack_uuid(uuid))
+
+    def bus_received(self, worker: BusProtocol, data: bytes):
+        buff = Buffer(data)
+        kind = buff.unpack_string()
+
+        if kind == "join":
+            self.workers[worker][buff.unpack_uuid()] = [data]
+        elif kind == "room":
+            messages = self.workers[worker].get(buff.unpack_uuid())
+            if messages is not None:
+                messages[1:] = [data]
+        elif kind == "leave":
+            self.workers[worker].pop(buff.unpack_uuid(), None)
+
+        self.relay(worker, data)
+
+    def relay(self, source: BusProtocol, data: bytes):
+        for worker in self.workers:
+            if worker is not source:
+                worker.sendString(data)
+
+
+class ChatBus(ClientFactory):
+    """
+    Connects a worker process to the hub. Publishes the chat messages, system messages and player list changes of this
+    worker's players, and delivers those published by other workers to this worker's players.
+    """
+
+    protocol = BusProtocol
+    logger = logging.getLogger("pymcserv")
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.connection: Optional[BusProtocol] = None
+        self.queued: List[bytes] = []  # Messages published before the connection was made
+
+    def connect(self, path: str):
+        reactor.connectUNIX(path, self)
+
+    def bus_connected(self, connection: BusProtocol):
+        self.connection = connection
+
+        for data in self.queued:
+            connection.sendString(data)
+        self.queued = []
+
+    def bus_disconnected(self, connection: BusProtocol):
+        self.connection = None
+        self.logger.warning("Lost connection to chat bus")
+
+        # Other workers' players can no longer be reached
+        for player in list(self.factory.directory.remote.values()):
+            self.remove_player(player.uuid)
+
+    def clientConnectionFailed(self, connector, reason):
+        self.logger.error("Failed to connect to chat bus: {}".format(reason.getErrorMessage()))
+
+    def publish(self, kind: str, *data: bytes):
+        data = Buffer.pack_string(kind) + b"".join(data)
+
+        if self.connection is None:
+            self.queued.append(data)
+        else:
+            self.connection.sendString(data)
+
+    def bus_received(self, connection: BusProtocol, data: bytes):
+        buff = Buffer(data)
+        handler = getattr(self, "message_" + buff.unpack_string(), None)
+
+        if handler is not None:
+            handler(buff)
+
+    def publish_join(self, player: PyMcServProtocol):
+        self.publish("join",
+                     Buffer.pack_uuid(player.uuid),
+                     Buffer.pack_string(player.display_name),
+                     Buffer.pack_varint(player.latency),
+                     Buffer.pack_optional(Buffer.pack_player_public_key, player.public_key_data),
+                     Buffer.pack_string(player.room.name))
+
+    def message_join(self, buff: Buffer):
+        player = RemotePlayer(buff.unpack_uuid(), buff.unpack_string(), buff.unpack_varint(),
+                              buff.unpack_optional(buff.unpack_player_public_key))
+
+        # Replace any earlier entry for the same player, e.g. if they reconnected to another worker
+        self.remove_player(player.uuid)
+
+        self.factory.directory.add(player)
+        self.factory.rooms.add(player, self.factory.rooms.get(buff.unpack_string()))
+        self.factory.status.invalidate()
+
+    def publish_room(self, player: PyMcServProtocol):
+        self.publish("room", Buffer.pack_uuid(player.uuid), Buffer.pack_string(player.room.name))
+
+    def message_room(self, buff: Buffer):
+        player = self.factory.directory.remote.get(buff.unpack_uuid())
+
+        if player is not None:
+            self.factory.rooms.remove(player)
+            self.factory.rooms.add(player, self.factory.rooms.get(buff.unpack_string()))
+
+    def publish_leave(self, player: PyMcServProtocol):
+        self.publish("leave", Buffer.pack_uuid(player.uuid))
+
+    def message_leave(self, buff: Buffer):
+        self.remove_player(buff.unpack_uuid())
+
+    def remove_player(self, uuid: UUID):
+        player = self.factory.directory.remote.get(uuid)
+
+        if player is not None:
+            self.factory.directory.remove(player)
+            self.factory.rooms.remove(player)
+            self.factory.status.invalidate()
+
+    def publish_latency(self, players: Iterable[PyMcServProtocol]):
+        players = list(players)
+        self.publish("latency", Buffer.pack_varint(len(players)),
+                     *(Buffer.pack_uuid(player.uuid) + Buffer.pack_varint(player.latency) for player in players))
+
+    def message_latency(self, buff: Buffer):
+        for _ in range(buff.unpack_varint()):
+            player = self.factory.directory.remote.get(buff.unpack_uuid())
+            latency = buff.unpack_varint()
+
+            if player is not None:
+                player.latency = latency
+                player.room.player_list.update_latency(player)
+
+    def publish_signed_chat(self, message: SignedMessage, sender_name: str, room: Room):
+        self.publish("signed_chat",
+                     Buffer.pack_string(room.name),
+                     Buffer.pack_varint(message.signature_version),
+                     Buffer.pack('?', message.signature is not None),
+                     Buffer.pack_signed_message(message),
+                     Buffer.pack_string(sender_name))
+
+    def message_signed_chat(self, buff: Buffer):
+        room = self.factory.rooms.find(buff.unpack_string())
+        signature_version = buff.unpack_varint()
+        signed = buff.unpack('?')
+        message = buff.unpack_signed_message()
+        message.signature_version = signature_version
+        if not signed:
+            message.signature = None
+
+        if room is not None:
+            self.factory.broadcast_signed_chat(message, buff.unpack_string(), room, relay=False)
+
+    def publish_unsigned_chat(self, message: str, sender: UUID, sender_name: str, room: Room):
+        self.publish("unsigned_chat",
+                     Buffer.pack_string(room.name),
+                     Buffer.pack_string(message),
+                     Buffer.pack_uuid(sender),
+                     Buffer.pack_string(sender_name))
+
+    def message_unsigned_chat(self, buff: Buffer):
+        room = self.factory.rooms.find(buff.unpack_string())
+
+        if room is not None:
+            self.factory.broadcast_unsigned_chat(buff.unpack_string(), buff.unpack_uuid(), buff.unpack_string(), room,
+                                                 relay=False)
+
+    def publish_system(self, message: Union[str, Message], essential: bool, room: Optional[Room]):
+        self.publish("system", Buffer.pack_chat(message), Buffer.pack('?', essential),
+                     Buffer.pack_optional(Buffer.pack_string, None if room is None else room.name))
+
+    def message_system(self, buff: Buffer):
+        message = buff.unpack_chat()
+        essential = buff.unpack('?')
+        name = buff.unpack_optional(buff.unpack_string)
+
+        room = None if name is None else self.factory.rooms.find(name)
+        if name is None or room is not None:
+            self.factory.broadcast_system(message, essential, relay=False, room=room)
+
+    # Sends a system message to one player connected to another worker
+    def publish_private(self, uuid: UUID, message: Union[str, Message]):
+        self.publish("private", Buffer.pack_uuid(uuid), Buffer.pack_chat(message))
+
+    def message_private(self, buff: Buffer):
+        uuid = buff.unpack_uuid()
+        message = buff.unpack_chat()
+
+        player = self.factory.directory.find_uuid(uuid)
+        if player is not None and not isinstance(player, RemotePlayer):
+            self.factory.send_system(player, message)
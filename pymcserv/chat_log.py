@@ -0,0 +1,389 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+import mmap
+import os
+import struct
+import time
+
+from twisted.internet import reactor
+from quarry.types.uuid import UUID
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from twisted.internet.interfaces import IDelayedCall
+    from pymcserv.metrics import Metrics
+
+logger = logging.getLogger("pymcserv")
+
+# Each record is a 4 byte length followed by the timestamp in milliseconds, sender UUID, sender name length, room name
+# length, sender name, room name and message, all UTF-8. Each index entry is the 4 byte offset of a record in its
+# segment.
+RECORD_LENGTH = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<Q16sHH")
+INDEX_ENTRY = struct.Struct("<I")
+
+
+class ChatLogEntry(NamedTuple):
+    timestamp: int  # Milliseconds since the epoch
+    sender: UUID
+    sender_name: str
+    room: str
+    message: str
+
+
+def pack_record(entry: ChatLogEntry) -> bytes:
+    name = entry.sender_name.encode("utf-8")
+    room = entry.room.encode("utf-8")
+    body = RECORD_HEADER.pack(entry.timestamp, entry.sender.bytes, len(name), len(room)) + name + room + \
+        entry.message.encode("utf-8")
+    return RECORD_LENGTH.pack(len(body)) + body
+
+
+# Unpacks the record starting at the given offset, after its length
+def unpack_record(data, offset: int, length: int) -> ChatLogEntry:
+    timestamp, sender, name_length, room_length = RECORD_HEADER.unpack_from(data, offset)
+    start = offset + RECORD_HEADER.size
+    room_start = start + name_length
+    message_start = room_start + room_length
+    return ChatLogEntry(timestamp, UUID(bytes=sender),
+                        data[start:room_start].decode("utf-8"),
+                        data[room_start:message_start].decode("utf-8"),
+                        data[message_start:offset + length].decode("utf-8"))
+
+
+# Returns the UTF-8 room name of the record starting at the given offset, after its length
+def record_room(data, offset: int) -> bytes:
+    _, _, name_length, room_length = RECORD_HEADER.unpack_from(data, offset)
+    start = offset + RECORD_HEADER.size + name_length
+    return data[start:start + room_length]
+
+
+class Segment:
+    __slots__ = ("first", "size", "count", "written", "written_size", "modified")
+
+    def __init__(self, first: int, size: int = 0, count: int = 0, modified: float = None) -> None:
+        self.first = first  # Sequence number of the segment's first record, also used as its file name
+        self.size = size  # Bytes of records assigned to the segment, including any not yet written
+        self.count = count  # Number of records assigned to the segment, including any not yet written
+        self.written = count  # Number of records written to disk, which can be read back
+        self.written_size = size  # Bytes of records written to disk
+        self.modified = time.time() if modified is None else modified  # Time of the last record
+
+
+class ChatLog:
+    """
+    Append-only log of chat messages, split into segment files which are each paired with an index of record offsets.
+    Records are collected on the reactor thread and written in batches on a single writer thread, so disk writes never
+    block the reactor. The most recent records are read back through memory maps of the segment and index files, so
+    replaying them to joining players reads only the pages holding those records.
+    Segments are started once they reach segment_bytes, and the oldest are deleted once the log exceeds
+    retention_bytes or they are older than retention_seconds.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 retention_bytes: int = 256 * 1024 * 1024, retention_seconds: float = 7 * 24 * 60 * 60,
+                 flush_delay: float = 0.05, max_unwritten: int = 100000, max_scan: int = 10000,
+                 metrics: Metrics = None) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.flush_delay = flush_delay
+        self.max_unwritten = max_unwritten
+        self.max_scan = max_scan
+        self.metrics = metrics
+
+        self.segments: List[Segment] = []
+        self.pending: List[bytes] = []  # Records waiting for the next batch
+        self.unwritten: Deque[bytes] = deque()  # Records not yet written to disk, including those being written
+        self.writing = 0  # Number of records being written by the writer thread
+        self.writing_segments = 0  # Number of segments, at the end of the list, the writer thread is writing to
+        self.delayed_call: IDelayedCall = None
+        self.maps: Dict[int, Tuple[mmap.mmap, mmap.mmap]] = {}  # Memory maps of segment and index files, by segment
+
+        # Only used on the writer thread
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="pymcserv-chat-log")
+        self.files: Dict[int, Tuple[BinaryIO, BinaryIO]] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def path(self, first: int, extension: str) -> str:
+        return os.path.join(self.directory, "%020d.%s" % (first, extension))
+
+    # Finds existing segments, trimming any partly written record from the end of each
+    def load(self):
+        for name in sorted(os.listdir(self.directory)):
+            first, extension = os.path.splitext(name)
+            if extension != ".log" or not first.isdigit():
+                continue
+
+            first = int(first)
+            log_path, index_path = self.path(first, "log"), self.path(first, "idx")
+            if not os.path.exists(index_path):
+                continue
+
+            count = os.path.getsize(index_path) // INDEX_ENTRY.size
+            size = os.path.getsize(log_path)
+
+            # Drop index entries from the end until the last one points at a complete record
+            with open(index_path, "rb") as index, open(log_path, "rb") as log:
+                while count:
+                    index.seek((count - 1) * INDEX_ENTRY.size)
+                    offset, = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                    log.seek(offset)
+                    header = log.read(RECORD_LENGTH.size)
+                    if len(header) == RECORD_LENGTH.size:
+                        end = offset + RECORD_LENGTH.size + RECORD_LENGTH.unpack(header)[0]
+                        if end <= size:
+                            size = end
+                            break
+                    count -= 1
+                else:
+                    size = 0
+
+            os.truncate(index_path, count * INDEX_ENTRY.size)
+            os.truncate(log_path, size)
+            self.segments.append(Segment(first, size, count, os.path.getmtime(log_path)))
+
+        if not self.segments:
+            self.segments.append(Segment(0))
+        self.expire()
+
+    def append(self, sender: UUID, sender_name: str, room: str, message: str):
+        # Drop records while the disk has fallen too far behind, rather than buffering them without limit
+        if len(self.unwritten) >= self.max_unwritten:
+            if self.metrics is not None:
+                self.metrics.count_event("chat_log_dropped")
+            return
+
+        record = pack_record(ChatLogEntry(int(time.time() * 1000), sender, sender_name, room, message))
+        self.pending.append(record)
+        self.unwritten.append(record)
+
+        if self.delayed_call is None and not self.writing:
+            self.delayed_call = reactor.callLater(self.flush_delay, self.flush)
+
+    # Hands pending records to the writer thread, one batch at a time
+    def flush(self):
+        self.delayed_call = None
+        if not self.pending or self.writing:
+            return
+
+        records, self.pending = self.pending, []
+        writes = self.assign(records)
+        self.writing = len(records)
+        self.writing_segments = len(writes)
+        self.executor.submit(self.write, writes).add_done_callback(
+            lambda future: reactor.callFromThread(self.written, future))
+
+    # Assigns records to segments, starting new segments as they fill up, and returns the writes to make
+    def assign(self, records: List[bytes]) -> List[Tuple[int, bytes, bytes, bool]]:
+        segment = self.segments[-1]
+        writes = []
+        log_data, index_data = [], []
+
+        for record in records:
+            # Start a new segment once the current one is full, unless it is empty
+            if segment.count and segment.size + len(record) > self.segment_bytes:
+                writes.append((segment.first, b"".join(log_data), b"".join(index_data), True))
+                log_data, index_data = [], []
+                segment = Segment(segment.first + segment.count)
+                self.segments.append(segment)
+
+            index_data.append(INDEX_ENTRY.pack(segment.size))
+            log_data.append(record)
+            segment.size += len(record)
+            segment.count += 1
+
+        segment.modified = time.time()
+        writes.append((segment.first, b"".join(log_data), b"".join(index_data), False))
+        return writes
+
+    # Runs on the writer thread. Returns the number of writes made, stopping at the first which fails. A failed write
+    # is removed from the segment's files, so they only ever hold complete records.
+    def write(self, writes: List[Tuple[int, bytes, bytes, bool]]) -> int:
+        for done, (first, log_data, index_data, full) in enumerate(writes):
+            sizes = None
+            try:
+                files = self.files.get(first)
+                if files is None:
+                    files = self.files[first] = (open(self.path(first, "log"), "ab"),
+                                                 open(self.path(first, "idx"), "ab"))
+                sizes = (files[0].tell(), files[1].tell())
+
+                # Write the records before the index, so an index entry never points past the end of the segment
+                files[0].write(log_data)
+                files[0].flush()
+                files[1].write(index_data)
+                files[1].flush()
+            except OSError:
+                logger.exception("Failed to write chat log segment {}".format(first))
+                self.discard_write(first, sizes)
+                return done
+
+            if full:
+                for fd in self.files.pop(first):
+                    fd.close()
+
+        return len(writes)
+
+    # Runs on the writer thread. Closes a segment's files after a failed write and truncates them to the given sizes,
+    # from before the write.
+    def discard_write(self, first: int, sizes: Optional[Tuple[int, int]]):
+        for fd in self.files.pop(first, ()):
+            try:
+                fd.close()
+            except OSError:
+                pass  # Data left in the file's buffer, which is truncated below
+
+        if sizes is None:
+            return
+
+        for extension, size in zip(("log", "idx"), sizes):
+            try:
+                os.truncate(self.path(first, extension), size)
+            except OSError:
+                logger.exception("Failed to truncate chat log segment {}".format(first))
+
+    def written(self, future: Future):
+        try:
+            done = future.result()
+        except Exception:
+            logger.exception("Failed to write chat log")
+            done = 0
+
+        for _ in range(self.writing):
+            self.unwritten.popleft()
+        self.writing = 0
+
+        segments = self.segments[len(self.segments) - self.writing_segments:]
+        self.writing_segments = 0
+
+        for segment in segments[:done]:
+            segment.written = segment.count
+            segment.written_size = segment.size
+
+        # Records from the failed write onwards are lost. The segment they failed in is rolled back to what was written,
+        # and segments started after it, which were never written to, are forgotten.
+        if done < len(segments):
+            failed = segments[done]
+            lost = sum(segment.count - segment.written for segment in segments[done:])
+            logger.error("Dropped {} chat log records which could not be written".format(lost))
+            if self.metrics is not None:
+                self.metrics.count_event("chat_log_write_failed", lost)
+
+            failed.size, failed.count = failed.written_size, failed.written
+            self.unmap(failed.first)
+            del self.segments[len(self.segments) - len(segments) + done + 1:]
+
+        self.expire()
+
+        if self.pending and self.delayed_call is None:
+            self.delayed_call = reactor.callLater(self.flush_delay, self.flush)
+
+    # Deletes the oldest complete segments once the log is too large or they are too old
+    def expire(self):
+        total = sum(segment.size for segment in self.segments)
+        cutoff = time.time() - self.retention_seconds
+
+        while len(self.segments) > 1 and self.segments[0].written == self.segments[0].count and (
+                total > self.retention_bytes or self.segments[0].modified < cutoff):
+            segment = self.segments.pop(0)
+            total -= segment.size
+            self.unmap(segment.first)
+            self.executor.submit(self.delete, segment.first)
+
+    # Runs on the writer thread
+    def delete(self, first: int):
+        for fd in self.files.pop(first, ()):
+            fd.close()
+
+        for extension in ("log", "idx"):
+            try:
+                os.remove(self.path(first, extension))
+            except OSError:
+                logger.exception("Failed to delete chat log segment")
+
+    # Returns memory maps of a segment's records and index, remapping them if records have been written since
+    def map(self, segment: Segment) -> Tuple[mmap.mmap, mmap.mmap]:
+        maps = self.maps.get(segment.first)
+        if maps is not None and len(maps[1]) >= segment.written * INDEX_ENTRY.size:
+            return maps
+
+        self.unmap(segment.first)
+        maps = []
+        for extension in ("log", "idx"):
+            with open(self.path(segment.first, extension), "rb") as fd:
+                maps.append(mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ))
+
+        maps = self.maps[segment.first] = (maps[0], maps[1])
+        return maps
+
+    def unmap(self, first: int):
+        for mapped in self.maps.pop(first, ()):
+            mapped.close()
+
+    # Yields the data holding each record, and the offset and length of the record after its length, newest first
+    def newest_records(self) -> Iterator[Tuple[bytes, int, int]]:
+        # Records which haven't reached the disk yet are the newest
+        for index in range(len(self.unwritten) - 1, -1, -1):
+            record = self.unwritten[index]
+            yield record, RECORD_LENGTH.size, len(record) - RECORD_LENGTH.size
+
+        for segment in reversed(self.segments):
+            if not segment.written:
+                continue
+
+            log, index = self.map(segment)
+            for position in range(segment.written - 1, -1, -1):
+                offset, = INDEX_ENTRY.unpack_from(index, position * INDEX_ENTRY.size)
+                length, = RECORD_LENGTH.unpack_from(log, offset)
+                yield log, offset + RECORD_LENGTH.size, length
+
+    # Returns up to the given number of the most recent messages, oldest first. When a room is given, only its messages
+    # are returned, looking through at most max_scan records to find them.
+    def tail(self, count: int, room: str = None) -> List[ChatLogEntry]:
+        entries = []
+        if count <= 0:
+            return entries
+
+        room = None if room is None else room.encode("utf-8")
+        for scanned, (data, offset, length) in enumerate(self.newest_records()):
+            if scanned >= self.max_scan:
+                break
+
+            if room is None or record_room(data, offset) == room:
+                entries.append(unpack_record(data, offset, length))
+                if len(entries) >= count:
+                    break
+
+        entries.reverse()
+        return entries
+
+    # Writes any pending records and waits for the writer thread to finish
+    def close(self):
+        if self.delayed_call is not None and self.delayed_call.active():
+            self.delayed_call.cancel()
+        self.delayed_call = None
+
+        # Write the remaining records without waiting for a callback, as the reactor may no longer be running
+        if self.pending:
+            records, self.pending = self.pending, []
+            self.executor.submit(self.write, self.assign(records))
+
+        self.executor.submit(self.close_files)
+        self.executor.shutdown(wait=True)
+
+        for first in list(self.maps):
+            self.unmap(first)
+
+    # Runs on the writer thread
+    def close_files(self):
+        for files in self.files.values():
+            for fd in files:
+                fd.close()
+        self.files = {}
@@ -0,0 +1,166 @@
+from __future__ import annotations
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .nodes import Node, RootCommandNode, ArgumentCommandNode
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ..directory import PlayerDirectory
+
+# Suggestions for a command, as (start of the text to replace, length of the text to replace, matches)
+Completion = Tuple[int, int, List[str]]
+
+
+class PrefixIndex:
+    """
+    Sorted, case-insensitive index of names supporting prefix lookups.
+    """
+
+    def __init__(self, names=()) -> None:
+        self.entries: List[Tuple[str, str]] = sorted((name.lower(), name) for name in names)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, name: str):
+        insort(self.entries, (name.lower(), name))
+
+    def remove(self, name: str):
+        index = bisect_left(self.entries, (name.lower(), name))
+        if index < len(self.entries) and self.entries[index][1] == name:
+            del self.entries[index]
+
+    def find(self, prefix: str) -> List[str]:
+        prefix = prefix.lower()
+        index = bisect_left(self.entries, (prefix, ""))
+        matches = []
+
+        while index < len(self.entries) and self.entries[index][0].startswith(prefix):
+            matches.append(self.entries[index][1])
+            index += 1
+
+        return matches
+
+
+class CompletionEngine:
+    """
+    Completes partially typed commands by walking the command graph.
+    Literal children of each node are indexed for prefix lookups, and arguments which ask the server for suggestions
+    are completed with online player names. Walks of the graph are cached per graph version and input, and player
+    names per player list version and prefix, so players joining and leaving only invalidate player names.
+    """
+
+    def __init__(self, root: RootCommandNode, players: PlayerDirectory, cache_size: int = 4096) -> None:
+        self.cache_size = cache_size
+        # Completions of literals, and whether players should be completed too
+        self.cache: OrderedDict[Tuple[int, RootCommandNode, str], Tuple[Completion, bool]] = OrderedDict()
+        self.player_cache: OrderedDict[Tuple[int, str], List[str]] = OrderedDict()
+        self.players = players
+        self.graph_version = 0
+        self.set_root(root)
+
+    def set_root(self, root: RootCommandNode):
+        self.root = root
+        self.literals: Dict[Node, Dict[str, Node]] = {}
+        self.literal_indices: Dict[Node, PrefixIndex] = {}
+        self.graph_version += 1
+        self.cache.clear()
+
+    # Completes the text using the given view of the command graph, or the full graph if not given
+    def complete(self, text: str, root: RootCommandNode = None) -> Completion:
+        if root is None:
+            root = self.root
+
+        completion, complete_players = self.cached(self.cache, (self.graph_version, root, text),
+                                                   lambda: self.find_completions(text, root))
+        if not complete_players:
+            return completion
+
+        position, length, matches = completion
+        prefix = text[position:]
+        players = self.cached(self.player_cache, (self.players.version, prefix),
+                              lambda: self.players.find_prefix(prefix))
+        return position, length, matches + players if matches else players
+
+    # Returns the cached value for the key, computing it if it isn't cached
+    def cached(self, cache: OrderedDict, key, compute):
+        value = cache.get(key)
+
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+
+        value = cache[key] = compute()
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+        return value
+
+    # Returns the completions of literals, and whether the partially typed word is also an argument which should be
+    # completed with player names
+    def find_completions(self, text: str, root: RootCommandNode) -> Tuple[Completion, bool]:
+        position = 1 if text.startswith("/") else 0
+        node = root
+
+        # Follow the graph through every complete word
+        while True:
+            end = text.find(" ", position)
+            if end == -1:
+                break
+
+            word = text[position:end]
+            child = self.get_literals(node).get(word)
+
+            if child is None:
+                child, end = self.match_argument(node, text, position)
+                if child is None:
+                    return (position, 0, []), False
+
+            node = child.redirect if child.redirect is not None else child
+            position = end + 1
+
+        # Suggest children of the last node matching the partially typed word
+        prefix = text[position:]
+        matches = self.get_literal_index(node).find(prefix)
+
+        complete_players = any(isinstance(child, ArgumentCommandNode) and child.suggestions == "ask_server"
+                               for child in node.children)
+
+        return (position, len(prefix), matches), complete_players
+
+    # Finds an argument child which accepts the word at position, returning it and the position its value ends at
+    def match_argument(self, node: Node, text: str, position: int) -> Tuple[Optional[Node], int]:
+        for child in node.children:
+            if not isinstance(child, ArgumentCommandNode):
+                continue
+
+            # Greedy strings consume the rest of the input, so can never be followed by another node
+            if child.parser == "brigadier:string" and child.properties.get("behavior") == 2:
+                return None, position
+
+            # Quotable phrases may contain spaces
+            if text.startswith('"', position) and child.parser == "brigadier:string" and \
+                    child.properties.get("behavior") == 1:
+                end = text.find('"', position + 1)
+                if end == -1 or not text.startswith(" ", end + 1):
+                    return None, position
+                return child, end + 1
+
+            return child, text.find(" ", position)
+
+        return None, position
+
+    def get_literals(self, node: Node) -> Dict[str, Node]:
+        literals = self.literals.get(node)
+        if literals is None:
+            literals = self.literals[node] = {child.name: child for child in node.children
+                                                  if child.type == "literal"}
+        return literals
+
+    def get_literal_index(self, node: Node) -> PrefixIndex:
+        index = self.literal_indices.get(node)
+        if index is None:
+            index = self.literal_indices[node] = PrefixIndex(self.get_literals(node))
+        return index
@@ -0,0 +1,244 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from quarry.types.chat import Message
+
+from .nodes import Node, RootCommandNode, ArgumentCommandNode
+
+# Parses an argument starting at the given position, returning its value and the position after it
+ArgumentParser = Callable[[str, int, Dict], Tuple[Any, int]]
+
+# Characters allowed in unquoted strings, matching brigadier's StringReader
+UNQUOTED_CHARACTERS = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_-.+")
+
+
+class CommandSyntaxError(Exception):
+    """
+    A command failed to parse. Holds the vanilla translation key and arguments describing the error, and the position
+    in the command it occurred at.
+    """
+
+    def __init__(self, translate: str, command: str = None, cursor: int = None, *args) -> None:
+        super().__init__(translate)
+        self.translate = translate
+        self.arguments = args
+        self.command = command
+        self.cursor = cursor
+
+    # Returns the error as chat messages in the same format as vanilla, the error itself followed by the position in
+    # the command it happened at
+    def as_messages(self) -> List[Message]:
+        error = {'translate': self.translate, 'color': 'red'}
+        if self.arguments:
+            error['with'] = [str(arg) for arg in self.arguments]
+
+        messages = [Message(error)]
+
+        if self.command is not None and self.cursor is not None:
+            cursor = min(self.cursor, len(self.command))
+            context = ["..." if cursor > 10 else "", self.command[max(0, cursor - 10):cursor]]
+            if cursor < len(self.command):
+                context.append({'text': self.command[cursor:], 'color': 'red', 'underlined': True})
+            context.append({'translate': 'command.context.here', 'color': 'red', 'italic': True})
+            messages.append(Message({'text': '', 'color': 'gray', 'extra': context}))
+
+        return messages
+
+
+def read_unquoted(text: str, position: int) -> Tuple[str, int]:
+    end = position
+    while end < len(text) and text[end] in UNQUOTED_CHARACTERS:
+        end += 1
+    return text[position:end], end
+
+
+def read_quoted(text: str, position: int) -> Tuple[str, int]:
+    quote = text[position]
+    out = []
+    end = position + 1
+    while end < len(text):
+        char = text[end]
+        if char == "\\":
+            if end + 1 < len(text) and text[end + 1] in (quote, "\\"):
+                out.append(text[end + 1])
+                end += 2
+                continue
+            raise CommandSyntaxError('parsing.quote.escape', None, end, text[end + 1:end + 2], quote)
+        if char == quote:
+            return "".join(out), end + 1
+        out.append(char)
+        end += 1
+
+    raise CommandSyntaxError('parsing.quote.expected.end', None, position)
+
+
+def read_word(text: str, position: int) -> Tuple[str, int]:
+    end = text.find(" ", position)
+    if end == -1:
+        end = len(text)
+    return text[position:end], end
+
+
+def parse_bool(text: str, position: int, properties: Dict) -> Tuple[bool, int]:
+    word, end = read_unquoted(text, position)
+    if word == "true":
+        return True, end
+    if word == "false":
+        return False, end
+    raise CommandSyntaxError('parsing.bool.invalid', None, position, word)
+
+
+def make_number_parser(convert: Callable, kind: str) -> ArgumentParser:
+    def parse(text: str, position: int, properties: Dict):
+        word, end = read_unquoted(text, position)
+        if not word:
+            raise CommandSyntaxError('parsing.%s.expected' % kind, None, position)
+        try:
+            value = convert(word)
+        except ValueError:
+            raise CommandSyntaxError('parsing.%s.invalid' % kind, None, position, word)
+
+        minimum = properties.get('min')
+        maximum = properties.get('max')
+        if minimum is not None and value < minimum:
+            raise CommandSyntaxError('argument.%s.low' % kind, None, position, minimum, value)
+        if maximum is not None and value > maximum:
+            raise CommandSyntaxError('argument.%s.big' % kind, None, position, maximum, value)
+        return value, end
+
+    return parse
+
+
+def parse_string(text: str, position: int, properties: Dict) -> Tuple[str, int]:
+    behavior = properties.get('behavior', 0)
+    if behavior == 2:  # Greedy phrase
+        return text[position:], len(text)
+    if behavior == 1 and position < len(text) and text[position] in "\"'":  # Quotable phrase
+        return read_quoted(text, position)
+    return read_unquoted(text, position)
+
+
+def parse_greedy(text: str, position: int, properties: Dict) -> Tuple[str, int]:
+    return text[position:], len(text)
+
+
+ARGUMENT_PARSERS: Dict[str, ArgumentParser] = {
+    "brigadier:bool": parse_bool,
+    "brigadier:float": make_number_parser(float, "float"),
+    "brigadier:double": make_number_parser(float, "double"),
+    "brigadier:integer": make_number_parser(int, "int"),
+    "brigadier:long": make_number_parser(int, "long"),
+    "brigadier:string": parse_string,
+    "minecraft:game_profile": lambda text, position, properties: read_word(text, position),
+    "minecraft:entity": lambda text, position, properties: read_word(text, position),
+    "minecraft:message": parse_greedy,
+}
+
+
+class CompiledNode:
+    __slots__ = ("literals", "arguments", "handler", "redirect")
+
+    def __init__(self, node: Node) -> None:
+        self.literals: Dict[str, CompiledNode] = {}
+        self.arguments: List[Tuple[str, ArgumentParser, Dict, CompiledNode]] = []
+        self.handler: Optional[Callable] = node.handler if node.executable else None
+        self.redirect: Optional[CompiledNode] = None
+
+
+class CommandDispatcher:
+    """
+    Parses and executes commands using a compiled form of the command graph.
+    Literal children are looked up by name and arguments are parsed by the function for their parser type, so
+    dispatching a command costs one dict lookup or parse per word.
+    """
+
+    def __init__(self, root: RootCommandNode) -> None:
+        self.root = self.compile(root)
+
+    @staticmethod
+    def compile(root: Node) -> CompiledNode:
+        compiled: Dict[int, CompiledNode] = {id(root): CompiledNode(root)}
+        nodes = [root]
+
+        # Compile each node once, looking up nodes by identity so redirect cycles point at the compiled node
+        def get(node: Node) -> CompiledNode:
+            result = compiled.get(id(node))
+            if result is None:
+                result = compiled[id(node)] = CompiledNode(node)
+                nodes.append(node)
+            return result
+
+        idx = 0
+        while idx < len(nodes):
+            node = nodes[idx]
+            target = compiled[id(node)]
+
+            for child in node.children:
+                if isinstance(child, ArgumentCommandNode):
+                    parser = ARGUMENT_PARSERS.get(child.parser, lambda text, position, properties: read_word(text, position))
+                    target.arguments.append((child.name, parser, child.properties, get(child)))
+                else:
+                    target.literals[child.name] = get(child)
+
+            if node.redirect is not None:
+                target.redirect = get(node.redirect)
+
+            idx += 1
+
+        return compiled[id(root)]
+
+    # Parses a command, without the leading slash, returning its handler and parsed arguments
+    def parse(self, command: str) -> Tuple[Callable, Dict[str, Any]]:
+        node = self.root
+        arguments = {}
+        position = 0
+
+        while True:
+            if position >= len(command):
+                if node.handler is None:
+                    raise CommandSyntaxError('command.unknown.command', command, position)
+                return node.handler, arguments
+
+            if position > 0:
+                if command[position] != " ":
+                    raise CommandSyntaxError('command.expected.separator', command, position)
+                position += 1
+
+            if node.redirect is not None:
+                node = node.redirect
+
+            node, position = self.parse_child(node, command, position, arguments)
+
+    def parse_child(self, node: CompiledNode, command: str, position: int, arguments: Dict) -> Tuple[CompiledNode, int]:
+        end = command.find(" ", position)
+        if end == -1:
+            end = len(command)
+
+        child = node.literals.get(command[position:end])
+        if child is not None:
+            return child, end
+
+        error = None
+        for name, parser, properties, child in node.arguments:
+            try:
+                value, end = parser(command, position, properties)
+            except CommandSyntaxError as e:
+                error = error or e
+                continue
+
+            if end > position and (end == len(command) or command[end] == " "):
+                arguments[name] = value
+                return child, end
+
+        if error is not None:
+            error.command = command
+            raise error
+
+        if node is self.root:
+            raise CommandSyntaxError('command.unknown.command', command, position)
+        raise CommandSyntaxError('command.unknown.argument', command, position)
+
+    # Parses and runs a command for the given source, returning the handler's result
+    def execute(self, source, command: str):
+        handler, arguments = self.parse(command)
+        return handler(source, arguments)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+from quarry.net.protocol import ProtocolError
+from quarry.types.chat import Message
+
+from .dispatcher import CommandSyntaxError
+from .tab_complete import TabCompleteProtocol
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from quarry.types.buffer import Buffer1_19_1
+
+
+class CommandProtocol(TabCompleteProtocol):
+    def packet_chat_command(self, buff: Buffer1_19_1):
+        if self.protocol_mode != 'play':
+            return
+
+        command = buff.unpack_string()
+        timestamp = buff.unpack('Q')
+        buff.unpack('Q')  # Salt
+
+        # Signatures of message arguments. None of our commands take one, so they are not verified
+        signatures = buff.unpack_varint()
+        if signatures > 8:
+            raise ProtocolError("Too many argument signatures")
+        for _ in range(signatures):
+            buff.unpack_string()  # Argument name
+            buff.unpack_byte_array()  # Signature
+
+        buff.unpack('?')  # Whether preview was signed, not implemented here
+        last_seen = []
+        last_received = None
+
+        # 1.19.1+ includes list of "last seen" messages, which acknowledge pending messages the same way chat does
+        if self.protocol_version >= 760:
+            last_seen = buff.unpack_last_seen_list()
+            last_received = buff.unpack_last_received()
+
+        if self.validate_timestamp(timestamp, "/" + command) is False or \
+                self.validate_last_seen(last_seen, last_received) is False:
+            return
+
+        self.previous_timestamp = timestamp
+        self.last_seen_tracker.set_previously_seen(last_seen)
+
+        self.run_command(command)
+
+    # Before 1.19 commands are sent as chat messages starting with a slash
+    def packet_chat_message(self, buff: Buffer1_19_1):
+        if self.protocol_mode == 'play' and self.protocol_version < 759:
+            buff.save()
+            message = buff.unpack_string()
+
+            if message.startswith("/"):
+                self.run_command(message[1:])
+                buff.discard()
+                return
+
+            buff.restore()
+
+        super().packet_chat_message(buff)
+
+    def run_command(self, command: str):
+        if not self.allow_chat(0):
+            return
+
+        try:
+            self.factory.get_command_view(self).get_dispatcher().execute(self, command)
+        except CommandSyntaxError as e:
+            for message in e.as_messages():
+                self.factory.send_system(self, message)
+        except Exception as e:
+            self.logger.exception("Command '{}' from {} failed".format(command, self.display_name))
+            self.factory.send_system(self, Message({'translate': 'command.failed', 'color': 'red'}))
@@ -1,18 +1,107 @@
+from __future__ import annotations
+from typing import Any, Dict
+
+from quarry.types.chat import Message
+
 from .nodes import *
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ..protocols.play import PyMcServProtocol
+
 
 def getRootCommandNode() -> RootCommandNode :
-    testCommand = LiteralCommandNode()
-    testCommand.name = "msg"
-    testCommand.executable = True
+    msgCommand = LiteralCommandNode()
+    msgCommand.name = "msg"
+
+    msgCommandTarget = ArgumentCommandNode()
+    msgCommandTarget.name = "targets"
+    msgCommandTarget.parser = "brigadier:string"
+    msgCommandTarget.properties = {"behavior": 0}
+    msgCommand.children.append(msgCommandTarget)
+
+    msgCommandMessage = ArgumentCommandNode()
+    msgCommandMessage.name = "message"
+    msgCommandMessage.executable = True
+    msgCommandMessage.handler = executeMsg
+    msgCommandMessage.parser = "brigadier:string"
+    msgCommandMessage.properties = {"behavior": 2}
+    msgCommandMessage.suggestions = None
+    msgCommandTarget.children.append(msgCommandMessage)
 
-    testCommandArg1 = ArgumentCommandNode()
-    testCommandArg1.name = "position"
-    testCommandArg1.executable = True
-    testCommandArg1.parser = "brigadier:string"
-    testCommandArg1.properties = {"behavior": 1}
-    testCommand.children.append(testCommandArg1)
+    statsCommand = LiteralCommandNode()
+    statsCommand.name = "stats"
+    statsCommand.executable = True
+    statsCommand.handler = executeStats
+    statsCommand.permission = "admin"
+
+    roomCommand = LiteralCommandNode()
+    roomCommand.name = "room"
+    roomCommand.executable = True
+    roomCommand.handler = executeRoom
+
+    roomCommandName = ArgumentCommandNode()
+    roomCommandName.name = "name"
+    roomCommandName.executable = True
+    roomCommandName.handler = executeRoom
+    roomCommandName.parser = "brigadier:string"
+    roomCommandName.properties = {"behavior": 0}
+    roomCommandName.suggestions = None
+    roomCommand.children.append(roomCommandName)
 
     node = RootCommandNode()
-    node.children.append(testCommand)
-    return node 
+    node.children.append(msgCommand)
+    node.children.append(roomCommand)
+    node.children.append(statsCommand)
+    return node
+
+
+# Sends a private message to another player
+def executeMsg(source: PyMcServProtocol, arguments: Dict[str, Any]):
+    factory = source.factory
+    target = factory.directory.find(arguments["targets"])
+    if target is None:
+        factory.send_system(source, Message({'translate': 'argument.entity.notfound.player', 'color': 'red'}))
+        return
+
+    message = arguments["message"]
+    factory.send_system_to(target, Message({
+        'translate': 'commands.message.display.incoming',
+        'with': [source.display_name, message],
+        'color': 'gray',
+        'italic': True
+    }))
+    factory.send_system(source, Message({
+        'translate': 'commands.message.display.outgoing',
+        'with': [target.display_name, message],
+        'color': 'gray',
+        'italic': True
+    }))
+
+
+# Moves the player to another room, or lists the rooms if no name is given
+def executeRoom(source: PyMcServProtocol, arguments: Dict[str, Any]):
+    factory = source.factory
+    name = arguments.get("name")
+
+    if name is None:
+        rooms = sorted(factory.rooms.rooms.values(), key=lambda room: (-len(room), room.name))
+        factory.send_system(source, "\u00a76You are in %s. Rooms: %s" % (source.room.name, ", ".join(
+            "%s (%d)" % (room.name, len(room)) for room in rooms)))
+        return
+
+    if len(name) > factory.max_room_name_length:
+        factory.send_system(source, Message({'text': "Room names can be at most %d characters"
+                                                     % factory.max_room_name_length, 'color': 'red'}))
+        return
+
+    factory.move_player(source, factory.rooms.get(name))
+    factory.send_system(source, "\u00a76You are now in %s" % name)
+
+
+# Shows server metrics
+def executeStats(source: PyMcServProtocol, arguments: Dict[str, Any]):
+    factory = source.factory
+    factory.send_system(source, "\u00a76%d players online" % len(factory.directory))
+    for line in factory.metrics.summary():
+        factory.send_system(source, "\u00a77" + line)
@@ -1,77 +1,131 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import Callable, List, Dict, Sequence
 
 
 class Node:
-    def __init__(self) -> None:
-        self.name: str = ""
-        self.executable: bool = False
-        self.redirect: int = None
-        self.suggestions: str = None
-        self.children: List[Node] = []
-
-    def as_dict(self):
+    """
+    A node in the command graph.
+    Nodes are built by setting attributes or passing them to the constructor, and become immutable once frozen so a
+    single node can be shared between several graphs.
+    """
+
+    __slots__ = ("name", "executable", "redirect", "suggestions", "children", "handler", "permission", "frozen")
+    type: str = None
+
+    def __init__(self, name: str = "", executable: bool = False, redirect: Node = None, suggestions: str = None,
+                 children: Sequence[Node] = (), handler: Callable = None, permission: str = None) -> None:
+        self.frozen = False
+        self.name: str = name
+        self.executable: bool = executable
+        self.redirect: Node = redirect
+        self.suggestions: str = suggestions
+        self.children: List[Node] = list(children)
+        self.handler: Callable = handler  # Called with the command source and parsed arguments when executed
+        self.permission: str = permission  # Permission players need to see and use this node, None for everyone
+
+    def __setattr__(self, key, value):
+        if getattr(self, "frozen", False):
+            raise AttributeError("Cannot modify frozen command node '%s'" % self.name)
+        super().__setattr__(key, value)
+
+    # Freezes this node and every node reachable from it, returning this node
+    def freeze(self) -> Node:
+        nodes = [self]
+        seen = {id(self)}
+
+        while nodes:
+            node = nodes.pop()
+            if node.frozen:
+                continue
+
+            if node.redirect is not None and id(node.redirect) not in seen:
+                seen.add(id(node.redirect))
+                nodes.append(node.redirect)
+
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    nodes.append(child)
+
+            node.children = tuple(node.children)
+            node.frozen = True
+
+        return self
+
+    # Returns an unfrozen copy of this node with some attributes replaced. The copy shares this node's children.
+    def copy(self, **changes) -> Node:
+        node = self.__class__.__new__(self.__class__)
+        node.frozen = False
+        for key in self.fields():
+            setattr(node, key, changes.pop(key, getattr(self, key)))
+        node.children = list(node.children)
+
+        if changes:
+            raise AttributeError("Unknown command node attributes: %s" % ", ".join(changes))
+        return node
+
+    @classmethod
+    def fields(cls):
+        return [slot for klass in reversed(cls.__mro__) for slot in getattr(klass, "__slots__", ()) if slot != "frozen"]
+
+    # Returns this node and every node reachable from it, each once, in breadth first order
+    def walk(self) -> List[Node]:
+        nodes = [self]
+        seen = {id(self)}
+
+        for node in nodes:  # Grows as nodes are found
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    nodes.append(child)
+
+            if node.redirect is not None and id(node.redirect) not in seen:
+                seen.add(id(node.redirect))
+                nodes.append(node.redirect)
+
+        return nodes
+
+    # Redirects are given as the index of their target in walk() order, which is also its index in the packet
+    def as_dict(self, indices: Dict[int, int] = None):
+        if indices is None:
+            indices = {id(node): index for index, node in enumerate(self.walk())}
+
         c = {}
         for child in self.children:
-            c[len(c)]=(child.as_dict())
+            c[len(c)]=(child.as_dict(indices))
         return {
-            "type": None,
+            "type": self.type,
             "executable": self.executable,
-            "redirect": self.redirect,
+            "redirect": indices[id(self.redirect)] if self.redirect is not None else None,
             "suggestions": self.suggestions,
             "children": c,
-            "name": self.name
+            "name": self.name if self.type != "root" else None
         }
 
 
 class RootCommandNode(Node):
-    def as_dict(self):
-        c = {}
-        for child in self.children:
-            c[len(c)]=(child.as_dict())
-        return {
-            "type": "root",
-            "executable": self.executable,
-            "redirect": self.redirect,
-            "suggestions": self.suggestions,
-            "children": c,
-            "name": None
-        }
+    __slots__ = ()
+    type = "root"
 
 
 class LiteralCommandNode(Node):
-    def as_dict(self):
-        c = {}
-        for child in self.children:
-            c[len(c)]=(child.as_dict())
-        return {
-            "type": "literal",
-            "executable": self.executable,
-            "redirect": self.redirect,
-            "suggestions": self.suggestions,
-            "children": c,
-            "name": self.name
-        }
+    __slots__ = ()
+    type = "literal"
 
 
 class ArgumentCommandNode(Node):
-    def __init__(self) -> None:
-        super().__init__()
-        self.parser: str = ""
-        self.properties: Dict = {}
-        self.suggestions: str = "ask_server"
+    __slots__ = ("parser", "properties")
+    type = "argument"
 
-    def as_dict(self):
-        c = {}
-        for child in self.children:
-            c[len(c)]=(child.as_dict())    
-        return {
-            "type": "argument",
-            "executable": self.executable,
-            "redirect": self.redirect,
-            "suggestions": self.suggestions,
-            "children": c,
-            "parser": self.parser,
-            "properties": self.properties,
-            "name": self.name
-        }
\ No newline at end of file
+    def __init__(self, name: str = "", executable: bool = False, redirect: Node = None,
+                 suggestions: str = "ask_server", children: Sequence[Node] = (), handler: Callable = None,
+                 permission: str = None, parser: str = "", properties: Dict = None) -> None:
+        super().__init__(name, executable, redirect, suggestions, children, handler, permission)
+        self.parser: str = parser
+        self.properties: Dict = properties if properties is not None else {}
+
+    def as_dict(self, indices: Dict[int, int] = None):
+        d = super().as_dict(indices)
+        d["parser"] = self.parser
+        d["properties"] = self.properties
+        return d
@@ -1,5 +1,9 @@
+from typing import Dict, List, Tuple
+
 import quarry.types.buffer.v1_13_2
 
+from .nodes import Node
+
 # From https://wiki.vg/Command_Data#Parsers
 PARSERS = [None for _ in range(0, 47+1)]
 PARSERS[0 ] = "brigadier:bool"
@@ -52,67 +56,65 @@ PARSERS[46] = None # These don't have a name for some reason?
 PARSERS[47] = "minecraft:uuid"
 
 
-# A modified version of the original inside quarry.types.buffer.v1_13_2
-def pack_commands(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, root_node):
+# Parser name to identifier lookup, the first identifier wins for duplicated names
+PARSER_IDS = {}
+for _ident, _name in enumerate(PARSERS):
+    if _name is not None:
+        PARSER_IDS.setdefault(_name, _ident)
+
+NODE_TYPES = {"root": 0, "literal": 1, "argument": 2}
+
+
+def compile_commands(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, root_node: Node) -> Tuple[List[Node], bytes]:
     """
-    Packs a command graph.
+    Compiles a command graph into a flat node table and its packed representation.
+    Nodes are indexed by identity in breadth first order (see Node.walk), so each node is visited and packed exactly
+    once and redirects back into the graph (including cycles) resolve to the existing index.
     """
 
-    # Enumerate nodes
-    nodes = [root_node]
-    idx = 0
-    while idx < len(nodes):
-        node = nodes[idx]
-        children = list(node['children'].values())
-        if node['redirect']:
-            children.append(node['redirect'])
+    nodes = root_node.walk()
+    indices = {id(node): index for index, node in enumerate(nodes)}
+    out = [pack_command_node(cls, node, indices) for node in nodes]
 
-        for child in children:
-            if child not in nodes:
-                nodes.append(child)
-        idx += 1
+    return nodes, cls.pack_varint(len(nodes)) + b"".join(out) + cls.pack_varint(0)  # Root node is always first
 
-    # Pack nodes
-    out = cls.pack_varint(len(nodes))
-    for node in nodes:
-        out += pack_command_node(cls, node, nodes)
 
-    out += cls.pack_varint(nodes.index(root_node))
+def pack_commands(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, root_node: Node) -> bytes:
+    """
+    Packs a command graph.
+    """
 
-    return out
+    return compile_commands(cls, root_node)[1]
 
-# A modified version of the original inside quarry.types.buffer.v1_13_2
-def pack_command_node(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, node, nodes):
+
+def pack_command_node(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, node: Node, indices: Dict[int, int]) -> bytes:
     """
-    Packs a command node.
+    Packs a command node, given the indices of the nodes it references.
     """
 
-    out = b""
-
     flags = (
-        ['root', 'literal', 'argument'].index(node['type']) |
-        int(node['executable']) << 2 |
-        int(node['redirect'] is not None) << 3 |
-        int(node['suggestions'] is not None) << 4)
-    out += cls.pack('B', flags)
-    out += cls.pack_varint(len(node['children']))
+        NODE_TYPES[node.type] |
+        int(node.executable) << 2 |
+        int(node.redirect is not None) << 3 |
+        int(node.suggestions is not None) << 4)
+
+    out = [cls.pack('B', flags), cls.pack_varint(len(node.children))]
+    out.extend(cls.pack_varint(indices[id(child)]) for child in node.children)
 
-    for child in node['children'].values():
-        out += cls.pack_varint(nodes.index(child))
+    if node.redirect is not None:
+        out.append(cls.pack_varint(indices[id(node.redirect)]))
 
-    if node['redirect'] is not None:
-        out += cls.pack_varint(nodes.index(node['redirect']))
+    if node.type != "root":
+        out.append(cls.pack_string(node.name))
 
-    if node['name'] is not None:
-        out += cls.pack_string(node['name'])
+    if node.type == "argument":
+        out.append(cls.pack_varint(PARSER_IDS[node.parser]))
+        out.append(pack_command_node_properties(cls, node.parser, node.properties))
 
-    if node['type'] == 'argument':
-        out += cls.pack_varint(PARSERS.index(node['parser']))
-        out += pack_command_node_properties(cls, node['parser'], node['properties'])
-    if node['suggestions'] is not None:
-        out += cls.pack_string(node['suggestions'])
+    if node.suggestions is not None:
+        out.append(cls.pack_string(node.suggestions))
 
-    return out
+    return b"".join(out)
 
 # A modified version of the original inside quarry.types.buffer.v1_13_2
 def pack_command_node_properties(cls: quarry.types.buffer.v1_13_2.Buffer1_13_2, parser, properties):
@@ -0,0 +1,138 @@
+from __future__ import annotations
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from . import parsers
+from .dispatcher import CommandDispatcher
+from .nodes import Node, RootCommandNode
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ..protocols.play import PyMcServProtocol
+
+
+def filter_commands(root: RootCommandNode, permissions: FrozenSet[str]) -> RootCommandNode:
+    """
+    Returns a frozen view of a command graph without the nodes requiring permissions not in the given set, or the
+    redirects leading into their subtrees.
+    Only nodes with a hidden node or redirect below them are copied, every other subtree is shared with the original
+    graph.
+    """
+
+    def visible(node: Node):
+        return node.permission is None or node.permission in permissions
+
+    hidden = [node for node in root.walk() if not visible(node)]
+    if not hidden:
+        return root
+
+    # Redirects can't lead below a hidden node, unless their target can also be reached through visible nodes
+    below_hidden = descendants(hidden, lambda node: True)
+    reachable = descendants([root], visible)
+
+    def redirect_visible(node: Node):
+        return visible(node) and (id(node) not in below_hidden or id(node) in reachable)
+
+    # Find the visible nodes, and which nodes lead to each of them
+    parents: Dict[int, list] = {id(root): []}
+    nodes = [root]
+    affected = []
+
+    idx = 0
+    while idx < len(nodes):
+        node = nodes[idx]
+        targets = [(child, visible(child)) for child in node.children]
+        if node.redirect is not None:
+            targets.append((node.redirect, redirect_visible(node.redirect)))
+
+        for target, shown in targets:
+            if not shown:
+                affected.append(node)
+                continue
+
+            if id(target) not in parents:
+                parents[id(target)] = []
+                nodes.append(target)
+            parents[id(target)].append(node)
+
+        idx += 1
+
+    # Nodes with hidden children or redirects change, and so does every node leading to a changed node
+    changed: Dict[int, Node] = {}
+    while affected:
+        node = affected.pop()
+        if id(node) in changed:
+            continue
+        changed[id(node)] = node.copy()
+        affected.extend(parents[id(node)])
+
+    if not changed:
+        return root
+
+    for key, copy in changed.items():
+        copy.children = [changed.get(id(child), child) for child in copy.children if visible(child)]
+        if copy.redirect is not None:
+            copy.redirect = changed.get(id(copy.redirect), copy.redirect) if redirect_visible(copy.redirect) else None
+
+    return changed[id(root)].freeze()
+
+
+# Returns the ids of the given nodes and the nodes below them, only following children for which follow returns True
+def descendants(nodes: List[Node], follow: Callable[[Node], bool]) -> Set[int]:
+    seen = {id(node) for node in nodes}
+    nodes = list(nodes)
+
+    for node in nodes:  # Grows as nodes are found
+        for child in node.children:
+            if id(child) not in seen and follow(child):
+                seen.add(id(child))
+                nodes.append(child)
+
+    return seen
+
+
+class CommandView:
+    """
+    The command graph seen by players with a particular set of permissions, along with its dispatcher and packed
+    "Declare Commands" frames.
+    """
+
+    __slots__ = ("root", "dispatcher", "frames")
+
+    def __init__(self, root: RootCommandNode) -> None:
+        self.root = root
+        self.dispatcher: Optional[CommandDispatcher] = None
+        self.frames: Dict[Tuple[int, int], bytes] = {}
+
+    def get_dispatcher(self) -> CommandDispatcher:
+        if self.dispatcher is None:
+            self.dispatcher = CommandDispatcher(self.root)
+        return self.dispatcher
+
+    # Returns the "Declare Commands" frame for the player's protocol version and compression threshold
+    def get_frame(self, player: PyMcServProtocol) -> bytes:
+        key = (player.protocol_version, player.compression_threshold)
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = player.pack_frame(
+                "declare_commands", parsers.pack_commands(player.buff_type, self.root))
+        return frame
+
+
+class CommandViews:
+    """
+    Caches the command graph views for each set of permissions in use.
+    """
+
+    def __init__(self, root: RootCommandNode) -> None:
+        self.views: Dict[FrozenSet[str], CommandView] = {}
+        self.set_root(root)
+
+    def set_root(self, root: RootCommandNode):
+        self.root = root
+        self.views.clear()
+
+    def get(self, permissions: FrozenSet[str]) -> CommandView:
+        view = self.views.get(permissions)
+        if view is None:
+            view = self.views[permissions] = CommandView(filter_commands(self.root, permissions))
+        return view
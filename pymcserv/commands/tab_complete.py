@@ -1,7 +1,5 @@
 from __future__ import annotations
 from ..protocols.chat import ChatProtocol
-from ..protocols import utils
-import struct
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -13,20 +11,18 @@ class TabCompleteProtocol(ChatProtocol):
         trans_id = buff.unpack_varint()
         msg = buff.unpack_string()
 
-        array = []
-        array.append(("msg", False))
-        array.append(("123", False))
+        start, length, matches = self.factory.completions.complete(msg, self.factory.get_command_view(self).root)
 
-        output = b""
-        for e in array:
-            output+=self.buff_type.pack("s?", e[0].encode("utf-8"), e[1])
+        output = []
+        for match in matches:
+            output.append(self.buff_type.pack_string(match))
+            output.append(self.buff_type.pack('?', False))  # No tooltip
 
         self.send_packet(
             "tab_complete",
             self.buff_type.pack_varint(trans_id),
-            self.buff_type.pack_varint(3), # Start of the text to replace.
-            self.buff_type.pack_varint(3), # Length of the text to replace.
-            self.buff_type.pack_varint(len(array)), # Number of elements in the following array.
-            self.buff_type.pack_byte_array(output)
+            self.buff_type.pack_varint(start), # Start of the text to replace.
+            self.buff_type.pack_varint(length), # Length of the text to replace.
+            self.buff_type.pack_varint(len(matches)), # Number of elements in the following array.
+            *output
         )
-
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import quarry
+from quarry.types.nbt import NBTFile, TagRoot
+
+# Directory quarry keeps its data packs in, one file per protocol version named like "0760_1.19.1.nbt"
+DATA_PACKS_DIRECTORY = os.path.join(os.path.dirname(quarry.__file__), "data", "data_packs")
+
+# Snapshot layout: magic, digest of the data packs it was built from, entry count, then for each entry its protocol
+# version, name length, offset and length followed by the name, then the packed NBT of every entry
+SNAPSHOT_MAGIC = b"PMCSDP01"
+SNAPSHOT_HEADER = struct.Struct("<8s32sI")
+SNAPSHOT_ENTRY = struct.Struct("<HHII")
+
+# Name of the dimension codec entry, dimension types are stored under their own names
+CODEC = ""
+
+
+# Finds the data pack file for each protocol version
+def find_data_packs(directory: str = DATA_PACKS_DIRECTORY) -> Dict[int, str]:
+    paths = {}
+    for path in glob.glob(os.path.join(directory, "*.nbt")):
+        match = re.match(r"(\d{4})_(.+)\.nbt", os.path.basename(path))
+        if match:
+            paths[int(match.group(1))] = path
+    return paths
+
+
+class DataPacks:
+    """
+    Packed NBT for the dimension codec and dimension types sent in "Join Game", by protocol version.
+    A version's data pack is only parsed when first needed, or not at all if a snapshot file built from the same data
+    packs is given, in which case the packed NBT is read from a memory map of the snapshot.
+    """
+
+    logger = logging.getLogger("pymcserv")
+
+    def __init__(self, snapshot_path: Optional[str] = None, directory: str = DATA_PACKS_DIRECTORY) -> None:
+        self.paths = find_data_packs(directory)
+        self.packed: Dict[Tuple[int, str], bytes] = {}
+        self.snapshot: Optional[mmap.mmap] = None
+        self.snapshot_index: Dict[Tuple[int, str], Tuple[int, int]] = {}  # Offset and length of each entry
+
+        if snapshot_path is not None:
+            self.load_snapshot(snapshot_path)
+
+    def get_codec(self, protocol_version: int) -> bytes:
+        return self.get(protocol_version, CODEC)
+
+    def get_dimension_type(self, protocol_version: int, name: str) -> bytes:
+        return self.get(protocol_version, name)
+
+    def get(self, protocol_version: int, name: str) -> bytes:
+        key = (protocol_version, name)
+        data = self.packed.get(key)
+
+        if data is None:
+            location = self.snapshot_index.get(key)
+            if location is not None:
+                offset, length = location
+                data = self.packed[key] = self.snapshot[offset:offset + length]
+            else:
+                for entry_name, entry_data in self.parse(protocol_version):
+                    self.packed[protocol_version, entry_name] = entry_data
+                data = self.packed[key]
+
+        return data
+
+    # Parses a version's data pack, yielding the packed codec and each dimension type with their names
+    def parse(self, protocol_version: int):
+        data_pack = NBTFile.load(self.paths[protocol_version]).root_tag
+        yield CODEC, data_pack.to_bytes()
+
+        for entry in data_pack.body.value.values():
+            if entry.value['type'].value == 'minecraft:dimension_type':
+                for dimension in entry.value['value'].value:
+                    yield dimension.value['name'].value, TagRoot.from_body(dimension.value['element']).to_bytes()
+
+    # Returns a hash of the data pack files, a snapshot is only used if it was built from files with the same hash
+    def digest(self) -> bytes:
+        digest = hashlib.sha256(SNAPSHOT_MAGIC)
+        for protocol_version, path in sorted(self.paths.items()):
+            with open(path, "rb") as fd:
+                data = fd.read()
+            digest.update(struct.pack("<HI", protocol_version, len(data)))
+            digest.update(data)
+        return digest.digest()
+
+    # Maps the snapshot, rebuilding it first if it is missing, damaged or was built from other data packs
+    def load_snapshot(self, path: str):
+        digest = self.digest()
+
+        if not self.map_snapshot(path, digest):
+            self.logger.info("Building data pack snapshot {}".format(path))
+            self.write_snapshot(path, digest)
+            if not self.map_snapshot(path, digest):
+                raise ValueError("Data pack snapshot {} could not be read back".format(path))
+
+    def map_snapshot(self, path: str, digest: bytes) -> bool:
+        try:
+            with open(path, "rb") as fd:
+                snapshot = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # Missing or empty
+            return False
+
+        try:
+            magic, snapshot_digest, count = SNAPSHOT_HEADER.unpack_from(snapshot, 0)
+            if magic != SNAPSHOT_MAGIC or snapshot_digest != digest:
+                snapshot.close()
+                return False
+
+            index = {}
+            position = SNAPSHOT_HEADER.size
+            for _ in range(count):
+                protocol_version, name_length, offset, length = SNAPSHOT_ENTRY.unpack_from(snapshot, position)
+                position += SNAPSHOT_ENTRY.size
+                name = snapshot[position:position + name_length].decode("utf8")
+                position += name_length
+
+                if offset + length > len(snapshot):
+                    raise ValueError("Entry extends past the end of the snapshot")
+                index[protocol_version, name] = (offset, length)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            self.logger.warning("Data pack snapshot {} is damaged".format(path))
+            snapshot.close()
+            return False
+
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self.snapshot = snapshot
+        self.snapshot_index = index
+        return True
+
+    # Parses every data pack and writes the packed NBT to the snapshot file. The file is replaced atomically, so
+    # processes starting at the same time either map the old snapshot or the new one.
+    def write_snapshot(self, path: str, digest: bytes):
+        entries = [(protocol_version, name.encode("utf8"), data)
+                   for protocol_version in sorted(self.paths)
+                   for name, data in self.parse(protocol_version)]
+
+        offset = SNAPSHOT_HEADER.size + sum(SNAPSHOT_ENTRY.size + len(name) for _, name, _ in entries)
+        header = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, digest, len(entries))]
+        for protocol_version, name, data in entries:
+            header.append(SNAPSHOT_ENTRY.pack(protocol_version, len(name), offset, len(data)) + name)
+            offset += len(data)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".data-packs-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(b"".join(header))
+                file.writelines(data for _, _, data in entries)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def close(self):
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+            self.snapshot_index = {}
@@ -0,0 +1,84 @@
+from __future__ import annotations
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Union
+
+from quarry.types.uuid import UUID
+
+from pymcserv.bus import RemotePlayer
+from pymcserv.commands.completion import PrefixIndex
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.protocols.play import PyMcServProtocol
+
+Player = Union["PyMcServProtocol", RemotePlayer]
+
+
+class PlayerDirectory:
+    """
+    Players in game on this worker and on other workers, indexed by UUID, case-insensitive name and, for players on
+    this worker, protocol version. Players are added when they join the game and removed when they leave, so lookups
+    and broadcasts don't need to scan every connection or check whether it is in play.
+    """
+
+    def __init__(self) -> None:
+        self.local: Dict[PyMcServProtocol, None] = {}  # Players in game on this worker, in join order
+        self.remote: Dict[UUID, RemotePlayer] = {}  # Players in game on other workers
+        self.uuids: Dict[UUID, Player] = {}
+        self.names: Dict[str, Player] = {}  # By lower case name
+        self.index = PrefixIndex()  # Sorted names for prefix searches
+        self.versions: Dict[int, Dict[PyMcServProtocol, None]] = {}  # Players on this worker by protocol version
+        self.version = 0  # Incremented whenever a player is added or removed, for caches of lookups
+
+    def __len__(self):
+        return len(self.local) + len(self.remote)
+
+    # Iterates over players on this worker followed by those on other workers
+    def __iter__(self) -> Iterator[Player]:
+        return chain(self.local, self.remote.values())
+
+    def add(self, player: Player):
+        if isinstance(player, RemotePlayer):
+            self.remote[player.uuid] = player
+        else:
+            self.local[player] = None
+            self.versions.setdefault(player.protocol_version, {})[player] = None
+
+        self.uuids[player.uuid] = player
+        self.names[player.display_name.lower()] = player
+        self.index.add(player.display_name)
+        self.version += 1
+
+    def remove(self, player: Player):
+        if isinstance(player, RemotePlayer):
+            if self.remote.get(player.uuid) is not player:
+                return
+            del self.remote[player.uuid]
+        else:
+            if player not in self.local:
+                return
+            del self.local[player]
+
+            bucket = self.versions[player.protocol_version]
+            del bucket[player]
+            if not bucket:
+                del self.versions[player.protocol_version]
+
+        # Another player may have taken over the UUID or name, e.g. by reconnecting before this one timed out
+        if self.uuids.get(player.uuid) is player:
+            del self.uuids[player.uuid]
+        if self.names.get(player.display_name.lower()) is player:
+            del self.names[player.display_name.lower()]
+
+        self.index.remove(player.display_name)
+        self.version += 1
+
+    def find(self, name: str) -> Optional[Player]:
+        return self.names.get(name.lower())
+
+    def find_uuid(self, uuid: UUID) -> Optional[Player]:
+        return self.uuids.get(uuid)
+
+    # Returns the names of players starting with the prefix, ignoring case, in alphabetical order
+    def find_prefix(self, prefix: str) -> List[str]:
+        return self.index.find(prefix)
@@ -1,12 +1,36 @@
-from typing import List, Set
-
-from quarry.net.server import ServerFactory
-from quarry.types.chat import SignedMessage, LastSeenMessage
+from functools import cached_property
+import logging
+import socket
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+from quarry.net.server import ServerFactory, reactor
+from quarry.net.ticker import Ticker
+from quarry.types.buffer import Buffer1_19_1
+from quarry.types.chat import Message, SignedMessage, LastSeenMessage
 from quarry.types.uuid import UUID
-from quarry.data.data_packs import data_packs, dimension_types
 
+from pymcserv.admission import AdmissionController
+from pymcserv.auth import SessionAuthenticator
+from pymcserv.bus import ChatBus, RemotePlayer
+from pymcserv.chat_log import ChatLog
+from pymcserv.data_packs import DataPacks
+from pymcserv.directory import PlayerDirectory
+from pymcserv.flood import TokenBucket
+from pymcserv.keep_alive import KeepAliveScheduler
+from pymcserv.metrics import Metrics
 from pymcserv.protocols.play import PyMcServProtocol
-from pymcserv.commands import graph, parsers
+from pymcserv.rooms import Room, Rooms
+from pymcserv.protocols.verify import SignatureVerifier
+from pymcserv.status import StatusCache
+from pymcserv.timeouts import ConnectionTicker, ConnectionTimeouts
+from pymcserv.commands import graph
+from pymcserv.commands.completion import CompletionEngine
+from pymcserv.commands.permissions import CommandView, CommandViews
+from pymcserv.commands.nodes import RootCommandNode
+
+# End of a player list entry after the latency, for players without a public key. No display name, and no key for
+# 1.19+ clients.
+UNSIGNED_PLAYER_LIST_ENTRY = (Buffer1_19_1.pack('?', False), Buffer1_19_1.pack('??', False, False))
 
 
 class PyMcServFactory(ServerFactory):
@@ -14,190 +38,615 @@ class PyMcServFactory(ServerFactory):
     motd = "Chat Room Server"
     players: Set[PyMcServProtocol] = None
 
+    # World settings sent in the "Join Game" packet
+    world_name = "chat"
+    hashed_seed = 42
+    view_distance = 2
+    simulation_distance = 2
+    game_mode = 3
+    brand = "pymcserv"
+
+    # Maximum number of chat messages a client can leave unacknowledged before being disconnected
+    max_pending_messages = 4096
+
+    # Room players are put in when they join
+    default_room = "lobby"
+    # Maximum length of room names
+    max_room_name_length = 32
+
+    # Seconds to collect player list changes for before sending them, 0 sends them immediately
+    player_list_delay = 0.25
+    # Maximum number of joins or leaves in a batch to announce individually, larger bursts get one summary message
+    announce_summary_threshold = 3
+
+    # Seconds between keep alives sent to each player, and the number of groups players are split into to spread the
+    # writes over that interval
+    keep_alive_interval = 1.0
+    keep_alive_buckets = 20
+    # Seconds to wait for a keep alive response before disconnecting the player
+    keep_alive_timeout = 15
+    # Seconds to collect latency changes for before sending them in the player list
+    latency_update_delay = 5.0
+    # Seconds between checks for connections which haven't sent a packet in connection_timeout seconds
+    connection_timeout_interval = 1.0
+
+    # Number of tab completion results to keep cached
+    completion_cache_size = 4096
+
+    # Names of players given the "admin" permission when they join
+    operators: FrozenSet[str] = frozenset()
+
+    # Bytes buffered for a client before it is considered lagging and sent only essential packets, the number of bytes
+    # it must drop below to recover, and the number of bytes at which it is disconnected
+    write_buffer_high = 256 * 1024
+    write_buffer_low = 64 * 1024
+    write_buffer_limit = 4 * 1024 * 1024
+
+    # Number of workers used to verify chat signatures, 0 verifies them on the reactor thread
+    verify_workers = 0
+    # Whether to verify signatures in worker processes rather than threads
+    verify_processes = False
+
+    # Chat messages and commands a player can send per second, the number they can send in a burst, and the number of
+    # messages over the limit they can send before being disconnected for spamming. Messages over the limit are dropped.
+    chat_rate = 1.0
+    chat_burst = 10
+    chat_kick_excess = 10
+    # Number of players chat messages can be sent to per tick (50ms) across the server. Messages which would exceed it
+    # are dropped before being verified or encoded.
+    chat_fanout_budget = 5000
+
+    # Directory to keep a log of chat messages in, None disables the log
+    chat_log_directory: Optional[str] = None
+    # Size at which a new chat log segment is started, and the total size and age after which segments are deleted
+    chat_log_segment_bytes = 16 * 1024 * 1024
+    chat_log_retention_bytes = 256 * 1024 * 1024
+    chat_log_retention_seconds = 7 * 24 * 60 * 60
+    # Number of recent chat messages from the log to send to joining players
+    chat_replay_count = 50
+
+    # Pings an address can make per second, and in a burst. Asking for the status and measuring latency are each a ping.
+    status_rate = 2.0
+    status_burst = 10
+    # Number of addresses to remember ping limits for
+    status_limit_addresses = 4096
+    # Number of online players listed in the status response
+    status_sample_size = 12
+
+    # Logins which can be in progress at once, from "Login Start" until the player is in game, 0 for no limit. This
+    # also limits how many players join in each turn of the reactor. Further logins wait in a queue of at most
+    # login_queue_size, and are told their position every login_queue_update_interval seconds. Logins are turned away
+    # once players in game on every worker plus logins in progress reach max_players.
+    max_concurrent_logins = 8
+    login_queue_size = 1024
+    login_queue_update_interval = 2.0
+    # Logins an address can start per second, and in a burst. A rate of 0, the default, doesn't limit them. Every
+    # player behind a shared NAT or proxy has the same address, and they all reconnect at once after a restart, so only
+    # limit this when players connect directly.
+    login_rate = 0.0
+    login_burst = 5
+    # Number of addresses to remember login limits for
+    login_limit_addresses = 4096
+
+    # Session server online mode logins are checked with
+    session_server = "https://sessionserver.mojang.com/session/minecraft/"
+    # Number of session server requests in flight at once, further logins wait for one to finish
+    auth_concurrency = 16
+
+    # File to keep the packed data packs sent in "Join Game" in, memory mapped when first needed so the data packs
+    # don't need to be parsed. It is rebuilt if quarry's data packs change. None parses each version's data pack when a
+    # player first joins with that version.
+    data_pack_snapshot: Optional[str] = None
+
+    # Settings which are baked into the cached login packets. Changing any of these invalidates the cache.
+    login_settings = ("motd", "online_mode", "world_name", "hashed_seed", "view_distance",
+                      "simulation_distance", "game_mode", "brand", "max_players")
+    # Settings shown in the cached status response. Changing any of these invalidates the cache.
+    status_settings = ("motd", "max_players", "icon_path", "force_protocol_version")
+
+    commands: RootCommandNode = None
+    completions: CompletionEngine = None
+    command_views: CommandViews = None
+    login_packets: Dict[Tuple[int, int], List[Tuple[str, bytes]]] = None
+    directory: PlayerDirectory = None  # Players in game, indexed for lookups and broadcasts
+    rooms: Rooms = None
+    keep_alive: KeepAliveScheduler = None
+    timeouts: ConnectionTimeouts = None
+    status: StatusCache = None
+    admission: AdmissionController = None
+    metrics: Metrics = None
+    bus: ChatBus = None  # Connection to the other worker processes sharing the port, if any
+
+    def __init__(self):
+        super().__init__()
+        self.login_packets = {}
+        self.directory = PlayerDirectory()
+        self.status = StatusCache(self)
+        self.admission = AdmissionController(self)
+        self.metrics = Metrics()
+        self.add_gauges()
+        self.rooms = Rooms(self)
+        self.keep_alive = KeepAliveScheduler(self)
+        self.timeouts = ConnectionTimeouts(self)
+        self.ticker_type = self.get_connection_ticker
+        self.protocol.logger.setLevel(self.log_level)
+        self.commands = graph.getRootCommandNode().freeze()
+        self.completions = CompletionEngine(self.commands, self.directory, self.completion_cache_size)
+        self.command_views = CommandViews(self.commands)
+
+    def add_gauges(self):
+        def players_by_version():
+            return [({"protocol_version": str(version)}, len(players))
+                    for version, players in sorted(self.directory.versions.items())]
+
+        def pending_messages():
+            return [({}, sum(len(player.last_seen_tracker) for player in self.directory.local))]
+
+        def write_buffers():
+            sizes = [player.write_buffer_size() for player in self.players if player.transport is not None]
+            return [({"stat": "total"}, sum(sizes)), ({"stat": "max"}, max(sizes, default=0))]
+
+        self.metrics.add_gauge("pymcserv_players", "Players in game by protocol version", players_by_version)
+        self.metrics.add_gauge("pymcserv_connections", "Open connections", lambda: [({}, len(self.players))])
+        self.metrics.add_gauge("pymcserv_logins", "Logins in progress and waiting in the queue",
+                               lambda: [({"state": "in_progress"}, len(self.admission.logging_in)),
+                                        ({"state": "queued"}, len(self.admission.queue))])
+        self.metrics.add_gauge("pymcserv_pending_chat_messages", "Chat messages awaiting acknowledgement",
+                               pending_messages)
+        self.metrics.add_gauge("pymcserv_write_buffer_bytes", "Bytes waiting to be written to clients", write_buffers)
+
+    @cached_property
+    def verifier(self) -> Optional[SignatureVerifier]:
+        if self.verify_workers <= 0:
+            return None
+
+        verifier = SignatureVerifier(self.verify_workers, self.verify_processes)
+        reactor.addSystemEventTrigger('before', 'shutdown', verifier.shutdown)
+        return verifier
+
+    # Ticker shared by every connection, for the work quarry schedules on a connection's ticker
+    @cached_property
+    def ticker(self) -> Ticker:
+        ticker = Ticker(logging.getLogger("pymcserv"))
+        ticker.start()
+        return ticker
+
+    @cached_property
+    def connection_ticker(self) -> ConnectionTicker:
+        return ConnectionTicker(self.ticker)
+
+    # Used as the ticker_type, so quarry gives every connection the shared ticker rather than starting one for each
+    def get_connection_ticker(self, logger) -> ConnectionTicker:
+        return self.connection_ticker
+
+    @cached_property
+    def authenticator(self) -> SessionAuthenticator:
+        authenticator = SessionAuthenticator(self)
+        reactor.addSystemEventTrigger('before', 'shutdown', authenticator.close)
+        return authenticator
+
+    @cached_property
+    def data_packs(self) -> DataPacks:
+        return DataPacks(self.data_pack_snapshot)
+
+    @cached_property
+    def chat_fanout(self) -> TokenBucket:
+        return TokenBucket(self.chat_fanout_budget * 20, self.chat_fanout_budget)
+
+    @cached_property
+    def chat_log(self) -> Optional[ChatLog]:
+        if self.chat_log_directory is None:
+            return None
+
+        chat_log = ChatLog(self.chat_log_directory, self.chat_log_segment_bytes, self.chat_log_retention_bytes,
+                           self.chat_log_retention_seconds, metrics=self.metrics)
+        reactor.addSystemEventTrigger('before', 'shutdown', chat_log.close)
+        return chat_log
+
+    # Listens for connections. With reuse_port, several processes can listen on the same port and the kernel spreads
+    # new connections between them.
+    def listen(self, host, port=25565, reuse_port=False):
+        if not reuse_port:
+            return super().listen(host, port)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        sock.listen(50)
+        sock.setblocking(False)
+
+        # The reactor duplicates the socket, so our copy can be closed
+        listening = reactor.adoptStreamPort(sock.fileno(), socket.AF_INET, self)
+        sock.close()
+        return listening
+
+    # Joins the chat bus of other worker processes sharing the port
+    def connect_bus(self, path: str):
+        self.bus = ChatBus(self)
+        self.bus.connect(path)
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+
+        if key in self.login_settings:
+            self.invalidate_login_packets()
+
+        if key in self.status_settings and self.status is not None:
+            if key == "icon_path":
+                self.__dict__.pop("icon", None)  # Drop the cached icon so the new one is loaded
+            self.status.invalidate()
+
+    # Drops all cached login packets, they will be rebuilt when the next player joins
+    def invalidate_login_packets(self):
+        if self.login_packets:
+            self.login_packets.clear()
+
+    # Replaces the command graph and resends it to players in game. The graph is frozen so it can be shared safely.
+    def update_commands(self, root: RootCommandNode = None):
+        self.commands = (root if root is not None else graph.getRootCommandNode()).freeze()
+        self.completions.set_root(self.commands)
+        self.command_views.set_root(self.commands)
+
+        for player in self.directory.local:
+            self.send_commands(player)
+
+    # Returns the view of the command graph a player can see and use
+    def get_command_view(self, player: PyMcServProtocol) -> CommandView:
+        return self.command_views.get(player.permissions)
+
+    # Sends the command graph for the player's permissions. Graphs are packed once per permission set, protocol version
+    # and compression threshold.
+    def send_commands(self, player: PyMcServProtocol):
+        player.send_frame("declare_commands", self.get_command_view(player).get_frame(player))
+
+    # Changes a player's permissions, resending their command graph if they are in game
+    def set_permissions(self, player: PyMcServProtocol, permissions: Iterable[str]):
+        permissions = frozenset(permissions)
+        if permissions == player.permissions:
+            return
+
+        player.permissions = permissions
+        if player.protocol_mode == 'play':
+            self.send_commands(player)
+
+    # Sends the packets which make up the start of the play session ("Server Data", "Join Game", brand and commands).
+    # Apart from the commands these only depend on the protocol version, so they are packed once per version and
+    # compression threshold.
     def send_join_game(self, player: PyMcServProtocol):
+        key = (player.protocol_version, player.compression_threshold)
+        frames = self.login_packets.get(key)
+
+        if frames is None:
+            frames = [(name, player.pack_frame(name, *data)) for name, *data in self.pack_login_packets(player)]
+            self.login_packets[key] = frames
+
+        for name, frame in frames:
+            player.send_frame(name, frame)
+
+        self.send_commands(player)
+
+    def pack_login_packets(self, player: PyMcServProtocol) -> List[Tuple]:
+        packets = []
+
+        # Send server data packet on 1.19+
+        if player.protocol_version >= 760:
+            packets.append(('server_data',
+                            player.buff_type.pack('????',
+                                                  False,               # Optional description
+                                                  False,               # Optional favicon
+                                                  False,               # Disable chat previews
+                                                  self.online_mode)))  # Enforce chat signing when in online mode
+        elif player.protocol_version == 759:  # 1.19 lacks enforce chat signing field
+            packets.append(('server_data', player.buff_type.pack('???', False, False, False)))
+
+        packets.append(self.pack_join_game(player))
+        packets.append(("plugin_message",
+                        player.buff_type.pack_string("minecraft:brand"),
+                        player.buff_type.pack_string(self.brand)))
+
+        return packets
+
+    def pack_join_game(self, player: PyMcServProtocol):
         # Build up fields for "Join Game" packet
         entity_id = 0
-        max_players = 0
-        hashed_seed = 42
-        view_distance = 2
-        simulation_distance = 2
-        game_mode = 3
-        prev_game_mode = 3
+        prev_game_mode = self.game_mode
         is_hardcore = False
         is_respawn_screen = True
         is_reduced_debug = False
         is_debug = False
         is_flat = False
 
-        dimension_codec = data_packs[player.protocol_version]
         dimension_name = "minecraft:overworld"
-        dimension_tag = dimension_types[player.protocol_version, dimension_name]
         world_count = 1
-        world_name = "chat"
 
         join_game = [
-            player.buff_type.pack("i?Bb", entity_id, is_hardcore, game_mode, prev_game_mode),
+            player.buff_type.pack("i?Bb", entity_id, is_hardcore, self.game_mode, prev_game_mode),
             player.buff_type.pack_varint(world_count),
-            player.buff_type.pack_string(world_name),
-            player.buff_type.pack_nbt(dimension_codec),
+            player.buff_type.pack_string(self.world_name),
+            self.data_packs.get_codec(player.protocol_version),  # Packed dimension codec
         ]
 
         if player.protocol_version >= 759:  # 1.19+ needs just dimension name, <1.19 needs entire dimension nbt
             join_game.append(player.buff_type.pack_string(dimension_name))
         else:
-            join_game.append(player.buff_type.pack_nbt(dimension_tag))
+            join_game.append(self.data_packs.get_dimension_type(player.protocol_version, dimension_name))
 
-        join_game.append(player.buff_type.pack_string(world_name))
-        join_game.append(player.buff_type.pack("q", hashed_seed))
-        join_game.append(player.buff_type.pack_varint(max_players))
-        join_game.append(player.buff_type.pack_varint(view_distance)),
+        join_game.append(player.buff_type.pack_string(self.world_name))
+        join_game.append(player.buff_type.pack("q", self.hashed_seed))
+        join_game.append(player.buff_type.pack_varint(self.max_players))
+        join_game.append(player.buff_type.pack_varint(self.view_distance)),
 
         if player.protocol_version >= 757:  # 1.18
-            join_game.append(player.buff_type.pack_varint(simulation_distance))
+            join_game.append(player.buff_type.pack_varint(self.simulation_distance))
 
         join_game.append(player.buff_type.pack("????", is_reduced_debug, is_respawn_screen, is_debug, is_flat))
 
         if player.protocol_version >= 759:  # 1.19
             join_game.append(player.buff_type.pack("?", False))
 
-        # Send "Join Game" packet
-        player.send_packet("join_game", *join_game)
-        player.send_packet("plugin_message", 
-            player.buff_type.pack_string("minecraft:brand"),
-            player.buff_type.pack_string("pymcserv")
-        )
-        player.send_packet("declare_commands", 
-            parsers.pack_commands(player.buff_type, graph.getRootCommandNode().as_dict())
-        )
-
-    # Sends a signed chat message to supporting clients
-    def broadcast_signed_chat(self, message: SignedMessage, sender_name):
-        for player in self.players:
-            if player.protocol_mode != 'play':
+        return ("join_game", *join_game)
+
+    # Sends the same packet to many players, encoding it once per protocol version and compressing it once per
+    # compression threshold. pack_packet is called with the first player of each group and must only depend on the
+    # player's protocol version, as its output is shared with the rest of the group.
+    # Non-essential packets are not sent to players whose connection is lagging behind.
+    def broadcast_packet(self, players: Iterable[PyMcServProtocol],
+                         pack_packet: Callable[[PyMcServProtocol], Tuple], essential: bool = True):
+        versions = {}
+        for player in players:
+            if not essential and player.is_lagging():
+                self.metrics.count_event("backpressure_dropped")
                 continue
 
+            versions.setdefault(player.protocol_version, []).append(player)
+
+        self.send_groups(versions.values(), pack_packet)
+
+    # Sends the same packet to every player in game on this worker, using the directory's protocol version groups
+    # rather than grouping the players again
+    def broadcast_packet_all(self, pack_packet: Callable[[PyMcServProtocol], Tuple], essential: bool = True):
+        if essential:
+            self.send_groups(self.directory.versions.values(), pack_packet)
+        else:
+            self.broadcast_packet(self.directory.local, pack_packet, essential)
+
+    # Sends a packet to groups of players sharing a protocol version, see broadcast_packet
+    def send_groups(self, groups: Iterable[Iterable[PyMcServProtocol]],
+                    pack_packet: Callable[[PyMcServProtocol], Tuple]):
+        for group in groups:
+            name, *data = pack_packet(next(iter(group)))
+            frames = {}
+
+            for player in group:
+                threshold = player.compression_threshold
+                frame = frames.get(threshold)
+                if frame is None:
+                    frame = frames[threshold] = player.pack_frame(name, *data)
+
+                player.send_frame(name, frame)
+
+    # Sends a signed chat message to the members of a room, to supporting clients
+    # Unless relay is False, the message is also published to the chat bus for the players of other workers
+    def broadcast_signed_chat(self, message: SignedMessage, sender_name, room: Room, relay: bool = True):
+        if relay and self.bus is not None:
+            self.bus.publish_signed_chat(message, sender_name, room)
+        if self.chat_log is not None:
+            self.chat_log.append(message.header.sender, sender_name, room.name, message.body.message)
+
+        signed = []
+        unsigned = []
+        for player in room.players:
             # Only send signed messages to clients that support the same signing method
             if message.signature_version == player.protocol_version:
-                self.send_signed_chat(player, message, sender_name)
+                signed.append(player)
             else:
-                self.send_unsigned_chat(player, message.body.message, message.header.sender, sender_name)
+                unsigned.append(player)
 
-    def send_signed_chat(self, player: PyMcServProtocol, message: SignedMessage, sender_name):
-        # Add to player's pending messages for later last seen validation
+        # Add to players' pending messages for later last seen validation
         if self.online_mode:
-            player.pending_messages.append(LastSeenMessage(message.header.sender, message.signature))
+            for player in signed:
+                player.add_pending_message(LastSeenMessage(message.header.sender, message.signature))
+
+        self.broadcast_packet(signed, lambda p: self.pack_signed_chat(p, message, sender_name))
+        self.broadcast_packet(unsigned, lambda p: self.pack_unsigned_chat(
+            p, message.body.message, message.header.sender, sender_name))
 
+    @staticmethod
+    def pack_signed_chat(player: PyMcServProtocol, message: SignedMessage, sender_name):
         if player.protocol_version >= 760:
-            player.send_packet("chat_message",
-                               player.buff_type.pack_signed_message(message),
-                               player.buff_type.pack_varint(0),  # Chat filtering result, 0 = not filtered
-                               player.buff_type.pack_varint(0),  # Message type
-                               player.buff_type.pack_chat(sender_name),  # Sender display name
-                               player.buff_type.pack('?', False))  # No team name
+            return ("chat_message",
+                    player.buff_type.pack_signed_message(message),
+                    player.buff_type.pack_varint(0),  # Chat filtering result, 0 = not filtered
+                    player.buff_type.pack_varint(0),  # Message type
+                    player.buff_type.pack_chat(sender_name),  # Sender display name
+                    player.buff_type.pack('?', False))  # No team name
 
         # 1.19 packet format is different
-        else:
-            player.send_packet("chat_message",
-                               player.buff_type.pack_chat(message.body.message),  # Original message
-                               # Optional decorated message
-                               player.buff_type.pack_optional(player.buff_type.pack_chat,
-                                                              message.body.decorated_message),
-                               player.buff_type.pack_varint(0),  # Message type, 0 = chat
-                               player.buff_type.pack_uuid(message.header.sender),  # Sender UUID
-                               player.buff_type.pack_chat(sender_name),  # Sender display name
-                               player.buff_type.pack('?', False),  # Optional team name
-                               # Timestamp, salt
-                               player.buff_type.pack('QQ', message.body.timestamp, message.body.salt),
-                               player.buff_type.pack_byte_array(message.signature or b''))  # Signature
-
-    # Sends an unsigned chat message, using system messages on supporting clients
-    def broadcast_unsigned_chat(self, message: str, sender: UUID, sender_name: str):
-        for player in self.players:
-            if player.protocol_mode != 'play':
-                continue
-
-            self.send_unsigned_chat(player, message, sender, sender_name)
+        return ("chat_message",
+                player.buff_type.pack_chat(message.body.message),  # Original message
+                # Optional decorated message
+                player.buff_type.pack_optional(player.buff_type.pack_chat,
+                                               message.body.decorated_message),
+                player.buff_type.pack_varint(0),  # Message type, 0 = chat
+                player.buff_type.pack_uuid(message.header.sender),  # Sender UUID
+                player.buff_type.pack_chat(sender_name),  # Sender display name
+                player.buff_type.pack('?', False),  # Optional team name
+                # Timestamp, salt
+                player.buff_type.pack('QQ', message.body.timestamp, message.body.salt),
+                player.buff_type.pack_byte_array(message.signature or b''))  # Signature
+
+    # Sends an unsigned chat message to the members of a room, using system messages on supporting clients
+    def broadcast_unsigned_chat(self, message: str, sender: UUID, sender_name: str, room: Room, relay: bool = True):
+        if relay and self.bus is not None:
+            self.bus.publish_unsigned_chat(message, sender, sender_name, room)
+        if self.chat_log is not None:
+            self.chat_log.append(sender, sender_name, room.name, message)
+
+        self.broadcast_packet(room.players_in_play(),
+                              lambda p: self.pack_unsigned_chat(p, message, sender, sender_name))
 
     def send_unsigned_chat(self, player: PyMcServProtocol, message: str, sender: UUID, sender_name: str):
+        player.send_packet(*self.pack_unsigned_chat(player, message, sender, sender_name))
+
+    # Sends the most recent chat messages in the player's room from the log
+    def replay_chat(self, player: PyMcServProtocol):
+        if self.chat_log is None:
+            return
+
+        for entry in self.chat_log.tail(self.chat_replay_count, player.room.name):
+            self.send_unsigned_chat(player, entry.message, entry.sender, entry.sender_name)
+
+    @staticmethod
+    def pack_unsigned_chat(player: PyMcServProtocol, message: str, sender: UUID, sender_name: str):
         # 1.19+ Send as system message to avoid client signature warnings
         if player.protocol_version >= 759:
-            self.send_system(player, "<%s> %s" % (sender_name, message))
-        else:  # Send regular chat message
-            player.send_packet("chat_message",
-                               player.buff_type.pack_chat("<%s> %s" % (sender_name, message)),
-                               player.buff_type.pack('B', 0),
-                               player.buff_type.pack_uuid(sender))
-
-    # Sends a system message, falling back to chat messages on older clients
-    def broadcast_system(self, message: str):
-        for player in self.players:
-            if player.protocol_mode != 'play':
-                continue
+            return PyMcServFactory.pack_system(player, "<%s> %s" % (sender_name, message))
+
+        # Send regular chat message
+        return ("chat_message",
+                player.buff_type.pack_chat("<%s> %s" % (sender_name, message)),
+                player.buff_type.pack('B', 0),
+                player.buff_type.pack_uuid(sender))
+
+    # Sends a system message to every player, or the members of a room, falling back to chat messages on older clients
+    def broadcast_system(self, message: Union[str, Message], essential: bool = True, relay: bool = True,
+                         room: Room = None):
+        if relay and self.bus is not None:
+            self.bus.publish_system(message, essential, room)
+
+        if room is None:
+            self.broadcast_packet_all(lambda p: self.pack_system(p, message), essential)
+        else:
+            self.broadcast_packet(room.players_in_play(), lambda p: self.pack_system(p, message), essential)
 
+    # Sends a system message to a player connected to this or another worker
+    def send_system_to(self, player: Union[PyMcServProtocol, RemotePlayer], message: Union[str, Message]):
+        if isinstance(player, RemotePlayer):
+            self.bus.publish_private(player.uuid, message)
+        else:
             self.send_system(player, message)
 
     @staticmethod
-    def send_system(player: PyMcServProtocol, message: str):
+    def send_system(player: PyMcServProtocol, message: Union[str, Message]):
+        player.send_packet(*PyMcServFactory.pack_system(player, message))
+
+    @staticmethod
+    def pack_system(player: PyMcServProtocol, message: Union[str, Message]):
         if player.protocol_version >= 760:  # 1.19.1+
-            player.send_packet("system_message",
-                               player.buff_type.pack_chat(message),
-                               player.buff_type.pack('?', False))  # Overlay, false = display in chat
+            return ("system_message",
+                    player.buff_type.pack_chat(message),
+                    player.buff_type.pack('?', False))  # Overlay, false = display in chat
         elif player.protocol_version == 759:  # 1.19
-            player.send_packet("system_message",
-                               player.buff_type.pack_chat(message),
-                               player.buff_type.pack_varint(1))
+            return ("system_message",
+                    player.buff_type.pack_chat(message),
+                    player.buff_type.pack_varint(1))
         else:
-            player.send_packet("chat_message",
-                               player.buff_type.pack_chat(message),
-                               player.buff_type.pack('B', 0),
-                               player.buff_type.pack_uuid(UUID(int=0)))
+            return ("chat_message",
+                    player.buff_type.pack_chat(message),
+                    player.buff_type.pack('B', 0),
+                    player.buff_type.pack_uuid(UUID(int=0)))
 
-    # Announces player join
+    # Puts a player in the default room, queueing a join announcement and player list entry for the room's next player
+    # list batch
     def broadcast_player_join(self, joined: PyMcServProtocol):
-        self.broadcast_system("\u00a7e%s has joined." % joined.display_name)
-        self.broadcast_player_list_add(joined)
+        self.rooms.add(joined, self.rooms.default)
+        self.status.invalidate()
+
+        if self.bus is not None:
+            self.bus.publish_join(joined)
 
-    # Announces player leave
+    # Takes a player out of their room, queueing a leave announcement and player list removal for the room's next
+    # player list batch
     def broadcast_player_leave(self, left: PyMcServProtocol):
-        self.broadcast_system("\u00a7e%s has left." % left.display_name)
-        self.broadcast_player_list_remove(left)
+        self.rooms.remove(left)
+        self.status.invalidate()
 
-    # Sends player list entry for new player to other players
-    def broadcast_player_list_add(self, added: PyMcServProtocol):
-        for player in self.players:
-            # Exclude the added player, they will be sent the full player list separately
-            if player.protocol_mode == 'play' and player != added:
-                self.send_player_list_add(player, [added])
+        if self.bus is not None:
+            self.bus.publish_leave(left)
+
+    # Moves a player to another room, replacing their player list with the new room's members
+    def move_player(self, player: PyMcServProtocol, room: Room):
+        previous = player.room
+        if room is previous:
+            return
+
+        self.rooms.remove(player)
+        others = [other.uuid for other in previous.all_players() if other is not player]
+        if others:
+            player.send_packet(*self.pack_player_list_remove(player, others))
+
+        self.send_player_list_add(player, room.all_players())
+        self.rooms.add(player, room)
+
+        if self.bus is not None:
+            self.bus.publish_room(player)
+
+        self.replay_chat(player)
+
+    @staticmethod
+    def send_player_list_add(player: PyMcServProtocol, added: Iterable[PyMcServProtocol]):
+        player.send_packet(*PyMcServFactory.pack_player_list_add(player, added))
 
     @staticmethod
-    def send_player_list_add(player: PyMcServProtocol, added: List[PyMcServProtocol]):
+    def pack_player_list_add(player: PyMcServProtocol, added: Iterable[PyMcServProtocol]):
+        added = [entry for entry in added if entry.protocol_mode == 'play']
+
         data = [
             player.buff_type.pack_varint(0),  # Action - 0 = Player add
             player.buff_type.pack_varint(len(added)),  # Player entry count
         ]
 
+        signed = player.protocol_version >= 759
         for entry in added:
-            if entry.protocol_mode != 'play':
-                continue
+            before, after, after_signed = PyMcServFactory.player_list_entry(entry)
+            data.append(before)
+            data.append(player.buff_type.pack_varint(entry.latency))  # Latency
+            data.append(after_signed if signed else after)
+
+        return ('player_list_item', *data)
+
+    # Returns a player's packed player list entry, in parts before and after their latency, which changes. The parts
+    # after are without and with the signature 1.19+ clients are sent, and are shared by players without a key.
+    # Packed once per player, as every joining player is sent the whole list.
+    @staticmethod
+    def player_list_entry(entry: Union[PyMcServProtocol, RemotePlayer]) -> Tuple[bytes, bytes, bytes]:
+        if entry.player_list_entry is None:
+            before = Buffer1_19_1.pack_uuid(entry.uuid) + \
+                     Buffer1_19_1.pack_string(entry.display_name) + \
+                     Buffer1_19_1.pack_varint(0) + \
+                     Buffer1_19_1.pack_varint(3)  # Player UUID, name, empty properties list and gamemode
+
+            if entry.public_key_data is None:
+                entry.player_list_entry = (before, *UNSIGNED_PLAYER_LIST_ENTRY)
+            else:
+                signature = Buffer1_19_1.pack_optional(Buffer1_19_1.pack_player_public_key, entry.public_key_data)
+                entry.player_list_entry = (before, UNSIGNED_PLAYER_LIST_ENTRY[0],
+                                           UNSIGNED_PLAYER_LIST_ENTRY[0] + signature)
 
+        return entry.player_list_entry
+
+    @staticmethod
+    def pack_player_list_latency(player: PyMcServProtocol, updated: List[PyMcServProtocol]):
+        data = [
+            player.buff_type.pack_varint(2),  # Action - 2 = Update latency
+            player.buff_type.pack_varint(len(updated)),  # Player entry count
+        ]
+
+        for entry in updated:
             data.append(player.buff_type.pack_uuid(entry.uuid))  # Player UUID
-            data.append(player.buff_type.pack_string(entry.display_name))  # Player name
-            data.append(player.buff_type.pack_varint(0))  # Empty properties list
-            data.append(player.buff_type.pack_varint(3))  # Gamemode
-            data.append(player.buff_type.pack_varint(0))  # Latency
-            data.append(player.buff_type.pack('?', False))  # No display name
-
-            # Add signature for 1.19+ clients if it exists
-            if player.protocol_version >= 759:
-                data.append(player.buff_type.pack_optional(player.buff_type.pack_player_public_key, entry.public_key_data))
-
-        player.send_packet('player_list_item', *data)
-
-    # Sends player list update for leaving player to other players
-    def broadcast_player_list_remove(self, removed: PyMcServProtocol):
-        for player in self.players:
-            if player.protocol_mode == 'play' and player != removed:
-                player.send_packet('player_list_item',
-                                   player.buff_type.pack_varint(4),  # Action - 4 = Player remove
-                                   player.buff_type.pack_varint(1),  # Player entry count
-                                   player.buff_type.pack_uuid(removed.uuid))  # Player UUID
\ No newline at end of file
+            data.append(player.buff_type.pack_varint(entry.latency))  # Latency
+
+        return ('player_list_item', *data)
+
+    @staticmethod
+    def pack_player_list_remove(player: PyMcServProtocol, removed: List[UUID]):
+        data = [
+            player.buff_type.pack_varint(4),  # Action - 4 = Player remove
+            player.buff_type.pack_varint(len(removed)),  # Player entry count
+        ]
+
+        for uuid in removed:
+            data.append(player.buff_type.pack_uuid(uuid))  # Player UUID
+
+        return ('player_list_item', *data)
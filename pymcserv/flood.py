@@ -0,0 +1,65 @@
+from __future__ import annotations
+from collections import OrderedDict
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a fixed rate, up to a maximum burst. Refilling is calculated when tokens are
+    taken, so idle buckets cost nothing.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate  # Tokens added per second
+        self.burst = burst  # Maximum number of tokens
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Takes the given number of tokens if there are enough, returning whether they were taken
+    def take(self, cost: float = 1, now: float = None) -> bool:
+        self.refill(time.monotonic() if now is None else now)
+
+        if self.tokens < cost:
+            return False
+
+        self.tokens -= cost
+        return True
+
+    # Takes the given number of tokens even if there aren't enough, returning how many are left. The result is negative
+    # while the bucket is overdrawn, and keeps falling for as long as tokens are taken faster than the refill rate.
+    def spend(self, cost: float = 1, now: float = None) -> float:
+        self.refill(time.monotonic() if now is None else now)
+        self.tokens -= cost
+        return self.tokens
+
+
+class AddressLimits:
+    """
+    Token buckets limiting how often each address can do something, kept for a bounded number of addresses. Once full,
+    the least recently seen address is forgotten, and starts again with a full bucket if it returns.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()  # By address, least recent first
+
+    def __len__(self):
+        return len(self.buckets)
+
+    # Takes a token from the address's bucket, creating it with the given rate and burst if needed. Returns whether it
+    # was taken. The settings are passed on each call so changes to them apply to addresses seen from then on.
+    def take(self, host: str, rate: float, burst: float, max_addresses: int) -> bool:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            if len(self.buckets) >= max_addresses:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[host] = TokenBucket(rate, burst)
+        else:
+            self.buckets.move_to_end(host)
+
+        return bucket.take()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+from itertools import count
+from typing import Dict, List
+import time
+
+from twisted.internet.task import LoopingCall
+from quarry.types.chat import Message
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+
+
+class KeepAliveScheduler:
+    """
+    Sends "Keep Alive" packets to every player in play mode from a single timer.
+    Players are spread over a number of buckets, and one bucket is swept per timer call, so each player is sent a
+    keep alive once per interval without every player being written to at the same moment.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.buckets: List[Dict[PyMcServProtocol, None]] = [{} for _ in range(factory.keep_alive_buckets)]
+        self.player_buckets: Dict[PyMcServProtocol, int] = {}
+        self.position = 0
+        self.ids = count(1)
+        self.loop = LoopingCall(self.sweep)
+
+    def add(self, player: PyMcServProtocol):
+        # Place the player in the least populated bucket
+        index = min(range(len(self.buckets)), key=lambda i: len(self.buckets[i]))
+        self.buckets[index][player] = None
+        self.player_buckets[player] = index
+
+        if not self.loop.running:
+            self.loop.start(self.factory.keep_alive_interval / len(self.buckets), now=False)
+
+    def remove(self, player: PyMcServProtocol):
+        index = self.player_buckets.pop(player, None)
+        if index is not None:
+            del self.buckets[index][player]
+
+        if not self.player_buckets and self.loop.running:
+            self.loop.stop()
+
+    def sweep(self):
+        bucket = self.buckets[self.position]
+        self.position = (self.position + 1) % len(self.buckets)
+        now = time.monotonic()
+
+        for player in list(bucket):
+            # Wait for the response to the last keep alive before sending another
+            if player.keep_alive_id is not None:
+                if now - player.keep_alive_time > self.factory.keep_alive_timeout:
+                    player.logger.warning("{} did not respond to keep alive".format(player.display_name))
+                    self.remove(player)
+                    player.close(Message({'translate': 'disconnect.timeout'}))
+                continue
+
+            player.send_keep_alive(next(self.ids), now)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from twisted.internet import reactor
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+# Upper bounds of the packet handler latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Counts packets handled and sent per packet type, timing inbound packet handlers, along with counters for other
+    server events and gauges which are computed when the metrics are read.
+    """
+
+    def __init__(self) -> None:
+        self.inbound: Dict[str, Histogram] = {}
+        self.outbound: Dict[str, List[int]] = {}  # Packet name to [count, bytes]
+        self.events: Dict[str, int] = {}
+        self.gauges: List[Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+    def observe_inbound(self, name: str, seconds: float):
+        histogram = self.inbound.get(name)
+        if histogram is None:
+            histogram = self.inbound[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count_outbound(self, name: str, size: int):
+        counts = self.outbound.get(name)
+        if counts is None:
+            counts = self.outbound[name] = [0, 0]
+        counts[0] += 1
+        counts[1] += size
+
+    def count_event(self, name: str, amount: int = 1):
+        self.events[name] = self.events.get(name, 0) + amount
+
+    # Registers a gauge, the callback returns (labels, value) pairs
+    def add_gauge(self, name: str, description: str, callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        self.gauges.append((name, description, callback))
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+
+        lines = []
+
+        def header(name, kind, description):
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, kind))
+
+        header("pymcserv_packet_handler_seconds", "histogram", "Time spent handling received packets")
+        for name, histogram in sorted(self.inbound.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append('pymcserv_packet_handler_seconds_bucket{packet="%s",le="%s"} %d' % (name, bound, cumulative))
+            lines.append('pymcserv_packet_handler_seconds_sum{packet="%s"} %f' % (name, histogram.sum))
+            lines.append('pymcserv_packet_handler_seconds_count{packet="%s"} %d' % (name, histogram.count))
+
+        header("pymcserv_packets_sent_total", "counter", "Packets sent")
+        for name, (count, size) in sorted(self.outbound.items()):
+            lines.append('pymcserv_packets_sent_total{packet="%s"} %d' % (name, count))
+
+        header("pymcserv_packet_bytes_sent_total", "counter", "Bytes sent before encryption")
+        for name, (count, size) in sorted(self.outbound.items()):
+            lines.append('pymcserv_packet_bytes_sent_total{packet="%s"} %d' % (name, size))
+
+        header("pymcserv_events_total", "counter", "Server events")
+        for name, count in sorted(self.events.items()):
+            lines.append('pymcserv_events_total{event="%s"} %d' % (name, count))
+
+        for name, description, callback in self.gauges:
+            header(name, "gauge", description)
+            for labels, value in callback():
+                label = ",".join('%s="%s"' % item for item in sorted(labels.items()))
+                lines.append("%s%s %s" % (name, "{%s}" % label if label else "", value))
+
+        return "\n".join(lines) + "\n"
+
+    # Returns a short human readable summary, for the in-game stats command
+    def summary(self, limit: int = 5) -> List[str]:
+        lines = []
+
+        busiest = sorted(self.inbound.items(), key=lambda item: item[1].sum, reverse=True)[:limit]
+        for name, histogram in busiest:
+            lines.append("in  %s: %d, %.3fms avg" % (name, histogram.count, histogram.sum / histogram.count * 1000))
+
+        largest = sorted(self.outbound.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        for name, (count, size) in largest:
+            lines.append("out %s: %d, %.1fKiB" % (name, count, size / 1024))
+
+        for name, count in sorted(self.events.items()):
+            lines.append("%s: %d" % (name, count))
+
+        return lines
+
+
+class MetricsResource(Resource):
+    isLeaf = True
+
+    def __init__(self, metrics: Metrics) -> None:
+        super().__init__()
+        self.metrics = metrics
+
+    def render_GET(self, request):
+        request.setHeader(b"content-type", b"text/plain; version=0.0.4; charset=utf-8")
+        return self.metrics.render().encode("utf-8")
+
+
+# Serves the metrics over HTTP on localhost only
+def listen_metrics(metrics: Metrics, port: int):
+    site = Site(MetricsResource(metrics))
+    site.noisy = False
+    return reactor.listenTCP(port, site, interface="127.0.0.1")
@@ -0,0 +1,140 @@
+from __future__ import annotations
+from typing import Dict, List
+
+from twisted.internet import reactor
+from quarry.types.uuid import UUID
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from twisted.internet.interfaces import IDelayedCall
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+    from pymcserv.rooms import Room
+
+
+class PlayerListBatcher:
+    """
+    Buffers player list changes and join/leave announcements of a room, and sends them to its members in batches.
+    Each batch sends at most one "Player List Item" packet per action to each player, and players who join and leave
+    within the same batch are neither sent nor announced.
+    """
+
+    def __init__(self, factory: PyMcServFactory, room: Room) -> None:
+        self.factory = factory
+        self.room = room
+        self.added: Dict[PyMcServProtocol, None] = {}  # Players to add and announce as joined, in join order
+        self.removed: Dict[UUID, None] = {}  # UUIDs of players to remove
+        self.left: List[str] = []  # Names to announce as left
+        self.latency: Dict[PyMcServProtocol, None] = {}  # Players whose latency has changed
+        self.delayed_call: IDelayedCall = None
+        self.latency_call: IDelayedCall = None
+
+    def add(self, player: PyMcServProtocol):
+        self.added[player] = None
+        self.schedule()
+
+    def remove(self, player: PyMcServProtocol):
+        self.latency.pop(player, None)
+
+        # Players added in this batch were never sent or announced to anyone, so there is nothing to undo
+        if player in self.added:
+            del self.added[player]
+            return
+
+        self.removed[player.uuid] = None
+        self.left.append(player.display_name)
+        self.schedule()
+
+    # Latency changes are frequent and unimportant, so are sent on a slower schedule than joins and leaves
+    def update_latency(self, player: PyMcServProtocol):
+        self.latency[player] = None
+
+        if self.latency_call is None:
+            self.latency_call = reactor.callLater(self.factory.latency_update_delay, self.flush_latency)
+
+    def flush_latency(self):
+        self.latency_call = None
+
+        # Players who are still waiting to be added will be sent with their latency
+        updated = [player for player in self.latency if player.protocol_mode == 'play' and player not in self.added]
+        self.latency = {}
+
+        # Share this worker's players' latencies with other workers
+        if self.factory.bus is not None:
+            local = [player for player in updated if player in self.factory.players]
+            if local:
+                self.factory.bus.publish_latency(local)
+
+        if updated:
+            self.factory.broadcast_packet(self.room.players_in_play(),
+                                          lambda p: self.factory.pack_player_list_latency(p, updated), essential=False)
+
+    def schedule(self):
+        if self.factory.player_list_delay <= 0:
+            self.flush()
+        elif self.delayed_call is None:
+            self.delayed_call = reactor.callLater(self.factory.player_list_delay, self.flush)
+
+    def cancel(self):
+        if self.delayed_call is not None and self.delayed_call.active():
+            self.delayed_call.cancel()
+        self.delayed_call = None
+
+    # Drops everything waiting to be sent
+    def clear(self):
+        self.cancel()
+
+        if self.latency_call is not None and self.latency_call.active():
+            self.latency_call.cancel()
+        self.latency_call = None
+
+        self.added, self.removed, self.left, self.latency = {}, {}, [], {}
+
+    def flush(self):
+        self.cancel()
+
+        joined = [player.display_name for player in self.added]
+        added = [player for player in self.added if player.protocol_mode == 'play']
+        removed = list(self.removed)
+        left = self.left
+
+        self.added, self.removed, self.left = {}, {}, []
+
+        self.announce(joined, "joined")
+        self.announce(left, "left")
+
+        recipients = self.room.players_in_play()
+
+        # Remove before adding, in case a player has reconnected with the same UUID
+        if removed:
+            self.factory.broadcast_packet(recipients, lambda p: self.factory.pack_player_list_remove(p, removed))
+
+        if added:
+            # Players who joined in this batch were sent the full player list when they joined, so only need the
+            # players who joined after them
+            positions = {player: index for index, player in enumerate(added)}
+            existing = [player for player in recipients if player not in positions]
+
+            self.factory.broadcast_packet(existing, lambda p: self.factory.pack_player_list_add(p, added))
+
+            # Players connected to other workers are sent their player list by their own worker
+            for player, index in positions.items():
+                if index + 1 < len(added) and player in self.factory.players:
+                    self.factory.send_player_list_add(player, added[index + 1:])
+
+    # Sends one message per name, or a single summary message for larger bursts
+    # Every worker batches and announces all joins and leaves itself, so announcements are not relayed to other workers
+    # Players moving between rooms are announced as leaving one room and joining the other
+    def announce(self, names: List[str], action: str):
+        if not names:
+            return
+
+        if len(names) <= self.factory.announce_summary_threshold:
+            for name in names:
+                self.factory.broadcast_system("\u00a7e%s has %s." % (name, action), essential=False,
+                                              relay=False, room=self.room)
+        else:
+            shown = self.factory.announce_summary_threshold
+            self.factory.broadcast_system("\u00a7e%s and %d others have %s." % (
+                ", ".join(names[:shown]), len(names) - shown, action), essential=False, relay=False,
+                room=self.room)
@@ -1,43 +1,90 @@
 from __future__ import annotations
-from typing import List
-import sys
+from collections import deque
+from typing import Deque, FrozenSet, List, Tuple
+import time
 
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
 from quarry.net.server import ServerProtocol
 from quarry.types.chat import SignedMessage, SignedMessageHeader, SignedMessageBody, Message, LastSeenMessage
+
+from ..flood import TokenBucket
+from .last_seen import LastSeenTracker, UNKNOWN_INDEX
+from .login import LoginProtocol
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from quarry.types.buffer import Buffer1_19_1
-    from quarry.net.ticker import Ticker
     from ..factory import PyMcServFactory
+    from ..rooms import Room
 
 
 
-class ChatProtocol(ServerProtocol):
+@implementer(IPushProducer)
+class ChatProtocol(LoginProtocol):
     previous_timestamp = 0  # Timestamp of last chat message sent by the client, used for out-of-order chat checking
     previous_signature = None  # Signature of the last chat message sent by the client, used as part of the next message's signature
-    pending_messages = []  # Chat messages pending acknowledgement by the client
-    previously_seen = []  # Chat messages acknowledged by the client in the last chat message
+    last_seen_tracker: LastSeenTracker = None  # Chat messages pending acknowledgement and previously acknowledged
+    pending_verifications: Deque[List] = None  # Chat messages waiting for signature verification, in order received
+    keep_alive_id = None  # ID of the last keep alive sent to the client, if it hasn't responded yet
+    keep_alive_time = 0  # Time the last keep alive was sent
+    latency = 0  # Estimated round trip time in milliseconds
+    permissions: FrozenSet[str] = frozenset()  # Permissions deciding which commands the player can see and use
+    lagging = False  # Whether the client has fallen behind reading what we send it
+    chat_bucket: TokenBucket = None  # Limits how quickly the client can send chat messages and commands
+    room: Room = None  # Room the player is chatting in
+    player_list_entry: Tuple[bytes, bytes, bytes] = None  # Packed player list entry, see PyMcServFactory.player_list_entry
     buff_type: Buffer1_19_1 = None
     factory: PyMcServFactory = None
-    ticker: Ticker = None
+
+    # Creates the state only needed once in play mode, so connections which only ping or log in don't carry it
+    def setup_play(self):
+        self.last_seen_tracker = LastSeenTracker(self.factory.max_pending_messages)
+        self.chat_bucket = TokenBucket(self.factory.chat_rate, self.factory.chat_burst)
+
+    def connection_made(self):
+        super().connection_made()
+
+        # Get told when the transport's write buffer passes the high watermark
+        self.transport.bufferSize = self.factory.write_buffer_high
+        self.transport.registerProducer(self, True)
+
+    # Stops producing for the transport before closing. While a paused producer is registered, the transport resumes it
+    # once its buffer empties rather than finishing the close, so a lagging client would never be disconnected.
+    def close(self, reason=None):
+        if not self.closed and self.transport is not None:
+            self.transport.unregisterProducer()
+
+        super().close(reason)
+
+    # Called by the transport when its write buffer is full
+    def pauseProducing(self):
+        if not self.lagging:
+            self.lagging = True
+            self.factory.metrics.count_event("backpressure_lagging")
+
+    # Called by the transport when its write buffer has been emptied
+    def resumeProducing(self):
+        self.lagging = False
+
+    def stopProducing(self):
+        pass
+
+    # Returns whether the client is lagging, allowing it to recover once its buffer drops below the low watermark
+    def is_lagging(self) -> bool:
+        if self.lagging and self.write_buffer_size() <= self.factory.write_buffer_low:
+            self.lagging = False
+        return self.lagging
 
     def player_joined(self):
         # Call super. This switches us to "play" mode, marks the player as
         #   in-game, and does some logging.
         ServerProtocol.player_joined(self)
+        self.setup_play()
 
-        # Send server data packet on 1.19+
-        if self.protocol_version >= 760:
-            self.send_packet('server_data',
-                             self.buff_type.pack('????',
-                                                 False,                      # Optional description
-                                                 False,                      # Optional favicon
-                                                 False,                      # Disable chat previews
-                                                 self.factory.online_mode))  # Enforce chat signing when in online mode
-        elif self.protocol_version == 759:  # 1.19 lacks enforce chat signing field
-            self.send_packet('server_data', self.buff_type.pack('???', False, False, False))
-
-        # Send join game packet
+        if self.display_name in self.factory.operators:
+            self.permissions = frozenset({"admin"})
+
+        # Send server data, join game, brand and command packets
         self.factory.send_join_game(self)
 
         # Send "Player Position and Look" packet
@@ -54,23 +101,125 @@ class ChatProtocol(ServerProtocol):
             self.buff_type.pack("?", True))  # Leave vehicle,
 
         # Start sending "Keep Alive" packets
-        self.ticker.add_loop(20, self.update_keep_alive)
+        self.factory.keep_alive.add(self)
+
+        # Make the player reachable by broadcasts, /msg and tab completion
+        self.factory.directory.add(self)
 
         # Announce player join to other players
         self.factory.broadcast_player_join(self)
 
-        # Send full player list
-        self.factory.send_player_list_add(self, self.factory.players)
+        # Send the room's full player list, including players connected to other workers
+        self.factory.send_player_list_add(self, self.room.all_players())
+
+        # Show the conversation so far
+        self.factory.replay_chat(self)
+
+        # The login is complete, let the next queued one start
+        self.factory.admission.joined(self)
 
     def player_left(self):
         ServerProtocol.player_left(self)
 
+        self.factory.keep_alive.remove(self)
+        self.factory.directory.remove(self)
+
+        if self.public_key_data is not None and self.factory.verifier is not None:
+            self.factory.verifier.forget(self.public_key_data)
+
         # Announce player leave to other players
         self.factory.broadcast_player_leave(self)
 
-    def update_keep_alive(self):
+    def send_packet(self, name, *data):
+        if self.closed:
+            return
+
+        self.send_frame(name, self.pack_frame(name, *data))
+
+    # Packs a packet into a length-prefixed (and possibly compressed) frame. Frames can be shared between connections
+    # using the same protocol version and compression threshold, see PyMcServFactory.broadcast_packet
+    def pack_frame(self, name, *data):
+        data = self.buff_type.pack_varint(self.get_packet_ident(name)) + b"".join(data)
+        return self.buff_type.pack_packet(data, self.compression_threshold)
+
+    # Encrypts and sends a frame created by pack_frame
+    def send_frame(self, name, frame: bytes):
+        if self.closed:
+            return
+
+        self.log_packet("# send", name)
+        self.factory.metrics.count_outbound(name, len(frame))
+        self.transport.write(self.cipher.encrypt(frame))
+
+        # Disconnect clients which have stopped reading entirely, rather than buffering for them forever
+        if self.lagging and self.write_buffer_size() > self.factory.write_buffer_limit:
+            self.logger.warning("{} is not reading, disconnecting".format(self.display_name))
+            self.factory.metrics.count_event("backpressure_kicked")
+            self.close()
+            self.transport.abortConnection()
+
+    # Returns the number of bytes waiting to be written to the client
+    def write_buffer_size(self) -> int:
+        transport = self.transport
+        # Transports from the asyncio backend count their own buffer
+        get_write_buffer_size = getattr(transport, "get_write_buffer_size", None)
+        if get_write_buffer_size is not None:
+            return get_write_buffer_size()
+        # Twisted's buffer holds data before offset which has already been written
+        return len(getattr(transport, "dataBuffer", b"")) - getattr(transport, "offset", 0) + \
+            getattr(transport, "_tempDataLen", 0)
+
+    def packet_received(self, buff, name):
+        start = time.perf_counter()
+        super().packet_received(buff, name)
+        self.factory.metrics.observe_inbound(name, time.perf_counter() - start)
+
+    # Adds a chat message sent to this client to the pending list for later last seen validation
+    def add_pending_message(self, message: LastSeenMessage):
+        if not self.last_seen_tracker.add(message):
+            self.logger.warning("{} has too many unacknowledged chat messages".format(self.display_name))
+            self.close(Message({'translate': 'multiplayer.disconnect.too_many_pending_chats'}))
+
+    def send_keep_alive(self, keep_alive_id: int, now: float):
         # Send a "Keep Alive" packet
-        self.send_packet("keep_alive", self.buff_type.pack('Q', 0))
+        self.keep_alive_id = keep_alive_id
+        self.keep_alive_time = now
+        self.send_packet("keep_alive", self.buff_type.pack('Q', keep_alive_id))
+
+    def packet_keep_alive(self, buff: Buffer1_19_1):
+        keep_alive_id = buff.unpack('Q')
+
+        # Ignore unexpected responses, the client will be timed out if it never sends the expected one
+        if keep_alive_id != self.keep_alive_id:
+            return
+
+        # Smooth the round trip time the same way vanilla does
+        rtt = int((time.monotonic() - self.keep_alive_time) * 1000)
+        self.latency = (self.latency * 3 + rtt) // 4
+        self.keep_alive_id = None
+
+        self.room.player_list.update_latency(self)
+
+    # Returns whether a chat message or command can be handled, applying the client's rate limit and, for messages sent
+    # to other players, the server's fan-out budget. Clients which keep sending over their limit are disconnected.
+    def allow_chat(self, recipients: int) -> bool:
+        now = time.monotonic()
+        tokens = self.chat_bucket.spend(1, now)
+
+        if tokens < 0:
+            self.factory.metrics.count_event("chat_rate_limited")
+
+            if tokens < -self.factory.chat_kick_excess:
+                self.logger.warning("{} is spamming chat, disconnecting".format(self.display_name))
+                self.factory.metrics.count_event("chat_spam_kicked")
+                self.close(Message({'translate': 'disconnect.spam'}))
+            return False
+
+        if recipients and not self.factory.chat_fanout.take(recipients, now):
+            self.factory.metrics.count_event("chat_fanout_limited")
+            return False
+
+        return True
 
     def packet_chat_message(self, buff: Buffer1_19_1):
         if self.protocol_mode != 'play':
@@ -95,7 +244,7 @@ class ChatProtocol(ServerProtocol):
                 # 1.19.1+ includes list of "last seen" messages
                 if self.protocol_version >= 760:
                     last_seen = buff.unpack_last_seen_list()  # List of previously sent messages acknowledged by the client
-                    last_received = buff.unpack_optional(buff.pack_last_seen_entry)  # Optional "last received" message
+                    last_received = buff.unpack_optional(buff.unpack_last_seen_entry)  # Optional "last received" message
 
             header = SignedMessageHeader(self.uuid, self.previous_signature)
             body = SignedMessageBody(message, timestamp, salt, None, last_seen)
@@ -109,46 +258,100 @@ class ChatProtocol(ServerProtocol):
             # Update previous message data from current message
             self.previous_timestamp = signed_message.body.timestamp
             self.previous_signature = signed_message.signature
-            self.previously_seen = signed_message.body.last_seen
+            self.last_seen_tracker.set_previously_seen(signed_message.body.last_seen)
 
-            self.factory.broadcast_signed_chat(signed_message, self.display_name)
-        else:
-            self.factory.broadcast_unsigned_chat(message, self.uuid, self.display_name)
+            # Rate limit after updating the chain state above, so the client's next message still validates
+            if self.allow_chat(len(self.room.players)):
+                self.verify_signed_message(signed_message)
+        elif self.allow_chat(len(self.room.players)):
+            self.factory.broadcast_unsigned_chat(message, self.uuid, self.display_name, self.room)
 
         buff.discard()
 
+    # 1.19.1+ clients acknowledge the chat messages they have seen once enough are pending, so clients which only read
+    # chat don't build up pending messages until they are disconnected
+    def packet_acknowledge_chat(self, buff: Buffer1_19_1):
+        if self.protocol_mode != 'play':
+            buff.discard()
+            return
+
+        last_seen = buff.unpack_last_seen_list()
+        last_received = buff.unpack_last_received()
+
+        if self.validate_last_seen(last_seen, last_received):
+            self.last_seen_tracker.set_previously_seen(last_seen)
+
     def validate_signed_message(self, message: SignedMessage, last_received: LastSeenMessage = None):
-        # Kick player if this message is older than the previous one
-        if message.body.timestamp < self.previous_timestamp:
-            self.logger.warning("{} sent out-of-order chat: {}".format(self.display_name, message.body.message))
-            self.close(Message({'translate': 'multiplayer.disconnect.out_of_order_chat'}))
+        if self.validate_timestamp(message.body.timestamp, message.body.message) is False:
             return False
 
         if self.validate_last_seen(message.body.last_seen, last_received) is False:
             return False
 
+    # Kick player if a chat message or command is older than the previous one
+    def validate_timestamp(self, timestamp: int, message: str):
+        if timestamp < self.previous_timestamp:
+            self.logger.warning("{} sent out-of-order chat: {}".format(self.display_name, message))
+            self.close(Message({'translate': 'multiplayer.disconnect.out_of_order_chat'}))
+            return False
+
+    # Verifies the message signature, then broadcasts the message
+    # When the factory has a signature verifier, verification happens in its workers and messages are queued so they
+    # are still broadcast in the order they were received
+    def verify_signed_message(self, message: SignedMessage):
+        if self.public_key_data is None:
+            self.factory.broadcast_signed_chat(message, self.display_name, self.room)
+            return
+
+        verifier = self.factory.verifier
+        if verifier is None:
+            self.signed_message_verified(message, message.verify(self.public_key_data.key))
+            return
+
+        if self.pending_verifications is None:
+            self.pending_verifications = deque()
+
+        entry = [message, None]
+        self.pending_verifications.append(entry)
+        verifier.verify(message, self.public_key_data).addCallback(self.signed_message_queue_verified, entry)
+
+    def signed_message_queue_verified(self, valid: bool, entry: List):
+        entry[1] = valid
+
+        # Broadcast verified messages from the front of the queue, stopping at the first unverified one
+        while self.pending_verifications and self.pending_verifications[0][1] is not None:
+            message, valid = self.pending_verifications.popleft()
+            self.signed_message_verified(message, valid)
+
+    def signed_message_verified(self, message: SignedMessage, valid: bool):
+        if self.closed:
+            return
+
         # Kick player if we cannot verify the message signature
-        if self.public_key_data is not None and message.verify(self.public_key_data.key) is False:
+        if valid is False:
+            self.pending_verifications = None
             self.close(Message({'translate': 'multiplayer.disconnect.unsigned_chat'}))
-            return False
+            return
+
+        self.factory.broadcast_signed_chat(message, self.display_name, self.room)
 
     # Validate the last seen list (and optional last received message)
     # The last seen list is a list of the latest messages sent by other players, one per player
     def validate_last_seen(self, last_seen: List[LastSeenMessage], last_received: LastSeenMessage = None):
         errors = []
-        profiles = []
+        profiles = set()
 
         # The last seen list should never be shorter than the previous one
-        if len(last_seen) < len(self.previously_seen):
+        if len(last_seen) < len(self.last_seen_tracker.previously_seen):
             errors.append('Previously present messages removed from context')
 
         # Get indices of last seen messages to validate ordering
         indices = self.calculate_indices(last_seen, last_received)
-        previous_index = -sys.maxsize - 1
+        previous_index = UNKNOWN_INDEX
 
         # Loop over indices to see if the message order is correct
         for index in indices:
-            if index == -sys.maxsize - 1:  # Message wasn't in previously_seen or pending_messages lists
+            if index == UNKNOWN_INDEX:  # Message wasn't in previously_seen or pending_messages lists
                 errors.append('Unknown message')
             elif index < previous_index:  # Message is earlier than previous message
                 errors.append('Messages received out of order')
@@ -157,7 +360,7 @@ class ChatProtocol(ServerProtocol):
 
         # Remove seen messages (and any older ones from the same players) from the pending list
         if previous_index >= 0:
-            self.pending_messages = self.pending_messages[previous_index + 1::]
+            self.last_seen_tracker.acknowledge(previous_index)
 
         # All last seen entries should be from different players
         for entry in last_seen:
@@ -165,7 +368,7 @@ class ChatProtocol(ServerProtocol):
                 errors.append('Multiple entries for single profile')
                 break
 
-            profiles.append(entry.sender)
+            profiles.add(entry.sender)
 
         # Kick player if any validation fails
         if len(errors):
@@ -177,37 +380,15 @@ class ChatProtocol(ServerProtocol):
         return True
 
     # Returns an array containing the positions of each of the given last_seen messages
-    # (and the optional last_received message) in the previously_seen and pending_messages lists
+    # (and the optional last_received message) in the previously_seen and pending lists of the last seen tracker
     # A valid last_seen list should contain messages ordered oldest to newest, meaning the resulting array should
     # contain indices in ascending order
     def calculate_indices(self, last_seen: List[LastSeenMessage], last_received: LastSeenMessage = None):
-        indices = [-sys.maxsize - 1] * len(last_seen)  # Populate starting lists with min value, indicating a message wasn't found
-
-        # Get indices of any last seen messages which are in the previously seen list
-        for index, value in enumerate(self.previously_seen):
-            try:
-                position = last_seen.index(value)
-                indices[position] = -index - 1  # Negate previously seen entries to order them "before" pending entries
-            except ValueError:  # Not in list
-                continue
-
-        # Get indices of any last seen messages which are in the pending messages list
-        for index, value in enumerate(self.pending_messages):
-            try:
-                position = last_seen.index(value)
-                indices[position] = index
-            except ValueError:  # Not in list
-                continue
-
-        # List will be in descending order here, reverse it
-        indices.reverse()
+        # Last seen lists are in descending order, reverse it
+        indices = [self.last_seen_tracker.position(entry) for entry in reversed(last_seen)]
 
         # Get index of last received message if present
         if last_received is not None:
-            try:
-                indices.append(self.pending_messages.index(last_received))
-            except ValueError:
-                indices.append(-sys.maxsize - 1)
-                pass
+            indices.append(self.last_seen_tracker.pending_position(last_received))
 
-        return indices
\ No newline at end of file
+        return indices
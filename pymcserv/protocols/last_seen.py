@@ -0,0 +1,74 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import sys
+
+from quarry.types.chat import LastSeenMessage
+
+# Index given to messages which are in neither the pending or previously seen lists
+UNKNOWN_INDEX = -sys.maxsize - 1
+
+
+class LastSeenTracker:
+    """
+    Tracks the chat messages sent to a client which it has not acknowledged yet, and the last seen list from its
+    previous chat message.
+    Pending messages are numbered with an increasing sequence number and indexed by (sender, signature), so looking up
+    the position of a last seen entry is O(1). At most `capacity` messages can be pending at once.
+    Every player has one, so it is slotted and uses dicts, which are far smaller than a deque while empty.
+    """
+
+    __slots__ = ("capacity", "pending", "pending_start", "pending_index", "previously_seen")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.pending: Dict[int, Tuple] = {}  # Keys of pending messages by sequence number, oldest first
+        self.pending_start = 0  # Sequence number of the oldest pending message
+        self.pending_index: Dict[Tuple, int] = {}  # Latest sequence number for each pending key
+        self.previously_seen: Dict[Tuple, int] = {}  # Positions of the entries in the previous last seen list
+
+    def __len__(self):
+        return len(self.pending)
+
+    @staticmethod
+    def key(message: LastSeenMessage) -> Tuple:
+        return message.sender, message.signature
+
+    # Adds a message sent to the client, returns False if the client has too many unacknowledged messages
+    def add(self, message: LastSeenMessage) -> bool:
+        if len(self.pending) >= self.capacity:
+            return False
+
+        key = self.key(message)
+        sequence = self.pending_start + len(self.pending)
+        self.pending_index[key] = sequence
+        self.pending[sequence] = key
+        return True
+
+    # Removes all pending messages up to and including the given sequence number
+    def acknowledge(self, sequence: int):
+        while self.pending and self.pending_start <= sequence:
+            key = self.pending.pop(self.pending_start)
+            if self.pending_index.get(key) == self.pending_start:
+                del self.pending_index[key]
+            self.pending_start += 1
+
+    def set_previously_seen(self, last_seen: List[LastSeenMessage]):
+        self.previously_seen = {self.key(entry): index for index, entry in enumerate(last_seen)}
+
+    # Returns the sequence number of a pending message, or UNKNOWN_INDEX if it isn't pending
+    def pending_position(self, message: LastSeenMessage) -> int:
+        return self.pending_index.get(self.key(message), UNKNOWN_INDEX)
+
+    # Returns the position of a message in the pending list, falling back to the previously seen list.
+    # Previously seen entries are negated to order them "before" pending entries.
+    def position(self, message: LastSeenMessage) -> int:
+        key = self.key(message)
+        sequence = self.pending_index.get(key)
+        if sequence is not None:
+            return sequence
+
+        index = self.previously_seen.get(key)
+        if index is not None:
+            return -index - 1
+
+        return UNKNOWN_INDEX
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from quarry.net import auth, crypto, server
+from quarry.net.protocol import ProtocolError
+from quarry.net.server import ServerProtocol
+
+from .status import StatusProtocol
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from twisted.internet.defer import Deferred
+    from quarry.types.buffer import Buffer1_19_1
+    from ..auth import SessionAuthenticator
+    from ..factory import PyMcServFactory
+
+
+class SessionCheck:
+    """
+    Stands in for quarry.net.auth while quarry handles an encryption response, sending its session check to the
+    factory's authenticator rather than quarry's unpooled client.
+    """
+
+    def __init__(self, authenticator: SessionAuthenticator) -> None:
+        self.authenticator = authenticator
+
+    # Same arguments as quarry.net.auth.has_joined. The authenticator times out after the factory's auth_timeout,
+    # which is what quarry passes.
+    def has_joined(self, timeout: float, digest: str, display_name: str, remote_host: str = None) -> Deferred:
+        return self.authenticator.has_joined(digest, display_name, remote_host)
+
+
+class LoginProtocol(StatusProtocol):
+    factory: PyMcServFactory = None
+    server_id: str = None  # Made for online mode logins, and released once encryption is enabled
+    verify_token: bytes = None
+
+    def __init__(self, factory: PyMcServFactory, remote_addr):
+        super().__init__(factory, remote_addr)
+
+        # quarry has already made login tokens for the connection. Only online logins use them, and they make their own
+        # in start_login, so these are dropped rather than kept while the connection is idle. Making them isn't saved.
+        self.server_id = self.verify_token = None
+
+    def packet_handshake(self, buff: Buffer1_19_1):
+        super().packet_handshake(buff)
+
+        if self.protocol_mode == 'login' and not self.closed and \
+                not self.factory.admission.allow(self.remote_addr.host):
+            self.factory.metrics.count_event("login_rate_limited")
+            self.close("Logging in too often, please wait before trying again")
+
+    # Starts the login once the admission controller lets it, which may be straight away
+    def packet_login_start(self, buff: Buffer1_19_1):
+        if self.login_expecting != 0 or self in self.factory.admission.queue:
+            raise ProtocolError("Out-of-order login")
+
+        data = buff.read()
+        self.factory.admission.admit(self, lambda: self.start_login(data))
+
+    def start_login(self, data: bytes):
+        if self.factory.online_mode:
+            self.server_id = crypto.make_server_id()
+            self.verify_token = crypto.make_verify_token()
+
+        ServerProtocol.packet_login_start(self, self.buff_type(data))
+
+    # Tells a queued client its position in the queue. There is no way to show a message to players while logging in,
+    # so this is sent as a login plugin request on the "pymcserv:queue" channel, which the vanilla client answers
+    # without showing. The exchange stops either side timing out the connection while it waits.
+    def send_queue_position(self, position: int):
+        if self.protocol_version < 393:  # Login plugin requests were added in 1.13
+            return
+
+        self.send_packet("login_plugin_request",
+                         self.buff_type.pack_varint(position),  # Message ID, the position so answers are easy to match
+                         self.buff_type.pack_string("pymcserv:queue"),
+                         self.buff_type.pack_varint(position))
+
+    def packet_login_plugin_response(self, buff: Buffer1_19_1):
+        buff.discard()
+
+    def connection_lost(self, reason=None):
+        super().connection_lost(reason)
+        self.factory.admission.finished(self)
+
+    # Handled by quarry, with the session checked by the factory's authenticator, which pools and limits session server
+    # requests. Encryption gets its own cipher, and the login tokens are released once quarry has checked them.
+    def packet_login_encryption_response(self, buff: Buffer1_19_1):
+        self.cipher = crypto.Cipher()
+
+        server.auth = SessionCheck(self.factory.authenticator)
+        try:
+            super().packet_login_encryption_response(buff)
+        finally:
+            server.auth = auth
+
+        if self.login_expecting is None:
+            self.server_id = self.verify_token = None
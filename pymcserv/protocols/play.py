@@ -1,7 +1,7 @@
 from .chat import ChatProtocol
-from ..commands.tab_complete import TabCompleteProtocol
+from ..commands.execute import CommandProtocol
 
 
-class PyMcServProtocol(TabCompleteProtocol):
+class PyMcServProtocol(CommandProtocol):
     def player_joined(self):
         ChatProtocol.player_joined(self)
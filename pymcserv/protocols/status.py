@@ -0,0 +1,75 @@
+from __future__ import annotations
+import logging
+
+from quarry.net.crypto import Cipher
+from quarry.net.server import ServerProtocol
+
+from .utils import forget_logger
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from quarry.types.buffer import Buffer1_19_1
+    from ..factory import PyMcServFactory
+
+# Cipher of connections which aren't encrypted. It does nothing so is shared, enabling encryption gives a connection
+# its own.
+UNENCRYPTED = Cipher()
+
+
+class StatusProtocol(ServerProtocol):
+    factory: PyMcServFactory = None
+    logger = logging.getLogger("pymcserv.connections")  # Shared by every connection
+
+    def __init__(self, factory: PyMcServFactory, remote_addr):
+        super().__init__(factory, remote_addr)
+
+        # quarry has already made a cipher for the connection. Swapping in the shared one only saves keeping it while
+        # the connection is idle, not making it.
+        self.cipher = UNENCRYPTED
+
+        # quarry makes a logger for each address, which the logging module would keep forever
+        forget_logger(self.__dict__.pop("logger"))
+
+        # quarry's connection timer is a task on the ticker, which every connection shares. The factory's
+        # ConnectionTimeouts times connections out from a single loop instead.
+        self.connection_timer.stop()
+        self.connection_timer = self.factory.timeouts.add(self)
+
+    def connection_lost(self, reason=None):
+        super().connection_lost(reason)
+        self.connection_timer.stop()
+
+    def packet_handshake(self, buff: Buffer1_19_1):
+        super().packet_handshake(buff)
+
+        # Status packets are the same in every version, so answer pings from unsupported versions as the newest
+        # supported one. Otherwise their packets can't be looked up, and only one response per version is cached.
+        if self.protocol_mode == 'status' and self.protocol_version not in self.factory.minecraft_versions:
+            self.protocol_version = max(self.factory.minecraft_versions)
+            self.buff_type = self.factory.get_buff_type(self.protocol_version)
+
+    # Returns whether the client's address may ping now, closing the connection if not
+    def allow_status(self) -> bool:
+        if self.factory.status.allow(self.remote_addr.host):
+            return True
+
+        self.factory.metrics.count_event("status_rate_limited")
+        self.close()
+        return False
+
+    def packet_status_request(self, buff: Buffer1_19_1):
+        if not self.allow_status():
+            return
+
+        # Status is never compressed or encrypted, so the cached frame is written as is
+        frame = self.factory.status.get_frame(self)
+        self.log_packet("# send", "status_response")
+        self.factory.metrics.count_outbound("status_response", len(frame))
+        self.transport.write(frame)
+
+    def packet_status_ping(self, buff: Buffer1_19_1):
+        if not self.allow_status():
+            buff.discard()
+            return
+
+        super().packet_status_ping(buff)
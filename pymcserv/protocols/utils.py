@@ -1,4 +1,5 @@
 from __future__ import annotations
+import logging
 import string
 
 from typing import TYPE_CHECKING
@@ -30,4 +31,25 @@ def hexdump(buffer: Buffer1_19_1):
 
         bytes_read += len(data_line)
 
-    return "\n    ".join(lines + [f"{bytes_read:08x}"])
\ No newline at end of file
+    return "\n    ".join(lines + [f"{bytes_read:08x}"])
+
+
+# Removes a logger from the logging module's registry, which otherwise keeps every logger ever made. getLogger also
+# makes a placeholder for each dotted prefix of the name that has no logger, e.g. for each part of an IP address, and
+# those only referring to this logger are removed too. Nothing must use the logger by its name afterwards.
+def forget_logger(logger: logging.Logger):
+    loggers = logging.Logger.manager.loggerDict
+    if loggers.get(logger.name) is not logger:
+        return
+    del loggers[logger.name]
+
+    name = logger.name
+    while "." in name:
+        name = name.rpartition(".")[0]
+        placeholder = loggers.get(name)
+        if not isinstance(placeholder, logging.PlaceHolder):
+            break
+
+        placeholder.loggerMap.pop(logger, None)
+        if not placeholder.loggerMap:
+            del loggers[name]
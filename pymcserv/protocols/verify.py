@@ -0,0 +1,79 @@
+from __future__ import annotations
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Union
+from weakref import WeakKeyDictionary
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from twisted.internet import defer, reactor
+from quarry.net.auth import PlayerPublicKey
+from quarry.types.chat import SignedMessage
+
+# Public keys loaded inside worker processes, keyed by their DER encoding
+_loaded_keys: Dict[bytes, RSAPublicKey] = {}
+_max_loaded_keys = 4096
+
+
+def verify_message(message: SignedMessage, key: Union[RSAPublicKey, bytes]) -> bool:
+    """
+    Verifies a message signature. Runs inside the verifier's workers, so the key may be the DER encoding of the
+    public key when it has to be sent to another process.
+    """
+
+    if isinstance(key, bytes):
+        loaded = _loaded_keys.get(key)
+        if loaded is None:
+            if len(_loaded_keys) >= _max_loaded_keys:
+                _loaded_keys.clear()
+            loaded = _loaded_keys[key] = serialization.load_der_public_key(key)
+        key = loaded
+
+    return message.verify(key)
+
+
+class SignatureVerifier:
+    """
+    Verifies chat message signatures on a thread or process pool, keeping RSA verification off the reactor thread.
+    """
+
+    def __init__(self, workers: int, processes: bool = False) -> None:
+        self.processes = processes
+        self.executor: Executor = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(
+            workers, thread_name_prefix="pymcserv-verify")
+
+        # Keys can't be sent to worker processes, so they are sent DER encoded. Cache the encoding per player key, for
+        # as long as the key is alive.
+        self.encoded_keys: WeakKeyDictionary[PlayerPublicKey, bytes] = WeakKeyDictionary()
+
+    # Returns the DER encoding of a player's key
+    def encode(self, public_key: PlayerPublicKey) -> bytes:
+        encoded = self.encoded_keys.get(public_key)
+        if encoded is None:
+            encoded = self.encoded_keys[public_key] = public_key.key.public_bytes(
+                serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+        return encoded
+
+    def submit(self, message: SignedMessage, public_key: PlayerPublicKey) -> Future:
+        key = self.encode(public_key) if self.processes else public_key.key
+        return self.executor.submit(verify_message, message, key)
+
+    # Returns a deferred which fires on the reactor thread with the verification result
+    def verify(self, message: SignedMessage, public_key: PlayerPublicKey) -> defer.Deferred:
+        deferred = defer.Deferred()
+
+        def done(future: Future):
+            try:
+                result = future.result()
+            except Exception:  # Treat failures as invalid signatures
+                result = False
+            deferred.callback(result)
+
+        self.submit(message, public_key).add_done_callback(lambda future: reactor.callFromThread(done, future))
+        return deferred
+
+    # Forgets any cached data for a player's key
+    def forget(self, public_key: PlayerPublicKey):
+        self.encoded_keys.pop(public_key, None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
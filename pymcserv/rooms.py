@@ -0,0 +1,80 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Union
+
+from pymcserv.bus import RemotePlayer
+from pymcserv.player_list import PlayerListBatcher
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+
+
+class Room:
+    """
+    A chat room. Chat is only sent to the room's members, and members only see each other in the player list, so the
+    cost of a message depends on the size of the room rather than of the server.
+    """
+
+    def __init__(self, factory: PyMcServFactory, name: str) -> None:
+        self.name = name
+        self.players: Dict[PyMcServProtocol, None] = {}  # Members connected to this worker, in join order
+        self.remote_players: Dict[RemotePlayer, None] = {}  # Members connected to other workers
+        self.player_list = PlayerListBatcher(factory, self)
+
+    def __len__(self):
+        return len(self.players) + len(self.remote_players)
+
+    def players_in_play(self) -> List[PyMcServProtocol]:
+        return list(self.players)
+
+    # Returns members on this worker followed by those on other workers
+    def all_players(self) -> List[Union[PyMcServProtocol, RemotePlayer]]:
+        return [*self.players, *self.remote_players]
+
+
+class Rooms:
+    """
+    The rooms players are in. Every player in game is in exactly one room, starting in the default room, and rooms
+    other than the default one are removed once empty.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.rooms: Dict[str, Room] = {}
+        self.default = self.get(factory.default_room)
+
+    def find(self, name: str) -> Optional[Room]:
+        return self.rooms.get(name)
+
+    # Returns the room with the given name, creating it if needed
+    def get(self, name: str) -> Room:
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(self.factory, name)
+        return room
+
+    def add(self, player: Union[PyMcServProtocol, RemotePlayer], room: Room):
+        player.room = room
+
+        if isinstance(player, RemotePlayer):
+            room.remote_players[player] = None
+        else:
+            room.players[player] = None
+
+        room.player_list.add(player)
+
+    def remove(self, player: Union[PyMcServProtocol, RemotePlayer]):
+        room = player.room
+        if room is None:
+            return
+
+        room.player_list.remove(player)
+        room.players.pop(player, None)
+        room.remote_players.pop(player, None)
+        player.room = None
+
+        # Nobody is left to send the room's pending player list changes to
+        if not len(room) and room is not self.default:
+            room.player_list.clear()
+            del self.rooms[room.name]
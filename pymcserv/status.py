@@ -0,0 +1,69 @@
+from __future__ import annotations
+from itertools import islice
+from typing import Dict
+
+from pymcserv.flood import AddressLimits
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.play import PyMcServProtocol
+
+
+class StatusCache:
+    """
+    Builds the server list status response once per protocol version and keeps the packed frame until the players or
+    settings shown in it change, so repeated pings cost a dictionary lookup and a write.
+    Also limits how often each address can ping, remembering a bounded number of addresses.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.frames: Dict[int, bytes] = {}  # Packed "Status Response" frames by protocol version
+        self.limits = AddressLimits()  # Ping limits by address
+
+    def invalidate(self):
+        if self.frames:
+            self.frames.clear()
+
+    def get_frame(self, player: PyMcServProtocol) -> bytes:
+        version = self.factory.force_protocol_version
+        if version is None:
+            version = player.protocol_version
+
+        frame = self.frames.get(version)
+        if frame is None:
+            data = player.buff_type.pack_varint(player.get_packet_ident("status_response")) + \
+                   player.buff_type.pack_json(self.build(version))
+            frame = self.frames[version] = player.buff_type.pack_packet(data)
+
+        return frame
+
+    def build(self, version: int) -> dict:
+        players = self.factory.directory
+
+        status = {
+            "description": {
+                "text": self.factory.motd
+            },
+            "players": {
+                "online": len(players),
+                "max": self.factory.max_players,
+                "sample": [{"name": player.display_name, "id": str(player.uuid)}
+                           for player in islice(players, self.factory.status_sample_size)]
+            },
+            "version": {
+                "name": self.factory.minecraft_versions.get(version, "???"),
+                "protocol": version
+            }
+        }
+
+        if self.factory.icon is not None:
+            status["favicon"] = self.factory.icon
+
+        return status
+
+    # Returns whether an address may ping now
+    def allow(self, host: str) -> bool:
+        return self.limits.take(host, self.factory.status_rate, self.factory.status_burst,
+                                self.factory.status_limit_addresses)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from collections import OrderedDict
+import time
+from typing import Callable
+
+from twisted.internet.task import LoopingCall
+from quarry.net.ticker import Task, Ticker
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pymcserv.factory import PyMcServFactory
+    from pymcserv.protocols.status import StatusProtocol
+
+
+class ConnectionTicker:
+    """
+    Given to every connection in place of its own quarry ticker, which would run a 20 Hz loop for each connection.
+    Delays and loops go on the factory's shared ticker. Connections can't start or stop it, and their connection timer
+    comes from ConnectionTimeouts.
+    """
+
+    __slots__ = ("ticker",)
+
+    interval = Ticker.interval
+
+    def __init__(self, ticker: Ticker) -> None:
+        self.ticker = ticker
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def add_delay(self, delay: int, callback: Callable[[], None]) -> Task:
+        return self.ticker.add_delay(delay, callback)
+
+    def add_loop(self, interval: int, callback: Callable[[], None]) -> Task:
+        return self.ticker.add_loop(interval, callback)
+
+
+class ConnectionTimer:
+    """
+    A connection's timer in ConnectionTimeouts, with the restart() and stop() of the quarry task it replaces.
+    """
+
+    __slots__ = ("timeouts", "connection")
+
+    def __init__(self, timeouts: ConnectionTimeouts, connection: StatusProtocol) -> None:
+        self.timeouts = timeouts
+        self.connection = connection
+
+    # Called by quarry when the connection receives a packet
+    def restart(self):
+        self.timeouts.restart(self)
+
+    def stop(self):
+        self.timeouts.remove(self)
+
+
+class ConnectionTimeouts:
+    """
+    Closes connections which haven't sent a packet for the factory's connection_timeout, from a single timer rather
+    than quarry's ticker and timer for each connection.
+    Timers are kept in the order their connections last sent a packet, so each sweep only looks at those which have
+    timed out.
+    """
+
+    def __init__(self, factory: PyMcServFactory) -> None:
+        self.factory = factory
+        self.timers: OrderedDict[ConnectionTimer, float] = OrderedDict()  # Time of last packet, oldest first
+        self.loop = LoopingCall(self.sweep)
+
+    # Starts timing a connection, returning its timer
+    def add(self, connection: StatusProtocol) -> ConnectionTimer:
+        timer = ConnectionTimer(self, connection)
+        self.timers[timer] = time.monotonic()
+
+        if not self.loop.running:
+            self.loop.start(self.factory.connection_timeout_interval, now=False)
+
+        return timer
+
+    def restart(self, timer: ConnectionTimer):
+        if timer in self.timers:
+            self.timers[timer] = time.monotonic()
+            self.timers.move_to_end(timer)
+
+    def remove(self, timer: ConnectionTimer):
+        self.timers.pop(timer, None)
+
+        if not self.timers and self.loop.running:
+            self.loop.stop()
+
+    def sweep(self):
+        deadline = time.monotonic() - self.factory.connection_timeout
+
+        while self.timers:
+            timer, last_packet = next(iter(self.timers.items()))
+            if last_packet > deadline:
+                break
+
+            del self.timers[timer]
+            timer.connection.connection_timed_out()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from typing import List
+
+from twisted.internet import reactor
+from twisted.internet.protocol import ProcessProtocol
+
+from pymcserv.bus import ChatBusHub
+
+
+class WorkerProcess(ProcessProtocol):
+    def __init__(self, supervisor: WorkerSupervisor, index: int) -> None:
+        self.supervisor = supervisor
+        self.index = index
+
+    def processEnded(self, reason):
+        self.supervisor.worker_ended(self, reason)
+
+
+class WorkerSupervisor:
+    """
+    Runs several server processes listening on the same port, and the chat bus hub connecting them. The kernel spreads
+    new connections between the workers, and the hub relays chat and player list changes so players on every worker
+    still share one chat room and one player list.
+    """
+
+    logger = logging.getLogger("pymcserv")
+
+    def __init__(self, count: int, command: List[str]) -> None:
+        self.count = count
+        self.command = command  # Command line which starts a worker, given the bus path and worker index
+        self.directory = tempfile.mkdtemp(prefix="pymcserv-")
+        self.bus_path = os.path.join(self.directory, "bus.sock")
+        self.workers: List[WorkerProcess] = []
+        self.stopping = False
+
+    def start(self):
+        reactor.listenUNIX(self.bus_path, ChatBusHub(), mode=0o600)
+        reactor.addSystemEventTrigger('before', 'shutdown', self.stop)
+
+        for index in range(self.count):
+            self.spawn(index)
+
+    def spawn(self, index: int):
+        if self.stopping:
+            return
+
+        worker = WorkerProcess(self, index)
+        command = [*self.command, "--bus", self.bus_path, "--worker-index", str(index)]
+
+        # Workers share our stdout and stderr, so their logs are interleaved with ours
+        reactor.spawnProcess(worker, command[0], command, env=os.environ, childFDs={1: 1, 2: 2})
+        self.workers.append(worker)
+
+    def worker_ended(self, worker: WorkerProcess, reason):
+        self.workers.remove(worker)
+
+        if self.stopping:
+            return
+
+        # The worker's players have been removed by the hub, restart it so its share of the port is served again
+        self.logger.warning("Worker {} exited ({}), restarting".format(worker.index, reason.getErrorMessage()))
+        reactor.callLater(1, self.spawn, worker.index)
+
+    def stop(self):
+        self.stopping = True
+
+        for worker in self.workers:
+            if worker.transport is not None and worker.transport.pid is not None:
+                worker.transport.signalProcess(signal.SIGTERM)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def run_workers(count: int, script: str, argv: List[str]):
+    WorkerSupervisor(count, [sys.executable, script, *argv]).start()
+    reactor.run()
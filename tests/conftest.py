@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import pytest
+from twisted.internet.address import IPv4Address
+from twisted.internet.task import Clock
+from twisted.internet.testing import StringTransport
+from quarry.net.ticker import Ticker
+from quarry.types.uuid import UUID
+
+from pymcserv import factory as factory_module, player_list
+from pymcserv.factory import PyMcServFactory
+from pymcserv.protocols.play import PyMcServProtocol
+
+
+def make_factory() -> PyMcServFactory:
+    factory = PyMcServFactory()
+    factory.online_mode = False
+    return factory
+
+
+# Creates a connection in play mode attached to an in-memory transport, without going through the login sequence
+def make_player(factory: PyMcServFactory, name: str, protocol_version: int = 760, port: int = 0,
+                compression_threshold: int = 256) -> PyMcServProtocol:
+    player = factory.buildProtocol(IPv4Address("TCP", "127.0.0.1", port))
+    player.connection_timer.stop()
+    player.makeConnection(StringTransport())
+    player.protocol_version = protocol_version
+    player.buff_type = factory.get_buff_type(protocol_version)
+    player.protocol_mode = 'play'
+    player.in_game = True
+    player.display_name = name
+    player.uuid = UUID.from_offline_player(name)
+    player.compression_threshold = compression_threshold
+    player.setup_play()
+    factory.players.add(player)
+    factory.directory.add(player)
+    factory.rooms.add(player, factory.rooms.default)
+    return player
+
+
+# Player list batches and the factory's shared ticker run on a clock the test advances, available to test cases as
+# self.clock
+@pytest.fixture(autouse=True)
+def clock(request, monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(player_list, "reactor", clock)
+
+    class ClockTicker(Ticker):
+        def __init__(self, logger) -> None:
+            super().__init__(logger)
+            self._impl.clock = clock
+
+    monkeypatch.setattr(factory_module, "Ticker", ClockTicker)
+    if request.instance is not None:
+        request.instance.clock = clock
+    return clock
@@ -0,0 +1,84 @@
+import unittest
+
+from quarry.types.buffer import Buffer1_19_1
+from quarry.types.chat import LastSeenMessage
+
+from tests.conftest import make_factory, make_player
+
+
+def message(player, number: int) -> LastSeenMessage:
+    return LastSeenMessage(player.uuid, number.to_bytes(4, 'big'))
+
+
+def acknowledgement(last_seen, last_received=None) -> Buffer1_19_1:
+    return Buffer1_19_1(Buffer1_19_1.pack_last_seen_list(last_seen) + Buffer1_19_1.pack_last_received(last_received))
+
+
+class AcknowledgeChatTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.factory.online_mode = True
+        self.player = make_player(self.factory, "reader")
+        self.alice = make_player(self.factory, "alice", port=1)
+        self.bob = make_player(self.factory, "bob", port=2)
+
+        # Alternating messages from alice and bob, numbered by the order they were sent
+        self.messages = [message(self.alice if number % 2 == 0 else self.bob, number) for number in range(6)]
+        for entry in self.messages:
+            self.player.add_pending_message(entry)
+
+    def test_acknowledge_clears_pending(self):
+        self.player.packet_acknowledge_chat(acknowledgement([self.messages[5], self.messages[4]], self.messages[5]))
+
+        self.assertFalse(self.player.closed)
+        self.assertEqual(len(self.player.last_seen_tracker), 0)
+        self.assertEqual(set(self.player.last_seen_tracker.previously_seen),
+                         {(entry.sender, entry.signature) for entry in self.messages[4:]})
+
+    def test_partial_acknowledge(self):
+        self.player.packet_acknowledge_chat(acknowledgement([self.messages[3], self.messages[2]]))
+
+        self.assertFalse(self.player.closed)
+        self.assertEqual(len(self.player.last_seen_tracker), 2)
+
+        # Later acknowledgements can refer to the previously seen messages
+        self.player.packet_acknowledge_chat(acknowledgement([self.messages[5], self.messages[2]]))
+        self.assertFalse(self.player.closed)
+        self.assertEqual(len(self.player.last_seen_tracker), 0)
+
+    def test_out_of_order_disconnects(self):
+        self.player.packet_acknowledge_chat(acknowledgement([self.messages[2], self.messages[5]]))
+
+        self.assertTrue(self.player.closed)
+
+    def test_unknown_message_disconnects(self):
+        self.player.packet_acknowledge_chat(acknowledgement([message(self.alice, 100)]))
+
+        self.assertTrue(self.player.closed)
+
+    def test_command_acknowledges(self):
+        self.player.packet_chat_command(Buffer1_19_1(
+            Buffer1_19_1.pack_string("msg alice hi") +
+            Buffer1_19_1.pack('QQ', 1, 0) +  # Timestamp, salt
+            Buffer1_19_1.pack_varint(0) +  # No argument signatures
+            Buffer1_19_1.pack('?', False) +
+            acknowledgement([self.messages[5], self.messages[4]]).read()))
+
+        self.assertFalse(self.player.closed)
+        self.assertEqual(len(self.player.last_seen_tracker), 0)
+        self.assertEqual(self.player.previous_timestamp, 1)
+
+    def test_too_many_pending_disconnects(self):
+        self.factory.max_pending_messages = 8
+        self.player.setup_play()
+
+        for number in range(8):
+            self.player.add_pending_message(message(self.alice, number))
+        self.assertFalse(self.player.closed)
+
+        self.player.add_pending_message(message(self.alice, 8))
+        self.assertTrue(self.player.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+
+from twisted.internet.task import Clock
+from quarry.net.protocol import ProtocolError
+from quarry.types.uuid import UUID
+
+from tests.conftest import make_factory
+from pymcserv import admission
+from pymcserv.bus import RemotePlayer
+
+
+class FakeLogin:
+    def __init__(self) -> None:
+        self.positions = []
+        self.errors = []
+        self.started = False
+        self.closed_reason = None
+
+    def close(self, reason=None):
+        self.closed_reason = reason
+
+    def send_queue_position(self, position: int):
+        self.positions.append(position)
+
+    def protocol_error(self, error: ProtocolError):
+        self.errors.append(error)
+
+    def start(self):
+        self.started = True
+
+    def start_invalid(self):
+        raise ProtocolError("Missing profile public key")
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.reactor = Clock()
+        patcher = mock.patch.object(admission, "reactor", self.reactor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.factory = make_factory()
+        self.factory.max_concurrent_logins = 1
+        self.controller = self.factory.admission
+
+    def test_queue(self):
+        first, second = FakeLogin(), FakeLogin()
+        self.controller.admit(first, first.start)
+        self.controller.admit(second, second.start)
+
+        self.assertTrue(first.started)
+        self.assertFalse(second.started)
+        self.assertEqual(second.positions, [1])
+
+        self.controller.finished(first)
+        self.assertTrue(second.started)
+        self.assertEqual(list(self.controller.logging_in), [second])
+
+    def test_invalid_login_releases_slot(self):
+        invalid = FakeLogin()
+        self.controller.admit(invalid, invalid.start_invalid)
+
+        self.assertEqual(len(invalid.errors), 1)
+        self.assertEqual(self.controller.logging_in, {})
+
+    def test_invalid_queued_login_moves_queue_on(self):
+        first, invalid, last = FakeLogin(), FakeLogin(), FakeLogin()
+        self.controller.admit(first, first.start)
+        self.controller.admit(invalid, invalid.start_invalid)
+        self.controller.admit(last, last.start)
+
+        self.controller.finished(first)
+
+        self.assertEqual(len(invalid.errors), 1)
+        self.assertTrue(last.started)
+        self.assertEqual(list(self.controller.logging_in), [last])
+        self.assertEqual(len(self.controller.queue), 0)
+
+        # The invalid login's connection closing later changes nothing
+        self.controller.finished(invalid)
+        self.assertEqual(list(self.controller.logging_in), [last])
+
+    def test_player_cap_counts_other_workers(self):
+        self.factory.max_players = 2
+        self.factory.max_concurrent_logins = 0
+        name = "remote"
+        self.factory.directory.add(RemotePlayer(UUID.from_offline_player(name), name, 0, None))
+
+        first, second = FakeLogin(), FakeLogin()
+        self.controller.admit(first, first.start)
+        self.controller.admit(second, second.start)
+
+        self.assertTrue(first.started)
+        self.assertFalse(second.started)
+        self.assertEqual(second.closed_reason, "Server is full")
+        self.assertEqual(self.factory.metrics.events, {"login_server_full": 1})
+
+    def test_full_server_turns_queued_logins_away(self):
+        self.factory.max_players = 2
+        first, second = FakeLogin(), FakeLogin()
+        self.controller.admit(first, first.start)
+        self.controller.admit(second, second.start)
+        self.assertEqual(second.positions, [1])
+
+        # A player joins another worker while the first login is in progress, then the first login's player joins
+        for name in ("remote", "first"):
+            self.factory.directory.add(RemotePlayer(UUID.from_offline_player(name), name, 0, None))
+        self.controller.joined(first)
+        self.reactor.advance(0)
+
+        self.assertFalse(second.started)
+        self.assertEqual(second.closed_reason, "Server is full")
+        self.assertEqual(len(self.controller.queue), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
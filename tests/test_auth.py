@@ -0,0 +1,108 @@
+import json
+
+from twisted.internet import defer, reactor
+from twisted.trial import unittest
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+from quarry.net.auth import AuthException
+from quarry.types.uuid import UUID
+
+from pymcserv.auth import SessionAuthenticator
+from pymcserv.factory import PyMcServFactory
+
+
+class SessionServer(Resource):
+    """
+    Stand-in session server. Answers "hasJoined" checks after a delay, with the player's profile unless their name is
+    in `unknown`, and records how many checks are answered at once.
+    """
+
+    isLeaf = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.delay = 0.0
+        self.unknown = set()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def render_GET(self, request):
+        name = request.args[b"username"][0].decode("utf8")
+        self.requests.append((name, request.args[b"serverId"][0].decode("ascii")))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def respond():
+            self.in_flight -= 1
+            if request._disconnected:
+                return
+
+            if name in self.unknown:
+                request.setResponseCode(204)
+            else:
+                profile = {"id": UUID.from_offline_player(name).to_hex(with_dashes=False), "name": name,
+                           "properties": []}
+                request.write(json.dumps(profile).encode("utf8"))
+            request.finish()
+
+        self.calls.append(reactor.callLater(self.delay, respond))
+        return NOT_DONE_YET
+
+
+class SessionAuthenticatorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = SessionServer()
+        site = Site(self.server)
+        site.noisy = False
+        self.port = reactor.listenTCP(0, site, interface="127.0.0.1")
+
+        self.factory = PyMcServFactory()
+        self.factory.session_server = "http://127.0.0.1:%d/session/minecraft/" % self.port.getHost().port
+        self.factory.auth_concurrency = 2
+        self.authenticator = SessionAuthenticator(self.factory)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for call in self.server.calls:
+            if call.active():
+                call.cancel()
+
+        yield self.authenticator.close()
+        yield self.port.stopListening()
+
+    @defer.inlineCallbacks
+    def test_joined(self):
+        profile = yield self.authenticator.has_joined("digest", "alice")
+
+        self.assertEqual(profile["name"], "alice")
+        self.assertEqual(UUID.from_hex(profile["id"]), UUID.from_offline_player("alice"))
+        self.assertEqual(self.server.requests, [("alice", "digest")])
+        self.assertEqual(self.factory.metrics.events, {"auth_request": 1})
+
+    @defer.inlineCallbacks
+    def test_not_joined(self):
+        self.server.unknown.add("mallory")
+
+        yield self.assertFailure(self.authenticator.has_joined("digest", "mallory"), AuthException)
+        self.assertEqual(self.factory.metrics.events, {"auth_request": 1, "auth_failed": 1})
+
+    @defer.inlineCallbacks
+    def test_timeout(self):
+        self.server.delay = 5.0
+        self.factory.auth_timeout = 0.1
+
+        yield self.assertFailure(self.authenticator.has_joined("digest", "alice"), defer.TimeoutError)
+        self.assertEqual(self.factory.metrics.events, {"auth_request": 1, "auth_failed": 1})
+
+    @defer.inlineCallbacks
+    def test_concurrency_limit(self):
+        self.server.delay = 0.05
+
+        profiles = yield defer.gatherResults([self.authenticator.has_joined("digest%d" % index, "player%d" % index)
+                                              for index in range(6)])
+
+        self.assertEqual([profile["name"] for profile in profiles], ["player%d" % index for index in range(6)])
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(self.server.max_in_flight, 2)
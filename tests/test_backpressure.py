@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+from pymcserv.asyncio_backend import AsyncioTransport
+from tests.conftest import make_factory, make_player
+
+
+class TwistedBuffer:
+    def __init__(self, data_buffer: bytes, offset: int, temp_data_len: int) -> None:
+        self.dataBuffer = data_buffer
+        self.offset = offset
+        self._tempDataLen = temp_data_len
+
+
+class BufferedTransport(asyncio.Transport):
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self.size = size
+
+    def get_write_buffer_size(self) -> int:
+        return self.size
+
+
+class BackpressureTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.player = make_player(self.factory, "slow")
+
+    def test_close_unregisters_producer(self):
+        self.assertIs(self.player.transport.producer, self.player)
+
+        self.player.close()
+
+        self.assertIsNone(self.player.transport.producer)
+        self.assertTrue(self.player.transport.disconnecting)
+
+    def test_write_buffer_size_excludes_written_data(self):
+        self.player.transport = TwistedBuffer(b"x" * 100, 40, 10)
+
+        self.assertEqual(self.player.write_buffer_size(), 70)
+
+    def test_write_buffer_size_of_asyncio_transport(self):
+        self.player.transport = AsyncioTransport(BufferedTransport(70))
+
+        self.assertEqual(self.player.write_buffer_size(), 70)
+
+
+if __name__ == "__main__":
+    unittest.main()
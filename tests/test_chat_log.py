@@ -0,0 +1,128 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from twisted.internet.task import Clock
+from quarry.types.uuid import UUID
+
+from pymcserv import chat_log
+from pymcserv.chat_log import ChatLog
+
+SENDER = UUID.from_offline_player("alice")
+
+
+class FakeReactor:
+    """
+    Runs delayed calls on a clock advanced by the test, and queues calls from the writer thread until the test runs
+    them.
+    """
+
+    def __init__(self) -> None:
+        self.clock = Clock()
+        self.from_thread = []
+
+    def callLater(self, delay, f, *args):
+        return self.clock.callLater(delay, f, *args)
+
+    def callFromThread(self, f, *args):
+        self.from_thread.append((f, args))
+
+
+class FullFile:
+    """
+    File which fails every write as if the disk were full.
+    """
+
+    def __init__(self, fd) -> None:
+        self.fd = fd
+
+    def write(self, data):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.fd, name)
+
+
+class ChatLogWriteFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.reactor = FakeReactor()
+        patcher = mock.patch.object(chat_log, "reactor", self.reactor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = ChatLog(self.directory, segment_bytes=1024 * 1024)
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.directory)
+
+    def append(self, *numbers: int):
+        for number in numbers:
+            self.log.append(SENDER, "alice", "lobby", "message %d" % number)
+
+    # Flushes pending records and waits for the writer thread to finish with them
+    def flush(self):
+        self.reactor.clock.advance(self.log.flush_delay)
+        self.log.executor.submit(lambda: None).result()
+
+        calls, self.reactor.from_thread = self.reactor.from_thread, []
+        for f, args in calls:
+            f(*args)
+
+    def messages(self):
+        return [entry.message for entry in self.log.tail(100)]
+
+    def test_index_write_failure(self):
+        self.append(0, 1, 2)
+        self.flush()
+
+        segment = self.log.segments[-1]
+        log_file, index_file = self.log.files[segment.first]
+        self.log.files[segment.first] = (log_file, FullFile(index_file))
+
+        with self.assertLogs("pymcserv", "ERROR"):
+            self.append(3, 4)
+            self.flush()
+
+        # The records which failed are dropped, and the files only hold the records which were written
+        self.assertEqual(self.messages(), ["message 0", "message 1", "message 2"])
+        self.assertEqual((segment.count, segment.written, segment.size), (3, 3, segment.written_size))
+        self.assertEqual(os.path.getsize(self.log.path(segment.first, "log")), segment.size)
+        self.assertEqual(os.path.getsize(self.log.path(segment.first, "idx")), 3 * chat_log.INDEX_ENTRY.size)
+
+        # Once the disk has space again, writing carries on where it left off
+        self.append(5)
+        self.flush()
+        self.assertEqual(self.messages(), ["message 0", "message 1", "message 2", "message 5"])
+
+        self.log.close()
+        self.log = ChatLog(self.directory)
+        self.assertEqual(self.messages(), ["message 0", "message 1", "message 2", "message 5"])
+
+    def test_new_segment_failure(self):
+        self.append(0)
+        self.flush()
+
+        # Fill the first segment, so the next batch starts a new one
+        self.log.segment_bytes = self.log.segments[-1].size * 2
+
+        with self.assertLogs("pymcserv", "ERROR"), \
+                mock.patch.object(chat_log, "open", side_effect=OSError(errno.ENOSPC, "No space left"), create=True):
+            self.append(1, 2, 3)
+            self.flush()
+
+        # The records written to the first segment are kept, the new segment is left empty
+        self.assertEqual(self.messages(), ["message 0", "message 1"])
+        self.assertEqual([(segment.count, segment.written) for segment in self.log.segments], [(2, 2), (0, 0)])
+
+        self.append(4)
+        self.flush()
+        self.assertEqual(self.messages(), ["message 0", "message 1", "message 4"])
+        self.assertEqual(self.log.segments[-1].written, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
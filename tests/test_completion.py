@@ -0,0 +1,72 @@
+import unittest
+
+from quarry.types.uuid import UUID
+
+from pymcserv.bus import RemotePlayer
+from pymcserv.commands.completion import CompletionEngine
+from pymcserv.commands.nodes import ArgumentCommandNode, LiteralCommandNode, RootCommandNode
+from pymcserv.directory import PlayerDirectory
+
+
+def remote(name: str) -> RemotePlayer:
+    return RemotePlayer(UUID.from_offline_player(name), name, 0, None)
+
+
+class CompletionEngineTest(unittest.TestCase):
+    def setUp(self):
+        message = ArgumentCommandNode("message", executable=True, parser="brigadier:string", properties={"behavior": 2})
+        target = ArgumentCommandNode("targets", parser="minecraft:entity", children=[message])
+        self.root = RootCommandNode(children=[
+            LiteralCommandNode("msg", children=[target]),
+            LiteralCommandNode("me", children=[message]),
+            LiteralCommandNode("rooms", executable=True),
+        ]).freeze()
+
+        self.players = PlayerDirectory()
+        for name in ("alice", "albert", "bob"):
+            self.players.add(remote(name))
+        self.engine = CompletionEngine(self.root, self.players)
+
+    def test_literals(self):
+        self.assertEqual(self.engine.complete("/m"), (1, 1, ["me", "msg"]))
+        self.assertEqual(self.engine.complete("/r"), (1, 1, ["rooms"]))
+        self.assertEqual(self.engine.complete("/x"), (1, 1, []))
+
+    def test_players(self):
+        self.assertEqual(self.engine.complete("/msg al"), (5, 2, ["albert", "alice"]))
+        self.assertEqual(self.engine.complete("/msg alice hel"), (11, 3, []))
+        self.assertEqual(self.engine.complete("/nope al"), (1, 0, []))
+
+    def test_players_joining_keep_literal_completions_cached(self):
+        self.engine.complete("/m")
+        self.engine.complete("/msg al")
+        cached = dict(self.engine.cache)
+
+        alan = remote("alan")
+        self.players.add(alan)
+
+        self.assertEqual(self.engine.complete("/m"), (1, 1, ["me", "msg"]))
+        self.assertEqual(self.engine.complete("/msg al"), (5, 2, ["alan", "albert", "alice"]))
+        self.assertEqual(dict(self.engine.cache), cached)
+
+        self.players.remove(alan)
+        self.assertEqual(self.engine.complete("/msg al"), (5, 2, ["albert", "alice"]))
+
+    def test_new_graph_replaces_cached_completions(self):
+        self.engine.complete("/m")
+
+        self.engine.set_root(RootCommandNode(children=[LiteralCommandNode("mute")]).freeze())
+
+        self.assertEqual(self.engine.complete("/m"), (1, 1, ["mute"]))
+
+    def test_cache_size(self):
+        self.engine.cache_size = 2
+
+        for text in ("/m", "/r", "/x"):
+            self.engine.complete(text)
+
+        self.assertEqual([key[2] for key in self.engine.cache], ["/r", "/x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import logging
+import unittest
+
+from twisted.internet.address import IPv4Address
+
+from pymcserv.protocols.status import UNENCRYPTED
+from pymcserv.protocols.utils import forget_logger
+from tests.conftest import make_factory
+
+
+class ConnectionStateTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+
+    def connect(self, host: str):
+        connection = self.factory.buildProtocol(IPv4Address("TCP", host, 25565))
+        self.addCleanup(connection.connection_timer.stop)
+        return connection
+
+    def test_connections_share_logger(self):
+        loggers = set(logging.Logger.manager.loggerDict)
+        connections = [self.connect("10.%d.%d.1" % (index // 256, index % 256)) for index in range(300)]
+
+        self.assertEqual(set(logging.Logger.manager.loggerDict), loggers)
+        self.assertEqual({connection.logger.name for connection in connections}, {"pymcserv.connections"})
+
+    def test_connections_share_cipher_and_have_no_login_tokens(self):
+        first, second = self.connect("10.0.0.1"), self.connect("10.0.0.2")
+
+        self.assertIs(first.cipher, UNENCRYPTED)
+        self.assertIs(second.cipher, UNENCRYPTED)
+        self.assertIsNone(first.server_id)
+        self.assertIsNone(first.verify_token)
+
+
+class ForgetLoggerTest(unittest.TestCase):
+    def test_keeps_placeholders_used_by_other_loggers(self):
+        loggers = logging.Logger.manager.loggerDict
+        first = logging.getLogger("pymcserv-test{10.0.0.1}")
+        second = logging.getLogger("pymcserv-test{10.0.0.2}")
+
+        forget_logger(first)
+        self.assertNotIn(first.name, loggers)
+        self.assertIn("pymcserv-test{10.0.0", loggers)
+
+        forget_logger(second)
+        self.assertFalse([name for name in loggers if name.startswith("pymcserv-test")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from pymcserv.commands.dispatcher import CommandDispatcher, CommandSyntaxError
+from pymcserv.commands.nodes import ArgumentCommandNode, LiteralCommandNode, RootCommandNode
+
+
+def handler(name: str):
+    return lambda source, arguments: (name, source, arguments)
+
+
+class CommandDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        message = ArgumentCommandNode("message", executable=True, parser="minecraft:message", handler=handler("tell"))
+        tell = LiteralCommandNode("tell", children=[
+            ArgumentCommandNode("targets", parser="minecraft:entity", children=[message])])
+        zoom = LiteralCommandNode("zoom", children=[
+            ArgumentCommandNode("scale", executable=True, parser="brigadier:double", properties={"min": 0.5, "max": 4},
+                                handler=handler("zoom"))])
+        nick = LiteralCommandNode("nick", children=[
+            ArgumentCommandNode("name", executable=True, parser="brigadier:string", properties={"behavior": 1},
+                                handler=handler("nick"))])
+        rooms = LiteralCommandNode("rooms", executable=True, handler=handler("rooms"))
+
+        root = RootCommandNode(children=[tell, LiteralCommandNode("msg", redirect=tell), zoom, nick, rooms])
+        root.children.append(LiteralCommandNode("execute", children=[LiteralCommandNode("run", redirect=root)]))
+        self.dispatcher = CommandDispatcher(root.freeze())
+
+    def assertSyntaxError(self, command: str, translate: str, cursor: int, *arguments):
+        with self.assertRaises(CommandSyntaxError) as context:
+            self.dispatcher.parse(command)
+
+        error = context.exception
+        self.assertEqual((error.translate, error.command, error.cursor, error.arguments),
+                         (translate, command, cursor, arguments))
+
+    def test_execute(self):
+        self.assertEqual(self.dispatcher.execute("source", "rooms"), ("rooms", "source", {}))
+        self.assertEqual(self.dispatcher.execute("source", "tell alice hi there"),
+                         ("tell", "source", {"targets": "alice", "message": "hi there"}))
+        self.assertEqual(self.dispatcher.execute("source", "zoom 2.5"), ("zoom", "source", {"scale": 2.5}))
+        self.assertEqual(self.dispatcher.execute("source", 'nick "a \\"b\\""'),
+                         ("nick", "source", {"name": 'a "b"'}))
+
+    def test_redirects(self):
+        self.assertEqual(self.dispatcher.execute("source", "msg alice hi"),
+                         ("tell", "source", {"targets": "alice", "message": "hi"}))
+
+        # Redirect cycles back to the root can be followed any number of times
+        self.assertEqual(self.dispatcher.execute("source", "execute run execute run msg bob hi"),
+                         ("tell", "source", {"targets": "bob", "message": "hi"}))
+        self.assertSyntaxError("execute run", "command.unknown.command", 11)
+        self.assertSyntaxError("execute run nope", "command.unknown.command", 12)
+
+    def test_unknown_commands(self):
+        self.assertSyntaxError("nope", "command.unknown.command", 0)
+        self.assertSyntaxError("tell", "command.unknown.command", 4)
+        self.assertSyntaxError("tell alice", "command.unknown.command", 10)
+        self.assertSyntaxError("rooms list", "command.unknown.argument", 6)
+
+    def test_argument_errors(self):
+        self.assertSyntaxError("zoom", "command.unknown.command", 4)
+        self.assertSyntaxError("zoom big", "parsing.double.invalid", 5, "big")
+        self.assertSyntaxError("zoom 8", "argument.double.big", 5, 4, 8.0)
+        self.assertSyntaxError("zoom 0.1", "argument.double.low", 5, 0.5, 0.1)
+        self.assertSyntaxError("zoom 2,5", "command.unknown.argument", 5)
+        self.assertSyntaxError('nick "unfinished', "parsing.quote.expected.end", 5)
+        self.assertSyntaxError('nick "a\\b"', "parsing.quote.escape", 7, "b", '"')
+
+    def test_error_messages(self):
+        with self.assertRaises(CommandSyntaxError) as context:
+            self.dispatcher.parse("execute run zoom 8")
+
+        error, position = context.exception.as_messages()
+        self.assertEqual(error.value, {"translate": "argument.double.big", "color": "red", "with": ["4", "8.0"]})
+        self.assertEqual(position.value["extra"], [
+            "...", " run zoom ", {"text": "8", "color": "red", "underlined": True},
+            {"translate": "command.context.here", "color": "red", "italic": True}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from pymcserv.flood import AddressLimits
+
+
+class AddressLimitsTest(unittest.TestCase):
+    def test_burst(self):
+        limits = AddressLimits()
+
+        self.assertEqual([limits.take("10.0.0.1", 0.001, 3, 10) for _ in range(4)], [True, True, True, False])
+        self.assertTrue(limits.take("10.0.0.2", 0.001, 3, 10))
+
+    def test_forgets_least_recent_address(self):
+        limits = AddressLimits()
+        limits.take("10.0.0.1", 0.001, 1, 2)
+        limits.take("10.0.0.2", 0.001, 1, 2)
+        limits.take("10.0.0.1", 0.001, 1, 2)  # Now the most recent
+        limits.take("10.0.0.3", 0.001, 1, 2)
+
+        self.assertEqual(list(limits.buckets), ["10.0.0.1", "10.0.0.3"])
+        self.assertFalse(limits.take("10.0.0.1", 0.001, 1, 2))
+        self.assertTrue(limits.take("10.0.0.2", 0.001, 1, 2))  # Forgotten, so starts with a full bucket
+
+
+if __name__ == "__main__":
+    unittest.main()
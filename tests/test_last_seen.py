@@ -0,0 +1,122 @@
+import unittest
+
+from quarry.types.chat import LastSeenMessage
+from quarry.types.uuid import UUID
+
+from pymcserv.protocols.last_seen import LastSeenTracker, UNKNOWN_INDEX
+
+ALICE = UUID.from_offline_player("alice")
+BOB = UUID.from_offline_player("bob")
+
+
+def message(sender: UUID, number: int) -> LastSeenMessage:
+    return LastSeenMessage(sender, number.to_bytes(4, 'big'))
+
+
+class LastSeenTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.tracker = LastSeenTracker(4)
+
+    def test_add_numbers_messages_in_order(self):
+        for number in range(3):
+            self.assertTrue(self.tracker.add(message(ALICE, number)))
+
+        self.assertEqual(len(self.tracker), 3)
+        self.assertEqual([self.tracker.position(message(ALICE, number)) for number in range(3)], [0, 1, 2])
+        self.assertEqual(self.tracker.pending_position(message(ALICE, 1)), 1)
+
+    def test_acknowledge_removes_messages_up_to_sequence(self):
+        for number in range(4):
+            self.tracker.add(message(ALICE, number))
+
+        self.tracker.acknowledge(1)
+
+        self.assertEqual(len(self.tracker), 2)
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), UNKNOWN_INDEX)
+        self.assertEqual(self.tracker.position(message(ALICE, 1)), UNKNOWN_INDEX)
+        self.assertEqual(self.tracker.position(message(ALICE, 2)), 2)
+
+        # Sequence numbers keep increasing after an acknowledgement
+        self.tracker.add(message(BOB, 0))
+        self.assertEqual(self.tracker.position(message(BOB, 0)), 4)
+
+    def test_acknowledge_earlier_sequence_does_nothing(self):
+        for number in range(3):
+            self.tracker.add(message(ALICE, number))
+        self.tracker.acknowledge(1)
+
+        self.tracker.acknowledge(0)
+        self.tracker.acknowledge(UNKNOWN_INDEX)
+
+        self.assertEqual(len(self.tracker), 1)
+        self.assertEqual(self.tracker.position(message(ALICE, 2)), 2)
+
+    def test_acknowledge_past_end_empties(self):
+        self.tracker.add(message(ALICE, 0))
+        self.tracker.acknowledge(100)
+
+        self.assertEqual(len(self.tracker), 0)
+        self.assertEqual(self.tracker.pending_index, {})
+
+        # Numbering continues from the last message added, not the acknowledged sequence
+        self.tracker.add(message(ALICE, 1))
+        self.assertEqual(self.tracker.position(message(ALICE, 1)), 1)
+
+    def test_repeated_message_uses_latest_sequence(self):
+        self.tracker.add(message(ALICE, 0))
+        self.tracker.add(message(BOB, 0))
+        self.tracker.add(message(ALICE, 0))
+
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), 2)
+
+        # Acknowledging the first copy keeps the later one pending
+        self.tracker.acknowledge(0)
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), 2)
+
+        self.tracker.acknowledge(2)
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), UNKNOWN_INDEX)
+
+    def test_out_of_order_entries_have_decreasing_positions(self):
+        for number in range(3):
+            self.tracker.add(message(ALICE if number % 2 else BOB, number))
+
+        positions = [self.tracker.position(message(BOB, 2)), self.tracker.position(message(ALICE, 1))]
+        self.assertGreater(positions[0], positions[1])
+
+    def test_unknown_entries(self):
+        self.tracker.add(message(ALICE, 0))
+
+        self.assertEqual(self.tracker.position(message(ALICE, 1)), UNKNOWN_INDEX)
+        self.assertEqual(self.tracker.position(message(BOB, 0)), UNKNOWN_INDEX)
+        self.assertEqual(self.tracker.pending_position(message(BOB, 0)), UNKNOWN_INDEX)
+
+    def test_previously_seen_positions_come_before_pending(self):
+        self.tracker.set_previously_seen([message(ALICE, 0), message(BOB, 1)])
+        self.tracker.add(message(ALICE, 2))
+
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), -1)
+        self.assertEqual(self.tracker.position(message(BOB, 1)), -2)
+        self.assertEqual(self.tracker.position(message(ALICE, 2)), 0)
+
+        # Previously seen entries can't be the last received message, which must be pending
+        self.assertEqual(self.tracker.pending_position(message(ALICE, 0)), UNKNOWN_INDEX)
+
+        self.tracker.set_previously_seen([])
+        self.assertEqual(self.tracker.position(message(ALICE, 0)), UNKNOWN_INDEX)
+
+    def test_capacity(self):
+        for number in range(4):
+            self.assertTrue(self.tracker.add(message(ALICE, number)))
+
+        self.assertFalse(self.tracker.add(message(ALICE, 4)))
+        self.assertEqual(len(self.tracker), 4)
+        self.assertEqual(self.tracker.position(message(ALICE, 4)), UNKNOWN_INDEX)
+
+        # Acknowledging frees space
+        self.tracker.acknowledge(0)
+        self.assertTrue(self.tracker.add(message(ALICE, 4)))
+        self.assertEqual(self.tracker.position(message(ALICE, 4)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
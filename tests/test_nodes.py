@@ -0,0 +1,54 @@
+import json
+import unittest
+
+from quarry.types.buffer import Buffer1_19_1
+
+from pymcserv.commands import parsers
+from pymcserv.commands.nodes import ArgumentCommandNode, LiteralCommandNode, RootCommandNode
+
+
+class NodeTest(unittest.TestCase):
+    def setUp(self):
+        self.target = ArgumentCommandNode("targets", executable=True, parser="minecraft:entity",
+                                          properties={"allow_multiple": False})
+        self.tell = LiteralCommandNode("tell", children=[self.target])
+        self.msg = LiteralCommandNode("msg", redirect=self.tell)
+        self.root = RootCommandNode(children=[self.tell, self.msg])
+        self.target.redirect = self.root
+
+    def test_as_dict(self):
+        self.assertEqual(self.root.freeze().as_dict(), {
+            "type": "root", "executable": False, "redirect": None, "suggestions": None, "name": None, "children": {
+                0: {"type": "literal", "executable": False, "redirect": None, "suggestions": None, "name": "tell",
+                    "children": {
+                        0: {"type": "argument", "executable": True, "redirect": 0, "suggestions": "ask_server",
+                            "name": "targets", "parser": "minecraft:entity", "properties": {"allow_multiple": False},
+                            "children": {}}}},
+                1: {"type": "literal", "executable": False, "redirect": 1, "suggestions": None, "name": "msg",
+                    "children": {}}}})
+
+    def test_as_dict_redirects_match_packet(self):
+        nodes, _ = parsers.compile_commands(Buffer1_19_1, self.root)
+
+        graph = json.loads(json.dumps(self.root.as_dict()))
+
+        self.assertIs(nodes[graph["children"]["1"]["redirect"]], self.tell)
+        self.assertIs(nodes[graph["children"]["0"]["children"]["0"]["redirect"]], self.root)
+
+    def test_walk_visits_each_node_once(self):
+        self.assertEqual(self.root.walk(), [self.root, self.tell, self.msg, self.target])
+
+    def test_frozen(self):
+        self.root.freeze()
+
+        with self.assertRaises(AttributeError):
+            self.target.name = "players"
+        self.assertEqual(self.root.children, (self.tell, self.msg))
+
+        copy = self.target.copy(name="players")
+        self.assertEqual((copy.name, copy.parser, copy.redirect), ("players", "minecraft:entity", self.root))
+        self.assertFalse(copy.frozen)
+
+
+if __name__ == "__main__":
+    unittest.main()
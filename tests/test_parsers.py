@@ -0,0 +1,158 @@
+import unittest
+
+from quarry.types.buffer import Buffer1_19_1
+
+from pymcserv.commands import parsers
+from pymcserv.commands.nodes import ArgumentCommandNode, LiteralCommandNode, Node, RootCommandNode
+
+
+# The serialiser this repo used before compile_commands, which packs graphs of node dicts
+def baseline_pack_commands(cls, root_node):
+    nodes = [root_node]
+    idx = 0
+    while idx < len(nodes):
+        node = nodes[idx]
+        children = list(node['children'].values())
+        if node['redirect']:
+            children.append(node['redirect'])
+
+        for child in children:
+            if child not in nodes:
+                nodes.append(child)
+        idx += 1
+
+    out = cls.pack_varint(len(nodes))
+    for node in nodes:
+        out += baseline_pack_command_node(cls, node, nodes)
+
+    out += cls.pack_varint(nodes.index(root_node))
+
+    return out
+
+
+def baseline_pack_command_node(cls, node, nodes):
+    out = b""
+
+    flags = (
+        ['root', 'literal', 'argument'].index(node['type']) |
+        int(node['executable']) << 2 |
+        int(node['redirect'] is not None) << 3 |
+        int(node['suggestions'] is not None) << 4)
+    out += cls.pack('B', flags)
+    out += cls.pack_varint(len(node['children']))
+
+    for child in node['children'].values():
+        out += cls.pack_varint(nodes.index(child))
+
+    if node['redirect'] is not None:
+        out += cls.pack_varint(nodes.index(node['redirect']))
+
+    if node['name'] is not None:
+        out += cls.pack_string(node['name'])
+
+    if node['type'] == 'argument':
+        out += cls.pack_varint(parsers.PARSERS.index(node['parser']))
+        out += parsers.pack_command_node_properties(cls, node['parser'], node['properties'])
+    if node['suggestions'] is not None:
+        out += cls.pack_string(node['suggestions'])
+
+    return out
+
+
+# Converts a graph to the baseline's node dicts, where redirects are the target's dict
+def baseline_dicts(root: Node):
+    nodes = root.walk()
+    dicts = {}
+    for node in nodes:
+        dicts[id(node)] = d = {"type": node.type, "executable": node.executable, "redirect": None,
+                               "suggestions": node.suggestions, "children": {},
+                               "name": node.name if node.type != "root" else None}
+        if node.type == "argument":
+            d.update(parser=node.parser, properties=node.properties)
+
+    for node in nodes:
+        d = dicts[id(node)]
+        for child in node.children:
+            d["children"][len(d["children"])] = dicts[id(child)]
+        if node.redirect is not None:
+            d["redirect"] = dicts[id(node.redirect)]
+
+    return dicts[id(root)]
+
+
+class CompileCommandsTest(unittest.TestCase):
+    def assertPacksLikeBaseline(self, root: Node):
+        nodes, data = parsers.compile_commands(Buffer1_19_1, root)
+
+        self.assertEqual(data, baseline_pack_commands(Buffer1_19_1, baseline_dicts(root)))
+        self.assertEqual(data, parsers.pack_commands(Buffer1_19_1, root))
+        self.assertIs(nodes[0], root)
+
+    def test_matches_baseline(self):
+        count = ArgumentCommandNode("count", executable=True, parser="brigadier:float",
+                                    properties={"min": 1.0, "max": 64.0})
+        scale = ArgumentCommandNode("scale", executable=True, parser="brigadier:double",
+                                    properties={"min": None, "max": 2.5})
+        enabled = ArgumentCommandNode("enabled", executable=True, parser="brigadier:bool", suggestions=None)
+        self.assertPacksLikeBaseline(RootCommandNode(children=[
+            LiteralCommandNode("give", children=[count]),
+            LiteralCommandNode("zoom", children=[scale]),
+            LiteralCommandNode("toggle", children=[enabled]),
+            LiteralCommandNode("rooms", executable=True),
+        ]).freeze())
+
+    def test_redirects(self):
+        message = ArgumentCommandNode("message", executable=True, parser="minecraft:message")
+        targets = ArgumentCommandNode("targets", parser="minecraft:entity", properties={"allow_multiple": True},
+                                      children=[message])
+        tell = LiteralCommandNode("tell", children=[targets])
+        msg = LiteralCommandNode("msg", redirect=tell)
+        root = RootCommandNode(children=[msg, tell])
+
+        # A redirect back to the root, like vanilla's "execute ... run", makes a cycle
+        run = LiteralCommandNode("run", redirect=root)
+        root.children.append(LiteralCommandNode("execute", children=[run]))
+        root.freeze()
+
+        self.assertPacksLikeBaseline(root)
+        nodes, data = parsers.compile_commands(Buffer1_19_1, root)
+        self.assertEqual(len(nodes), 7)
+        self.assertEqual(nodes.index(tell), 2)
+
+        buff = Buffer1_19_1(data)
+        self.assertEqual(buff.unpack_varint(), 7)
+
+        # Root: children msg, tell and execute
+        self.assertEqual(buff.unpack("B"), 0)
+        self.assertEqual([buff.unpack_varint() for _ in range(buff.unpack_varint())], [1, 2, 3])
+
+        # msg: literal with a redirect to tell and no children
+        self.assertEqual(buff.unpack("B"), 1 | 1 << 3)
+        self.assertEqual(buff.unpack_varint(), 0)
+        self.assertEqual(buff.unpack_varint(), 2)
+        self.assertEqual(buff.unpack_string(), "msg")
+
+    def test_shared_node_packed_once(self):
+        message = ArgumentCommandNode("message", executable=True, parser="minecraft:message")
+        root = RootCommandNode(children=[LiteralCommandNode("say", children=[message]),
+                                         LiteralCommandNode("me", children=[message])]).freeze()
+
+        nodes, _ = parsers.compile_commands(Buffer1_19_1, root)
+        self.assertEqual(nodes.count(message), 1)
+        self.assertPacksLikeBaseline(root)
+
+    def test_equal_nodes_packed_separately(self):
+        # The baseline found nodes by equality, merging distinct nodes with the same contents
+        root = RootCommandNode(children=[
+            LiteralCommandNode("say", children=[ArgumentCommandNode("message", parser="minecraft:message")]),
+            LiteralCommandNode("me", children=[ArgumentCommandNode("message", parser="minecraft:message")]),
+        ]).freeze()
+
+        nodes, data = parsers.compile_commands(Buffer1_19_1, root)
+        self.assertEqual(len(nodes), 5)
+        self.assertEqual(Buffer1_19_1(data).unpack_varint(), 5)
+        self.assertEqual(Buffer1_19_1(baseline_pack_commands(Buffer1_19_1, baseline_dicts(root))).unpack_varint(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
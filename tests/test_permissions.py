@@ -0,0 +1,101 @@
+import unittest
+
+from pymcserv.commands.dispatcher import CommandSyntaxError
+from pymcserv.commands.nodes import ArgumentCommandNode, LiteralCommandNode, RootCommandNode
+from pymcserv.commands.permissions import CommandViews, filter_commands
+
+
+class FilterCommandsTest(unittest.TestCase):
+    def setUp(self):
+        self.message = ArgumentCommandNode("message", executable=True, parser="minecraft:message")
+        self.say = LiteralCommandNode("say", children=[self.message])
+        self.player = ArgumentCommandNode("player", executable=True, parser="minecraft:game_profile")
+        self.ban = LiteralCommandNode("ban", permission="admin", children=[self.player])
+        self.reason = LiteralCommandNode("reason", children=[self.message])
+        self.kick = LiteralCommandNode("kick", permission="moderator", children=[self.reason])
+        self.rooms = LiteralCommandNode("rooms", executable=True)
+        self.root = RootCommandNode(children=[self.say, self.ban, self.kick, self.rooms])
+
+    def names(self, node):
+        return [child.name for child in node.children]
+
+    def test_hidden_nodes_dropped(self):
+        view = filter_commands(self.root.freeze(), frozenset({"moderator"}))
+
+        self.assertEqual(self.names(view), ["say", "kick", "rooms"])
+        self.assertEqual(self.names(self.root), ["say", "ban", "kick", "rooms"])
+
+        # Subtrees without hidden nodes are shared with the original graph
+        self.assertIs(view.children[0], self.say)
+        self.assertIs(view.children[1], self.kick)
+        self.assertTrue(view.frozen)
+
+    def test_nothing_hidden(self):
+        self.root.freeze()
+
+        self.assertIs(filter_commands(self.root, frozenset({"admin", "moderator"})), self.root)
+
+    def test_redirect_to_hidden_node_dropped(self):
+        self.root.children.append(LiteralCommandNode("pardon", redirect=self.ban))
+        view = filter_commands(self.root.freeze(), frozenset())
+
+        self.assertEqual(self.names(view), ["say", "rooms", "pardon"])
+        self.assertIsNone(view.children[2].redirect)
+
+    def test_redirect_into_hidden_subtree_dropped(self):
+        self.root.children.append(LiteralCommandNode("tempban", redirect=self.player))
+        self.root.children.append(LiteralCommandNode("why", redirect=self.reason))
+        self.root.freeze()
+
+        view = filter_commands(self.root, frozenset())
+        self.assertEqual(self.names(view), ["say", "rooms", "tempban", "why"])
+        self.assertIsNone(view.children[2].redirect)
+        self.assertIsNone(view.children[3].redirect)
+
+        # Players who can see the subtree keep the redirects into it
+        view = filter_commands(self.root, frozenset({"moderator"}))
+        self.assertIsNone(view.children[3].redirect)
+        self.assertIs(view.children[4].redirect, self.reason)
+
+    def test_redirect_to_node_also_reachable_through_visible_nodes_kept(self):
+        # message is below kick, which is hidden, but also below say
+        self.root.children.append(LiteralCommandNode("shout", redirect=self.message))
+        view = filter_commands(self.root.freeze(), frozenset())
+
+        self.assertIs(view.children[-1].redirect, self.message)
+
+    def test_redirect_cycle(self):
+        self.root.children.append(LiteralCommandNode("execute", children=[LiteralCommandNode("run", redirect=self.root)]))
+        view = filter_commands(self.root.freeze(), frozenset())
+
+        self.assertEqual(self.names(view), ["say", "rooms", "execute"])
+        self.assertIs(view.children[2].children[0].redirect, view)
+
+
+class CommandViewsTest(unittest.TestCase):
+    def setUp(self):
+        ban = LiteralCommandNode("ban", executable=True, permission="admin", handler=lambda source, arguments: "ban")
+        kick = LiteralCommandNode("kick", redirect=ban)
+        self.root = RootCommandNode(children=[ban, kick]).freeze()
+        self.views = CommandViews(self.root)
+
+    def test_views_cached_per_permissions(self):
+        view = self.views.get(frozenset())
+
+        self.assertIs(self.views.get(frozenset()), view)
+        self.assertIs(self.views.get(frozenset({"admin"})).root, self.root)
+
+        self.views.set_root(RootCommandNode().freeze())
+        self.assertIsNot(self.views.get(frozenset()), view)
+
+    def test_hidden_commands_cannot_be_run(self):
+        with self.assertRaises(CommandSyntaxError):
+            self.views.get(frozenset()).get_dispatcher().execute(None, "ban")
+        with self.assertRaises(CommandSyntaxError):
+            self.views.get(frozenset()).get_dispatcher().execute(None, "kick")
+
+        self.assertEqual(self.views.get(frozenset({"admin"})).get_dispatcher().execute(None, "ban"), "ban")
+
+
+if __name__ == "__main__":
+    unittest.main()
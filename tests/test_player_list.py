@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from quarry.net.auth import PlayerPublicKey
+
+from tests.conftest import make_factory, make_player
+from pymcserv.factory import PyMcServFactory
+
+
+# Packs a "Player List Item" add action field by field, as the cached entries must match
+def pack_add(player, added) -> bytes:
+    data = player.buff_type.pack_varint(0) + player.buff_type.pack_varint(len(added))
+    for entry in added:
+        data += player.buff_type.pack_uuid(entry.uuid) + \
+            player.buff_type.pack_string(entry.display_name) + \
+            player.buff_type.pack_varint(0) + \
+            player.buff_type.pack_varint(3) + \
+            player.buff_type.pack_varint(entry.latency) + \
+            player.buff_type.pack('?', False)
+        if player.protocol_version >= 759:
+            data += player.buff_type.pack_optional(player.buff_type.pack_player_public_key, entry.public_key_data)
+    return data
+
+
+class PlayerListEntryTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.unsigned = make_player(self.factory, "unsigned")
+        self.signed = make_player(self.factory, "signed", port=1)
+        key = rsa.generate_private_key(public_exponent=65537, key_size=1024).public_key()
+        self.signed.public_key_data = PlayerPublicKey(1234, key, b"signature")
+        self.signed.latency = 150
+
+    def test_packed_entries_match(self):
+        for version in (758, 759, 760):
+            recipient = make_player(self.factory, "recipient%d" % version, version, port=version)
+            name, *data = PyMcServFactory.pack_player_list_add(recipient, [self.unsigned, self.signed])
+
+            self.assertEqual(name, "player_list_item")
+            self.assertEqual(b"".join(data), pack_add(recipient, [self.unsigned, self.signed]))
+
+    def test_latency_is_not_cached(self):
+        recipient = make_player(self.factory, "recipient")
+        PyMcServFactory.pack_player_list_add(recipient, [self.signed])
+
+        self.signed.latency = 300
+        name, *data = PyMcServFactory.pack_player_list_add(recipient, [self.signed])
+        self.assertEqual(b"".join(data), pack_add(recipient, [self.signed]))
+
+
+class PlayerListBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.watcher = make_player(self.factory, "watcher")
+        self.flush()
+
+        # Records announcements and the player list packets sent to the watcher
+        self.announcements = []
+        self.packets = []
+
+        def broadcast_system(message, **kwargs):
+            self.announcements.append(message)
+
+        def broadcast_packet(players, pack_packet, essential=True):
+            if self.watcher in players:
+                self.packets.append(pack_packet(self.watcher)[0])
+
+        for name, replacement in (("broadcast_system", broadcast_system), ("broadcast_packet", broadcast_packet)):
+            patcher = mock.patch.object(self.factory, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def flush(self):
+        self.clock.advance(self.factory.player_list_delay)
+
+    def test_join_and_leave_in_one_batch_cancel_out(self):
+        player = make_player(self.factory, "flicker", port=1)
+        self.factory.rooms.remove(player)
+        self.flush()
+
+        self.assertEqual(self.announcements, [])
+        self.assertEqual(self.packets, [])
+
+    def test_join_and_leave_in_separate_batches(self):
+        player = make_player(self.factory, "visitor", port=1)
+        self.flush()
+        self.factory.rooms.remove(player)
+        self.flush()
+
+        self.assertEqual(self.announcements, ["\u00a7evisitor has joined.", "\u00a7evisitor has left."])
+        self.assertEqual(self.packets, ["player_list_item", "player_list_item"])
+
+    def test_reconnect_in_one_batch_is_announced(self):
+        player = make_player(self.factory, "visitor", port=1)
+        self.flush()
+
+        self.factory.rooms.remove(player)
+        make_player(self.factory, "visitor", port=2)
+        self.flush()
+
+        self.assertEqual(self.announcements[1:], ["\u00a7evisitor has joined.", "\u00a7evisitor has left."])
+
+
+if __name__ == "__main__":
+    unittest.main()
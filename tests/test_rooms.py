@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+
+from quarry.types.uuid import UUID
+
+from pymcserv.bus import RemotePlayer
+from pymcserv.factory import PyMcServFactory
+from pymcserv.protocols.play import PyMcServProtocol
+from tests.conftest import make_factory, make_player
+
+
+class RoomsTest(unittest.TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.rooms = self.factory.rooms
+        self.alice = make_player(self.factory, "alice")
+        self.bob = make_player(self.factory, "bob", port=1)
+        self.carol = make_player(self.factory, "carol", port=2)
+        self.remote = RemotePlayer(UUID.from_offline_player("dave"), "dave", 0, None)
+        self.rooms.add(self.remote, self.rooms.default)
+
+        self.quiet = self.rooms.get("quiet")
+        self.factory.move_player(self.carol, self.quiet)
+        self.flush()
+
+        # Records the packets each player is sent, as (player, packet name, data)
+        self.sent = []
+
+        def send_groups(groups, pack_packet):
+            for group in groups:
+                for player in group:
+                    self.record(player, *pack_packet(player))
+
+        patcher = mock.patch.object(self.factory, "send_groups", send_groups)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(PyMcServProtocol, "send_packet", autospec=True, side_effect=self.record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, player, name, *data):
+        self.sent.append((player, name, b"".join(data)))
+
+    def flush(self):
+        self.clock.advance(self.factory.player_list_delay)
+
+    def received(self, player):
+        return [(name, data) for recipient, name, data in self.sent if recipient is player]
+
+    @staticmethod
+    def pack(packet):
+        name, *data = packet
+        return name, b"".join(data)
+
+    def system(self, player, message: str):
+        return PyMcServFactory.pack_system(player, message)
+
+    def test_players_join_the_default_room(self):
+        lobby = self.rooms.default
+
+        self.assertEqual(lobby.name, self.factory.default_room)
+        self.assertIs(self.alice.room, lobby)
+        self.assertIs(self.remote.room, lobby)
+        self.assertEqual(lobby.players_in_play(), [self.alice, self.bob])
+        self.assertEqual(lobby.all_players(), [self.alice, self.bob, self.remote])
+        self.assertEqual(len(lobby), 3)
+        self.assertEqual(self.quiet.all_players(), [self.carol])
+
+    def test_leave(self):
+        self.factory.broadcast_player_leave(self.bob)
+        self.flush()
+
+        self.assertIsNone(self.bob.room)
+        self.assertEqual(self.rooms.default.all_players(), [self.alice, self.remote])
+        self.assertEqual(self.received(self.alice), [
+            self.pack(self.system(self.alice, "§ebob has left.")),
+            self.pack(PyMcServFactory.pack_player_list_remove(self.alice, [self.bob.uuid]))])
+        self.assertEqual(self.received(self.carol), [])
+
+    def test_empty_rooms_removed(self):
+        self.factory.broadcast_player_leave(self.carol)
+        self.assertIsNone(self.rooms.find("quiet"))
+
+        # The default room stays when empty
+        for player in (self.alice, self.bob, self.remote):
+            self.rooms.remove(player)
+        self.assertIs(self.rooms.find(self.factory.default_room), self.rooms.default)
+
+    def test_move(self):
+        self.factory.move_player(self.alice, self.quiet)
+
+        # The moving player's list is replaced with the new room's members straight away
+        self.assertIs(self.alice.room, self.quiet)
+        self.assertEqual(self.received(self.alice), [
+            self.pack(PyMcServFactory.pack_player_list_remove(self.alice, [self.bob.uuid, self.remote.uuid])),
+            self.pack(PyMcServFactory.pack_player_list_add(self.alice, [self.carol]))])
+
+        # Each room hears about the move in its next batch
+        self.sent.clear()
+        self.flush()
+        self.assertEqual(self.received(self.bob), [
+            self.pack(self.system(self.bob, "§ealice has left.")),
+            self.pack(PyMcServFactory.pack_player_list_remove(self.bob, [self.alice.uuid]))])
+        self.assertEqual(self.received(self.carol), [
+            self.pack(self.system(self.carol, "§ealice has joined.")),
+            self.pack(PyMcServFactory.pack_player_list_add(self.carol, [self.alice]))])
+        self.assertEqual(self.received(self.alice), [self.pack(self.system(self.alice, "§ealice has joined."))])
+
+    def test_move_to_same_room(self):
+        self.factory.move_player(self.alice, self.rooms.default)
+        self.flush()
+
+        self.assertEqual(self.sent, [])
+        self.assertIs(self.alice.room, self.rooms.default)
+
+    def test_move_back_and_forth_in_one_batch(self):
+        self.factory.move_player(self.bob, self.quiet)
+        self.factory.move_player(self.bob, self.rooms.default)
+        self.sent.clear()
+        self.flush()
+
+        # carol never saw bob arrive, so isn't told they left
+        self.assertEqual(self.received(self.carol), [])
+        self.assertEqual([name for name, data in self.received(self.alice)],
+                         ["system_message", "system_message", "player_list_item", "player_list_item"])
+
+    def test_chat_scoped_to_room(self):
+        self.factory.broadcast_unsigned_chat("hello", self.carol.uuid, "carol", self.quiet)
+
+        self.assertEqual([player for player, name, data in self.sent], [self.carol])
+
+        self.sent.clear()
+        self.factory.broadcast_unsigned_chat("hi", self.alice.uuid, "alice", self.rooms.default)
+        self.assertEqual([player for player, name, data in self.sent], [self.alice, self.bob])
+        self.assertEqual(self.sent[0][1:], self.pack(PyMcServFactory.pack_unsigned_chat(
+            self.alice, "hi", self.alice.uuid, "alice")))
+
+    def test_system_messages_scoped_to_room(self):
+        self.factory.broadcast_system("lobby only", room=self.rooms.default)
+        self.assertEqual([player for player, name, data in self.sent], [self.alice, self.bob])
+
+        self.sent.clear()
+        self.factory.broadcast_system("everyone")
+        self.assertEqual({player for player, name, data in self.sent}, {self.alice, self.bob, self.carol})
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.testing import StringTransport
+from quarry.types.buffer import Buffer1_19_1
+
+from pymcserv import timeouts
+from tests.conftest import make_factory
+
+
+class Monotonic:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ConnectionTimeoutsTest(unittest.TestCase):
+    def setUp(self):
+        self.time = Monotonic()
+        patcher = mock.patch.object(timeouts.time, "monotonic", self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.factory = make_factory()
+        self.factory.connection_timeout = 30
+        self.timeouts = self.factory.timeouts
+        self.addCleanup(lambda: self.timeouts.loop.running and self.timeouts.loop.stop())
+
+    def connect(self, port: int = 0):
+        connection = self.factory.buildProtocol(IPv4Address("TCP", "127.0.0.1", port))
+        connection.makeConnection(StringTransport())
+        return connection
+
+    def test_connection_timer_replaces_quarrys(self):
+        connection = self.connect()
+
+        self.assertIs(connection.connection_timer.connection, connection)
+        self.assertEqual(list(self.timeouts.timers), [connection.connection_timer])
+        self.assertEqual(self.factory.ticker._tasks, [])
+        self.assertTrue(self.timeouts.loop.running)
+
+    def test_timeout(self):
+        connection = self.connect()
+        self.time.now += 29
+        self.timeouts.sweep()
+        self.assertFalse(connection.transport.disconnecting)
+
+        self.time.now += 1
+        self.timeouts.sweep()
+        self.assertTrue(connection.transport.disconnecting)
+        self.assertEqual(len(self.timeouts.timers), 0)
+
+    def test_packet_restarts_timer(self):
+        idle, active = self.connect(), self.connect(port=1)
+        self.time.now += 20
+
+        # quarry restarts the connection timer after each packet
+        handshake = Buffer1_19_1.pack_varint(0) + Buffer1_19_1.pack_varint(760) + Buffer1_19_1.pack_string("host") + \
+            Buffer1_19_1.pack("H", 25565) + Buffer1_19_1.pack_varint(1)
+        active.dataReceived(Buffer1_19_1.pack_packet(handshake))
+        self.assertEqual(list(self.timeouts.timers), [idle.connection_timer, active.connection_timer])
+
+        self.time.now += 10
+        self.timeouts.sweep()
+        self.assertTrue(idle.transport.disconnecting)
+        self.assertFalse(active.transport.disconnecting)
+
+    def test_connection_lost_stops_timer(self):
+        connection = self.connect()
+        connection.connectionLost(None)
+
+        self.assertEqual(len(self.timeouts.timers), 0)
+        self.assertFalse(self.timeouts.loop.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import gc
+import unittest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from quarry.net.auth import PlayerPublicKey
+
+from pymcserv.protocols.verify import SignatureVerifier
+
+
+def make_key() -> PlayerPublicKey:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=1024).public_key()
+    return PlayerPublicKey(0, key, b"")
+
+
+class SignatureVerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.verifier = SignatureVerifier(1)
+        self.addCleanup(self.verifier.shutdown)
+
+    def test_encoded_keys_belong_to_their_player_key(self):
+        first, second = make_key(), make_key()
+
+        encoded = self.verifier.encode(first)
+        self.assertIs(self.verifier.encode(first), encoded)
+        self.assertEqual(serialization.load_der_public_key(encoded).public_numbers(), first.key.public_numbers())
+        self.assertEqual(serialization.load_der_public_key(self.verifier.encode(second)).public_numbers(),
+                         second.key.public_numbers())
+
+    def test_encoded_key_is_dropped_with_player_key(self):
+        key = make_key()
+        self.verifier.encode(key)
+
+        # Even without forget(), the encoding can't outlive the key and be handed to another player
+        del key
+        gc.collect()
+        self.assertEqual(len(self.verifier.encoded_keys), 0)
+
+    def test_forget(self):
+        key = make_key()
+        self.verifier.encode(key)
+
+        self.verifier.forget(key)
+        self.verifier.forget(key)
+        self.assertNotIn(key, self.verifier.encoded_keys)
+
+
+if __name__ == "__main__":
+    unittest.main()